@@ -0,0 +1,56 @@
+from typing import Dict, List
+import sys
+import time
+from server.py.battleship import Battleship, RandomPlayer, GamePhase, FLEET, BOARD_SIZE
+
+
+LIST_BOARD_SIZE = [10, 26, 52, 100]
+CNT_GAMES = 3
+
+
+def get_scaled_fleet(size: int) -> Dict[str, int]:
+    """ Repeat the classic fleet so that the share of occupied cells stays the same as on the 10x10 board """
+    cnt_copies = max(1, (size * size) // (BOARD_SIZE * BOARD_SIZE))
+    return {f'{name}_{idx + 1}': length for idx in range(cnt_copies) for name, length in FLEET.items()}
+
+
+def play_game(size: int, fleet: Dict[str, int]) -> Dict[str, List[float]]:
+    """ Play one game with random players and measure each turn (get_list_action, select_action, apply_action) """
+    game = Battleship(width=size, height=size, fleet=fleet)
+    player = RandomPlayer()
+    dict_durations: Dict[str, List[float]] = {GamePhase.SETUP: [], GamePhase.RUNNING: []}
+    state = game.get_state()
+    while state.phase != GamePhase.FINISHED:
+        phase = state.phase
+        time_start = time.perf_counter()
+        action = player.select_action(state, game.get_list_action())
+        game.apply_action(action)
+        dict_durations[phase].append(time.perf_counter() - time_start)
+        state = game.get_state()
+    return dict_durations
+
+
+def run_benchmark(list_size: List[int]) -> None:
+    print('--- Battleship Scaling Benchmark ---')
+    print(f'Games per board size: {CNT_GAMES}')
+    print()
+    print(f"{'board':>9} {'ships':>6} {'setup turns':>12} {'setup us/turn':>14} "
+          f"{'shot turns':>11} {'shot us/turn':>13}")
+    for size in list_size:
+        fleet = get_scaled_fleet(size)
+        durations_setup: List[float] = []
+        durations_running: List[float] = []
+        for _ in range(CNT_GAMES):
+            dict_durations = play_game(size, fleet)
+            durations_setup.extend(dict_durations[GamePhase.SETUP])
+            durations_running.extend(dict_durations[GamePhase.RUNNING])
+        us_setup = 1e6 * sum(durations_setup) / max(1, len(durations_setup))
+        us_running = 1e6 * sum(durations_running) / max(1, len(durations_running))
+        print(f"{f'{size}x{size}':>9} {len(fleet):>6} {len(durations_setup) // CNT_GAMES:>12} {us_setup:>14.1f} "
+              f"{len(durations_running) // CNT_GAMES:>11} {us_running:>13.1f}")
+
+
+if __name__ == '__main__':
+
+    # optional arguments: board sizes to measure, e.g. "python benchmark/benchmark_battleship_scaling.py 10 26 200"
+    run_benchmark([int(arg) for arg in sys.argv[1:]] or LIST_BOARD_SIZE)
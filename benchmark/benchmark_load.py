@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import websockets
+
+DICT_ENDPOINT = {  # endpoint -> how the client plays
+    'hangman/singleplayer': 'singleplayer',
+    'battleship/singleplayer': 'singleplayer',
+    'battleship/simulation': 'simulation',
+    'uno/singleplayer': 'singleplayer',
+    'uno/simulation': 'simulation',
+    'dog/singleplayer': 'singleplayer',
+    'dog/simulation': 'simulation',
+}
+LIST_PERCENTILE = [50, 95, 99]
+TIMEOUT_RECEIVE = 30.0
+
+
+def get_percentile(list_value: List[float], percentile: int) -> Optional[float]:
+    if len(list_value) == 0:
+        return None
+    list_sorted = sorted(list_value)
+    return list_sorted[min(len(list_sorted) - 1, len(list_sorted) * percentile // 100)]
+
+
+def get_cpu_seconds(pid: int) -> Optional[float]:
+    """ User + system CPU time of a process (Linux only, None elsewhere) """
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as file_stat:
+            list_field = file_stat.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(list_field[11]) + int(list_field[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class LoadStats:
+    """ Measurements of all clients of one run """
+
+    def __init__(self) -> None:
+        self.list_connect: List[float] = []
+        self.list_turn: List[float] = []
+        self.cnt_messages = 0
+        self.cnt_games = 0
+        self.cnt_errors = 0
+        self.list_error: List[str] = []
+
+    def add_error(self, e: Exception) -> None:
+        self.cnt_errors += 1
+        if len(self.list_error) < 10:
+            self.list_error.append(f'{type(e).__name__}: {e}')
+
+
+def select_action(mode: str, state: Dict[str, Any]) -> Optional[Any]:
+    """ What the browser would send: the bot's selected action (simulation) or a random possible action """
+    if mode == 'simulation':
+        return {'action': state.get('selected_action')}
+    list_action = state.get('list_action', [])
+    idx_active = state.get('idx_player_active')
+    if len(list_action) == 0 or (idx_active is not None and idx_active != state.get('idx_player_you')):
+        return None
+    return {'action': random.choice(list_action)}
+
+
+async def play_game(url: str, mode: str, stats: LoadStats) -> None:
+    """ Play one game on a fresh connection, measuring the time from each action sent to the next message """
+    time_start = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as websocket:
+        stats.list_connect.append(time.perf_counter() - time_start)
+        time_sent: Optional[float] = None
+        while True:
+            message = json.loads(await asyncio.wait_for(websocket.recv(), TIMEOUT_RECEIVE))
+            stats.cnt_messages += 1
+            if time_sent is not None:
+                stats.list_turn.append(time.perf_counter() - time_sent)
+                time_sent = None
+            if message['type'] != 'update':
+                continue
+            state = message['state']
+            if state.get('phase') == 'finished':
+                stats.cnt_games += 1
+                return
+            selected = select_action(mode, state)
+            if selected is not None:
+                await websocket.send(json.dumps({'type': 'action', **selected}))
+                time_sent = time.perf_counter()
+
+
+async def run_client(url: str, mode: str, stats: LoadStats, time_end: float, delay_start: float) -> None:
+    await asyncio.sleep(delay_start)
+    while time.perf_counter() < time_end:
+        try:
+            await play_game(url, mode, stats)
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException, KeyError, ValueError) as e:
+            stats.add_error(e)
+            await asyncio.sleep(0.1)
+
+
+async def run_load(url_base: str, endpoint: str, cnt_clients: int, duration: float, ramp: float,
+                   pid: Optional[int]) -> Dict[str, Any]:
+    """ Let cnt_clients clients play games for duration seconds (connections spread over ramp seconds) """
+    url = f'{url_base}/{endpoint}/ws?turbo=1'
+    stats = LoadStats()
+    cpu_start = None if pid is None else get_cpu_seconds(pid)
+    time_start = time.perf_counter()
+    time_end = time_start + ramp + duration
+    await asyncio.gather(*(run_client(url, DICT_ENDPOINT[endpoint], stats, time_end, ramp * idx / cnt_clients)
+                           for idx in range(cnt_clients)))
+    sec_wall = time.perf_counter() - time_start
+    cpu_end = None if pid is None else get_cpu_seconds(pid)
+    sec_cpu = None if cpu_start is None or cpu_end is None else cpu_end - cpu_start
+    return {
+        'endpoint': endpoint,
+        'clients': cnt_clients,
+        'duration': sec_wall,
+        'games': stats.cnt_games,
+        'turns': len(stats.list_turn),
+        'messages': stats.cnt_messages,
+        'messages_per_sec': stats.cnt_messages / sec_wall,
+        'connect_ms': {f'p{p}': to_ms(get_percentile(stats.list_connect, p)) for p in LIST_PERCENTILE},
+        'turn_ms': {f'p{p}': to_ms(get_percentile(stats.list_turn, p)) for p in LIST_PERCENTILE},
+        'server_cpu_sec': sec_cpu,
+        'server_cpu_percent': None if sec_cpu is None else 100 * sec_cpu / sec_wall,
+        'errors': stats.cnt_errors,
+        'list_error': stats.list_error,
+    }
+
+
+def to_ms(sec: Optional[float]) -> Optional[float]:
+    return None if sec is None else round(1000 * sec, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play games over many concurrent websockets and report latencies')
+    parser.add_argument('endpoints', nargs='*', default=['hangman/singleplayer', 'battleship/simulation'],
+                        choices=list(DICT_ENDPOINT), metavar='endpoint')
+    parser.add_argument('--url', default='ws://127.0.0.1:8000', help='server (ignored with --spawn)')
+    parser.add_argument('--clients', type=int, default=1000, help='concurrent clients per endpoint')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of full load per endpoint')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which the clients connect')
+    parser.add_argument('--pid', type=int, help='server process to measure the CPU time of')
+    parser.add_argument('--spawn', type=int, metavar='PORT', help='start a uvicorn worker on this port')
+    parser.add_argument('--output', help='write the JSON result to this file (default: stdout)')
+    args = parser.parse_args()
+
+    url, pid = args.url, args.pid
+    with contextlib.ExitStack() as stack:
+        if args.spawn is not None:
+            # one uvicorn worker without bot delays (the replay logs go to a temporary directory)
+            env = dict(os.environ, PACING_TURBO='1', PYTHONPATH=os.getcwd(),
+                       REPLAY_DIR=stack.enter_context(tempfile.TemporaryDirectory()))
+            process = stack.enter_context(subprocess.Popen(
+                [sys.executable, '-m', 'uvicorn', 'server.py.main:app', '--port', str(args.spawn),
+                 '--log-level', 'warning'], env=env))
+            stack.callback(process.terminate)
+            url, pid = f'ws://127.0.0.1:{args.spawn}', process.pid
+            time.sleep(3)
+        list_result = []
+        for endpoint in args.endpoints:
+            result = asyncio.run(run_load(url, endpoint, args.clients, args.duration, args.ramp, pid))
+            print(f"{endpoint}: {result['games']} games, {result['messages_per_sec']:.0f} msgs/s, "
+                  f"turn p50/p95/p99 {result['turn_ms']['p50']}/{result['turn_ms']['p95']}/"
+                  f"{result['turn_ms']['p99']} ms, {result['errors']} errors", file=sys.stderr)
+            list_result.append(result)
+    output = json.dumps({'time': time.time(), 'python': sys.version.split()[0], 'results': list_result}, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file_output:
+            file_output.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+
+    # e.g. "python benchmark/benchmark_load.py --spawn 8001 --clients 2000 hangman/singleplayer"
+    main()
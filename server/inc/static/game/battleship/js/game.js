@@ -1,5 +1,6 @@
 function Game(config) {
 	this.config = config;
+	this.delta_state = new DeltaState();
 	this.canvas_width = 1000;
 	this.canvas_height = 900;
 	this.cnt_squares = 10;
@@ -175,6 +176,35 @@ Game.prototype.set_player_state = function(player_state) {
 	}
 }
 
+// Takes an 'update' (full state) or a 'patch' message, returns the new state (null while waiting for a keyframe)
+Game.prototype.on_update = function(data) {
+	var state = this.delta_state.on_message(data);
+	if(state != null) {
+		this.set_player_state(state);
+	}
+	return state;
+}
+
+// Shows an own action at once, as far as this view can tell its result; the next update of the server replaces it
+Game.prototype.predict_action = function(action) {
+	var state = this.delta_state.get_state();
+	if(state == null || action == null) {
+		return;
+	}
+	var player = state.players[state.idx_player_you];
+	if(action.action_type == 'set_ship') {
+		for(var i=0; i<player.ships.length; i++) {
+			if(player.ships[i].name == action.ship_name) {
+				player.ships[i].location = action.location;
+			}
+		}
+	} else if(action.action_type == 'shoot') {
+		player.shots_pending = [action.location[0]];  // hit or miss is only known to the server
+	}
+	state.list_action = [];
+	this.set_player_state(state);
+}
+
 Game.prototype.get_ij = function (location) {
 	return [
 		location.toLowerCase().charCodeAt(0)-97,
@@ -238,6 +268,18 @@ Game.prototype.transform_state = function (raw_state) {
 				'successfull': successfull,
 			}
 		}
+		// predicted shots, their result is only known to the server
+		var list_shot_pending = player.shots_pending || [];
+		for(var i=0; i<list_shot_pending.length; i++) {
+			var ij = this.get_ij(list_shot_pending[i]);
+			player.shots.push({
+				'location': list_shot_pending[i],
+				'i': ij[0],
+				'j': ij[1],
+				'successfull': false,
+				'pending': true,
+			});
+		}
 	}
 	return raw_state;
 }
@@ -781,6 +823,13 @@ Game.prototype.render_ship = function (ship, fill_color, stroke_color, x_top_lef
 
 Game.prototype.render_shot = function (shot, x_top_left, y_top_left) {
 	y_top_left += this.square_size*2;
+	if(shot.pending) {
+		this.ctx.fillStyle = 'rgb(150,150,150)';
+		this.ctx.beginPath();
+		this.ctx.arc(x_top_left + (shot.i+0.5)*this.square_size, y_top_left + (shot.j+0.5)*this.square_size, 4, 0, 2 * Math.PI);
+		this.ctx.fill();
+		return;
+	}
 	if(shot.successfull) {
 		var padding = 7;
  		var x = x_top_left + shot.i*this.square_size + padding + 0.5;
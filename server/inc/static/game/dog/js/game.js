@@ -1,5 +1,6 @@
 function Game(config) {
 	this.config = config;
+	this.delta_state = new DeltaState();
 	this.canvas_width = 1440;
 	this.canvas_height = 1550;
 	this.list_assets = [
@@ -105,6 +106,10 @@ function Game(config) {
 	this.list_ball_selectable_from = null;
 	this.list_ball_selectable_to = null;
 	this.dict_imgs = null;
+	this.layer_static = null;
+	this.dict_region = null;
+	this.list_rect_dirty = null;
+	this.list_hand_status = null;
 	this.player_state = null;
 	this.selection_state = null;
 	this.imgs_loaded = false;
@@ -247,21 +252,28 @@ Game.prototype.calc_xy_pos = function () {
 Game.prototype.load_images = function () {
 	this.dict_imgs = {}
 	this.imgs_loaded = false;
-	this.cnt_images_loaded = 0;
 
-	for(var i=0; i<this.list_assets.length; i++) {
-		var asset = this.list_assets[i];
+	// all images are packed into one atlas (python -m server.py.sprite_atlas), the map says where each one is
+	fetch(this.config.img_path + 'atlas.json').then(function(response) {
+		return response.json();
+	}).then(function(atlas) {
 		var img = new Image();
-		img.src = this.config.img_path + asset['src'];
 		img.onload = function() {
-	      	this.cnt_images_loaded++;
-			if(this.cnt_images_loaded==this.list_assets.length) {
-				this.imgs_loaded = true;
-				this.render();
+			for(var i=0; i<this.list_assets.length; i++) {
+				var asset = this.list_assets[i];
+				this.dict_imgs[asset['id']] = Object.assign({'img': img}, atlas.sprites[asset['src']]);
 			}
+			this.imgs_loaded = true;
+			this.render();
 	    }.bind(this);
-		this.dict_imgs[asset['id']] = img;
-	}
+		img.src = this.config.img_path + atlas.image;
+	}.bind(this));
+}
+
+Game.prototype.draw_sprite = function (id, x, y, w, h, ctx) {
+	var sprite = this.dict_imgs[id];
+	(ctx || this.ctx).drawImage(sprite.img, sprite.x, sprite.y, sprite.w, sprite.h, x, y,
+		w==undefined ? sprite.source_w : w, h==undefined ? sprite.source_h : h);
 }
 
 Game.prototype.bind_events = function() {
@@ -292,6 +304,46 @@ Game.prototype.set_player_state = function(player_state) {
 	this.render();
 }
 
+// Takes an 'update' (full state) or a 'patch' message, returns the new state (null while waiting for a keyframe)
+Game.prototype.on_update = function(data) {
+	var state = this.delta_state.on_message(data);
+	if(state != null) {
+		this.set_player_state(state);
+	}
+	return state;
+}
+
+// Shows an own action at once, as far as this view can tell its result; the next update of the server replaces it
+Game.prototype.predict_action = function(action) {
+	var state = this.delta_state.get_state();
+	if(state == null || action == null) {
+		return;
+	}
+	var player = state.list_player[state.idx_player_you];
+	for(var i=0; action.card!=null && i<player.list_card.length; i++) {
+		var card = player.list_card[i];
+		if(this.are_cards_equal(card, action.card)) {
+			if(action.card_swap != null) {
+				player.list_card[i] = action.card_swap;
+			} else {
+				player.list_card.splice(i, 1);
+				if(state.bool_card_exchanged) {
+					state.list_card_discard.push(card);
+				}
+			}
+			break;
+		}
+	}
+	for(var i=0; action.pos_from!=null && action.pos_to!=null && i<player.list_marble.length; i++) {
+		if(player.list_marble[i].pos == action.pos_from) {
+			player.list_marble[i].pos = action.pos_to;  // marbles sent home by the move are only known to the server
+			break;
+		}
+	}
+	state.list_action = [];
+	this.set_player_state(state);
+}
+
 Game.prototype.calc_board_rotation = function() {
 	// rotate xy of pos, pos numbering remains the same
 	this.list_xy_pos_rotated = [];
@@ -781,33 +833,274 @@ Game.prototype.is_point_in_circle = function(xy, xy_center, r) {
 
 
 
-Game.prototype.render = function () {
-	if(!this.imgs_loaded || this.list_xy_pos_rotated==undefined) {
-		return;
-	}
-
-	this.ctx.fillStyle = 'white';
-	this.ctx.fillRect(0,0,this.canvas_width,this.canvas_height);
+// The canvas is repainted region by region: the key of a region describes everything drawn into it, a render
+// repaints only the regions whose key (or place) changed since the last one, clipped to them
+Game.prototype.calc_regions = function () {
+	var dict_region = {};
+	var cx = this.board_center_x;
+	var cy = this.board_center_y;
 
-	var id_board = this.player_state==null ? 'board_0' : 'board_' + this.player_state.idx_player_you;
-	this.ctx.drawImage(this.dict_imgs[id_board], this.board_x, this.board_y, this.board_width, this.board_width);
+	// board, position circles and numbers: everything is repainted when they change
+	dict_region['board'] = {
+		'key': 'board_' + this.player_state.idx_player_you + (this.config.debug ? '_debug' : ''),
+		'list_rect': [[0, 0, this.canvas_width, this.canvas_height]],
+	};
 
-	this.ctx.strokeStyle = 'rgba(0,0,0,0.33)';
-	this.ctx.lineWidth = 1;
-	var r = this.board_width/50;
+	// marbles and selection rings, per position
+	var list_marble_key = [];
+	for(var p=0; p<this.player_state.list_player.length; p++) {
+		var player = this.player_state.list_player[p];
+		for(var i=0; i<player.list_marble.length; i++) {
+			var idx_pos = player.list_marble[i].pos;
+			list_marble_key[idx_pos] = (list_marble_key[idx_pos] || '') + player.idx_orig + (player.list_marble[i].is_save ? 's' : '');
+		}
+	}
 	for(var i=0; i<this.list_xy_pos_rotated.length; i++) {
 		var xy = this.list_xy_pos_rotated[i];
+		dict_region['pos_'+i] = {
+			'key': (list_marble_key[i] || '') + '|' + this.get_pos_ring_color(i),
+			'list_rect': [[xy[0]-30, xy[1]-30, 60, 60]],
+		};
+	}
 
-		//position circles
-		this.ctx.beginPath();
-		this.ctx.arc(xy[0], xy[1], r, 0, 2 * Math.PI);
-		this.ctx.stroke();
+	// marble move direction
+	var key_arrow = '';
+	var list_rect_arrow = [];
+	if(this.selection_state.pos_from_selected!=null && this.selection_state.pos_to_selected!=null) {
+		var xy_from = this.list_xy_pos_rotated[this.selection_state.pos_from_selected];
+		var xy_to = this.list_xy_pos_rotated[this.selection_state.pos_to_selected];
+		key_arrow = this.selection_state.pos_from_selected + '-' + this.selection_state.pos_to_selected;
+		list_rect_arrow.push([Math.min(xy_from[0], xy_to[0])-5, Math.min(xy_from[1], xy_to[1])-5, Math.abs(xy_from[0]-xy_to[0])+10, Math.abs(xy_from[1]-xy_to[1])+10]);
+	}
+	dict_region['arrow'] = {'key': key_arrow, 'list_rect': list_rect_arrow};
+
+	// texts: active player, game state and the names on the four sides
+	var d = this.board_width/2+22;
+	dict_region['labels'] = {
+		'key': JSON.stringify([
+			this.player_state.idx_player_active,
+			this.player_state.list_player[this.player_state.idx_player_active].name,
+			this.player_state.bool_game_finished,
+			this.player_state.bool_card_exchanged,
+			this.player_state['list_player_names'],
+		]),
+		'list_rect': [
+			[cx-350, cy-160, 700, 40],
+			[cx-350, cy+130, 700, 40],
+			[cx-350, cy+d-20, 700, 40],
+			[cx-350, cy-d-20, 700, 40],
+			[cx-d-20, cy-350, 40, 700],
+			[cx+d-20, cy-350, 40, 700],
+		],
+	};
+
+	// top of the discard pile
+	var dim = this.dict_player_card_rect.card_stack;
+	var list_card_discard = this.player_state.list_card_discard;
+	dict_region['card_stack'] = {
+		'key': list_card_discard.length>0 ? this.get_id_from_card(list_card_discard[list_card_discard.length-1]) : '',
+		'list_rect': [[dim[0]-5, dim[1]-5, dim[2]+15, dim[3]+15]],
+	};
+
+	// hands
+	this.list_hand_status = this.calc_hand_status();
+	for(var p=0; p<4; p++) {
+		var list_card = this.player_state.list_player[p].list_card;
+		var list_rect = this.dict_player_card_rect.list_player[p];
+		var list_id_card = [];
+		var rect_hand = null;
+		for(var i=0; i<list_card.length; i++) {
+			list_id_card.push(this.get_id_from_card(list_card[i]));
+			rect_hand = this.get_rect_union(rect_hand, this.get_rect_padded(list_rect[i], 30));
+		}
+		dict_region['hand_'+p] = {
+			'key': JSON.stringify([list_id_card, this.list_hand_status[p]]),
+			'list_rect': rect_hand==null ? [] : [rect_hand],
+		};
+	}
+
+	// exchange cards (shown below the hand, or the selected one on top of the card it is exchanged with)
+	var key_exchange = '';
+	var list_rect_exchange = [];
+	if(this.selection_state.exchange_card_visible) {
+		var list_id_card = [];
+		for(var i=0; i<this.dict_exchange_card_rect.length; i++) {
+			list_id_card.push(this.get_id_from_card(this.dict_exchange_card_rect[i].card));
+		}
+		key_exchange = JSON.stringify([list_id_card, this.selection_state.idx_exchange_card_hover, this.selection_state.idx_exchange_card_selected, this.selection_state.idx_card_selected]);
+		if(this.selection_state.idx_exchange_card_selected==null) {
+			for(var i=0; i<this.dict_exchange_card_rect.length; i++) {
+				list_rect_exchange.push(this.get_rect_padded(this.dict_exchange_card_rect[i].rect, 8));
+			}
+		} else {
+			var rect = this.dict_player_card_rect.list_player[this.idx_player_you][this.selection_state.idx_card_selected];
+			var card_exchange = this.dict_exchange_card_rect[this.selection_state.idx_exchange_card_selected];
+			list_rect_exchange.push(this.get_rect_padded([rect[0]+card_exchange.rect[2]/2, rect[1]+card_exchange.rect[3]/2, card_exchange.rect[2], card_exchange.rect[3]], 8));
+		}
+	}
+	dict_region['exchange'] = {'key': key_exchange, 'list_rect': list_rect_exchange};
+
+	// submit button
+	var rect = this.dict_area_rect[this.ID_BUTTON_SUBMIT].rect;
+	dict_region['submit'] = {
+		'key': this.selection_state.submit_button_state==null ? '' : '' + this.selection_state.submit_button_state,
+		'list_rect': [[rect[0]-5, rect[1]-5, rect[2]+15, rect[3]+20]],
+	};
+
+	return dict_region;
+}
+
+// Rects to repaint: where a region was and where it is now, for every region which changed
+Game.prototype.calc_dirty_rects = function (dict_region) {
+	if(this.dict_region==null || this.dict_region['board'].key!=dict_region['board'].key) {
+		return dict_region['board'].list_rect;
+	}
+	var list_rect = [];
+	var list_id = Object.keys(Object.assign({}, this.dict_region, dict_region));
+	for(var i=0; i<list_id.length; i++) {
+		var region_before = this.dict_region[list_id[i]];
+		var region = dict_region[list_id[i]];
+		if(region_before!=undefined && region!=undefined && region_before.key==region.key
+				&& JSON.stringify(region_before.list_rect)==JSON.stringify(region.list_rect)) {
+			continue;
+		}
+		if(region_before!=undefined) {
+			list_rect = list_rect.concat(region_before.list_rect);
+		}
+		if(region!=undefined) {
+			list_rect = list_rect.concat(region.list_rect);
+		}
+	}
+	return list_rect;
+}
+
+Game.prototype.is_dirty = function (rect) {
+	for(var i=0; i<this.list_rect_dirty.length; i++) {
+		var rect_dirty = this.list_rect_dirty[i];
+		if(rect[0]<rect_dirty[0]+rect_dirty[2] && rect_dirty[0]<rect[0]+rect[2]
+				&& rect[1]<rect_dirty[1]+rect_dirty[3] && rect_dirty[1]<rect[1]+rect[3]) {
+			return true;
+		}
+	}
+	return false;
+}
+
+Game.prototype.is_region_dirty = function (id_region) {
+	var list_rect = this.dict_region[id_region].list_rect;
+	for(var i=0; i<list_rect.length; i++) {
+		if(this.is_dirty(list_rect[i])) {
+			return true;
+		}
+	}
+	return false;
+}
+
+Game.prototype.get_rect_padded = function (rect, d) {
+	return [rect[0]-d, rect[1]-d, rect[2]+2*d, rect[3]+2*d];
+}
+
+Game.prototype.get_rect_union = function (rect_a, rect_b) {
+	if(rect_a==null) {
+		return rect_b;
+	}
+	var x = Math.min(rect_a[0], rect_b[0]);
+	var y = Math.min(rect_a[1], rect_b[1]);
+	return [x, y, Math.max(rect_a[0]+rect_a[2], rect_b[0]+rect_b[2])-x, Math.max(rect_a[1]+rect_a[3], rect_b[1]+rect_b[3])-y];
+}
+
+// Board and position circles don't change during a game, they are drawn once into an offscreen canvas
+Game.prototype.get_layer_static = function (id_board) {
+	if(this.layer_static==null || this.layer_static.id_board!=id_board) {
+		var canvas = document.createElement('canvas');
+		canvas.width = this.canvas_width;
+		canvas.height = this.canvas_height;
+		var ctx = canvas.getContext('2d');
+		ctx.fillStyle = 'white';
+		ctx.fillRect(0,0,this.canvas_width,this.canvas_height);
+		this.draw_sprite(id_board, this.board_x, this.board_y, this.board_width, this.board_width, ctx);
+
+		ctx.strokeStyle = 'rgba(0,0,0,0.33)';
+		ctx.lineWidth = 1;
+		var r = this.board_width/50;
+		for(var i=0; i<this.list_xy_pos_rotated.length; i++) {
+			var xy = this.list_xy_pos_rotated[i];
+
+			//position circles
+			ctx.beginPath();
+			ctx.arc(xy[0], xy[1], r, 0, 2 * Math.PI);
+			ctx.stroke();
+		}
+		this.layer_static = {'id_board': id_board, 'canvas': canvas};
+	}
+	return this.layer_static.canvas;
+}
+
+// Color of the ring around a position, null if it has none
+Game.prototype.get_pos_ring_color = function (i) {
+	var is_selected = this.selection_state.pos_from_selected==i || this.selection_state.pos_to_selected==i;
+	if(!(this.list_ball_selectable_from[i] || this.list_ball_selectable_to[i] || is_selected)) {
+		return null;
+	}
+	if(this.selection_state.idx_pos_hover==i || is_selected){
+		return this.dict_colors[2];
+	}
+	return this.dict_colors[1];
+}
+
+// Status (0: none, 1: selectable or played, 2: hovered or selected) and elevation of the cards of all hands
+Game.prototype.calc_hand_status = function () {
+	var list_hand_status = [];
+	var card_marked = false;
+	for(var p=0; p<4; p++) {
+		var is_active_and_you = this.player_state.idx_player_active==this.player_state.idx_player_you && p==this.idx_player_you;
+		list_hand_status[p] = [];
+		for(var i=0; i<this.player_state.list_player[p].list_card.length; i++) {
+			var card = this.player_state.list_player[p].list_card[i];
+			var status = is_active_and_you && this.list_card_selectable[i] ? (i==this.selection_state.idx_card_hover || i==this.selection_state.idx_card_selected ? 2 : 1) : 0;
+			var elevation = is_active_and_you && i==this.selection_state.idx_card_selected && !this.player_state.bool_card_exchanged ? -25 : 0;
+			if(this.config.spectator && !card_marked && this.player_state.selected_action!=null && this.are_cards_equal(this.player_state.selected_action.card, card) && p==this.player_state.idx_player_active) {
+				status = 1;
+				card_marked = true;
+			}
+			list_hand_status[p][i] = [status, elevation];
+		}
+	}
+	return list_hand_status;
+}
+
+Game.prototype.render = function () {
+	if(!this.imgs_loaded || this.list_xy_pos_rotated==undefined) {
+		return;
 	}
 
 	if(this.player_state==null) {
+		this.dict_region = null;
+		this.ctx.drawImage(this.get_layer_static('board_0'), 0, 0);
+		return;
+	}
+
+	var dict_region = this.calc_regions();
+	this.list_rect_dirty = this.calc_dirty_rects(dict_region);
+	this.dict_region = dict_region;
+	if(this.list_rect_dirty.length==0) {
 		return;
 	}
 
+	this.ctx.save();
+	this.ctx.beginPath();
+	for(var i=0; i<this.list_rect_dirty.length; i++) {
+		var rect = this.list_rect_dirty[i];
+		this.ctx.rect(rect[0], rect[1], rect[2], rect[3]);
+	}
+	this.ctx.clip();
+	this.render_regions();
+	this.ctx.restore();
+}
+
+// Draws everything in the usual order, skipping what is outside of the dirty rects (the canvas is clipped to them)
+Game.prototype.render_regions = function () {
+	this.ctx.drawImage(this.get_layer_static('board_' + this.player_state.idx_player_you), 0, 0);
+
 	/*
 	// inner circle
 	this.ctx.beginPath();
@@ -861,10 +1154,13 @@ Game.prototype.render = function () {
 			var idx_pos = player.list_marble[i].pos;
 			var is_save = player.list_marble[i].is_save;
 			var xy = this.list_xy_pos_rotated[idx_pos];
+			if(!this.is_region_dirty('pos_'+idx_pos)) {
+				continue;
+			}
 			this.ctx.beginPath();
 			this.ctx.arc(xy[0]+8, xy[1]+4, r_shadow, 0, 2 * Math.PI);
 			this.ctx.fill();
-			this.ctx.drawImage(this.dict_imgs['ball_'+player.idx_orig], xy[0]-19, xy[1]-19);
+			this.draw_sprite('ball_'+player.idx_orig, xy[0]-19, xy[1]-19);
 
 			if(is_save) {
 				this.ctx.beginPath();
@@ -880,13 +1176,9 @@ Game.prototype.render = function () {
 	this.ctx.lineWidth = 3;
 	for(var i=0; i<this.list_xy_pos_rotated.length; i++) {
 		var xy = this.list_xy_pos_rotated[i];
-		var is_selected = this.selection_state.pos_from_selected==i || this.selection_state.pos_to_selected==i;
-		if(this.list_ball_selectable_from[i] || this.list_ball_selectable_to[i] || is_selected) {
-			if(this.selection_state.idx_pos_hover==i || is_selected){
-				this.ctx.strokeStyle = this.dict_colors[2];
-			} else {
-				this.ctx.strokeStyle = this.dict_colors[1];
-			}
+		var color = this.get_pos_ring_color(i);
+		if(color!=null && this.is_region_dirty('pos_'+i)) {
+			this.ctx.strokeStyle = color;
 			this.ctx.beginPath();
 			this.ctx.arc(xy[0], xy[1], this.r_active, 0, 2 * Math.PI);
 			this.ctx.stroke();
@@ -908,12 +1200,14 @@ Game.prototype.render = function () {
 
 	// cards center
 	var dim = this.dict_player_card_rect.card_stack;
-	if(this.player_state.list_card_discard.length>0) {
+	if(this.player_state.list_card_discard.length>0 && this.is_region_dirty('card_stack')) {
 		var card_stack = this.player_state.list_card_discard[this.player_state.list_card_discard.length-1];
 		this.render_card(card_stack, dim[0], dim[1], dim[2], dim[3], 1, 0);			
 	}
 	dim = this.dict_player_card_rect.card_pile;
-	this.render_card({suit:'', rank: 'BCK'}, dim[0], dim[1], dim[2], dim[3], 2, 0);
+	if(this.is_dirty([dim[0]-5, dim[1]-5, dim[2]+50, dim[3]+30])) {
+		this.render_card({suit:'', rank: 'BCK'}, dim[0], dim[1], dim[2], dim[3], 2, 0);
+	}
 
 
 	// marble move direction
@@ -940,20 +1234,16 @@ Game.prototype.render = function () {
 
 
 	// cards players
-	var card_marked = false;
 	for(var p=0; p<4; p++) {
-
-		var is_active_and_you = this.player_state.idx_player_active==this.player_state.idx_player_you && p==this.idx_player_you;
 		if(p%2==0) {
 			for(var i=0; i<this.player_state.list_player[p].list_card.length; i++) {
 				var card = this.player_state.list_player[p].list_card[i];
 				var rect = this.dict_player_card_rect.list_player[p][i];
-				var status = is_active_and_you && this.list_card_selectable[i] ? (i==this.selection_state.idx_card_hover || i==this.selection_state.idx_card_selected ? 2 : 1) : 0;
-				var elevation = is_active_and_you && i==this.selection_state.idx_card_selected && !this.player_state.bool_card_exchanged ? -25 : 0;
-				if(this.config.spectator && !card_marked && this.player_state.selected_action!=null && this.are_cards_equal(this.player_state.selected_action.card, card) && p==this.player_state.idx_player_active) {
-					status = 1;
-					card_marked = true;
+				if(!this.is_dirty(this.get_rect_padded(rect, 30))) {
+					continue;
 				}
+				var status = this.list_hand_status[p][i][0];
+				var elevation = this.list_hand_status[p][i][1];
 				this.render_card(card, rect[0], rect[1]+elevation, rect[2], rect[3], 0, status);
 				/*
 				if(this.config.spectator && p!=this.player_state.idx_player_active) {
@@ -978,12 +1268,11 @@ Game.prototype.render = function () {
 			for(var i=0; i<this.player_state.list_player[p].list_card.length; i++) {
 				var card = this.player_state.list_player[p].list_card[i];
 				var rect = this.dict_player_card_rect.list_player[p][i];
-				var status = is_active_and_you && this.list_card_selectable[i] ? (i==this.selection_state.idx_card_hover || i==this.selection_state.idx_card_selected ? 2 : 1) : 0;
-				var elevation = is_active_and_you && i==this.selection_state.idx_card_selected && !this.player_state.bool_card_exchanged ? -25 : 0;
-				if(this.config.spectator && !card_marked && this.player_state.selected_action!=null && this.are_cards_equal(this.player_state.selected_action.card, card) && p==this.player_state.idx_player_active) {
-					status = 1;
-					card_marked = true;
+				if(!this.is_dirty(this.get_rect_padded(rect, 30))) {
+					continue;
 				}
+				var status = this.list_hand_status[p][i][0];
+				var elevation = this.list_hand_status[p][i][1];
 				this.render_card(card, -rect[1]+this.board_center_y-rect[3]+elevation, rect[0]-this.board_center_x, rect[3], rect[2], -1, status);
 				/*
 				if(this.config.spectator && p!=this.player_state.idx_player_active) {
@@ -1010,7 +1299,7 @@ Game.prototype.render = function () {
 	}
 
 	// exchange chards
-	if(this.selection_state.exchange_card_visible) {
+	if(this.selection_state.exchange_card_visible && this.is_region_dirty('exchange')) {
 		if(this.selection_state.idx_exchange_card_selected==null) {
 			for(var i=0; i<this.dict_exchange_card_rect.length; i++) {
 				var card_exchange = this.dict_exchange_card_rect[i];
@@ -1028,7 +1317,7 @@ Game.prototype.render = function () {
 
 
 	// submit button
-	if(this.selection_state.submit_button_state!=null) {
+	if(this.selection_state.submit_button_state!=null && this.is_region_dirty('submit')) {
 		// game state
 		var button = this.dict_area_rect[this.ID_BUTTON_SUBMIT];
 		var rect = button.rect;
@@ -1095,7 +1384,7 @@ Game.prototype.render_card = function (card, x, y, w, h, shadow_type, status) {
 			this.ctx.fillRect(x, y+h, 33, dy);
 		}
 	}
-	this.ctx.drawImage(this.dict_imgs['card_'+id_card], x, y, w, h);
+	this.draw_sprite('card_'+id_card, x, y, w, h);
 
 	if(status>0) {
 		var p = 2;
@@ -1,5 +1,6 @@
 function Game(config) {
 	this.config = config;
+	this.delta_state = new DeltaState();
 	this.canvas_width = 600;
 	this.canvas_height = 400;
 	this.font_loaded = false;
@@ -45,6 +46,26 @@ Game.prototype.set_state = function(state) {
 	this.render();
 }
 
+// Takes an 'update' (full state) or a 'patch' message, returns the new state (null while waiting for a keyframe)
+Game.prototype.on_update = function(data) {
+	var state = this.delta_state.on_message(data);
+	if(state != null) {
+		this.set_state(state);
+	}
+	return state;
+}
+
+// Shows an own action at once, as far as this view can tell its result; the next update of the server replaces it
+Game.prototype.predict_action = function(action) {
+	var state = this.delta_state.get_state();
+	if(state == null || action == null) {
+		return;
+	}
+	state.guesses.push(action.letter);  // whether it is in the word is only known to the server
+	state.list_action = [];
+	this.set_state(state);
+}
+
 Game.prototype.init_objects = function () {
 	this.list_alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ".split('');
 	this.list_guessed = [];
@@ -3,34 +3,59 @@ function Singleplayer(config) {
     this.game = new Game(config.game_config);
     this.game.send_action_callback = this.send_action.bind(this);
     this.ws = null;
+    this.game_id = null;  // the server's snapshot of this game, resumed after a lost connection
+    this.codec = new WireCodec(config.wire_format);
     this.main();
 };
 Singleplayer.prototype.main = function(){
     this.init_websocket();
 };
 Singleplayer.prototype.init_websocket = function(){
-    this.ws = new WebSocket(this.config.ws_endpoint);
+    var endpoint = this.config.ws_endpoint;
+    if(this.game_id != null) {
+        endpoint += (endpoint.indexOf('?') < 0 ? '?' : '&') + 'game_id=' + this.game_id;
+    }
+    this.ws = new WebSocket(endpoint, this.codec.get_protocols());
+    this.codec.init_websocket(this.ws);
     this.ws.onopen = this.ws_onopen.bind(this);
     this.ws.onmessage = this.ws_onmessage.bind(this);
+    this.ws.onclose = this.ws_onclose.bind(this);
 }
 Singleplayer.prototype.ws_onopen = function(event) {
     this.add_log('> connected');
 };
+// 1000: the game is over, any other code (e.g. a restarted server) reconnects and resumes the game
+Singleplayer.prototype.ws_onclose = function(event) {
+    this.add_log('> closed '+event.code);
+    if(event.code != 1000 && this.game_id != null) {
+        setTimeout(this.init_websocket.bind(this), 1000);
+    }
+};
 Singleplayer.prototype.ws_send = function(data) {
     this.add_log('< '+data['type']);
-    this.ws.send(JSON.stringify(data))
+    this.ws.send(this.codec.encode(data, this.ws));
 };
 Singleplayer.prototype.ws_onmessage = function(event) {
-    var data = JSON.parse(event.data);
+    var data = this.codec.decode(event.data);
+    if(data == null) {
+        return;
+    }
     this.add_log('> '+data.type);
     switch(data['type']) {
+        case 'resume':
+            this.game_id = data['game_id'];
+            break;
         case 'update':
-            this.game.set_state(data['state']);
-            //console.log(data['state']);
-            /*if(data['state']['idx_player_active']==data['state']['idx_player_you'] && data['state']['list_action'].length==0) {
+        case 'patch':
+            var state = this.game.on_update(data);
+            if(state == null) {
+                break;
+            }
+            //console.log(state);
+            /*if(state['idx_player_active']==state['idx_player_you'] && state['list_action'].length==0) {
                 this.send_action(null);
             }*/
-            //this.apply_action(data['state']['selected_action']);
+            //this.apply_action(state['selected_action']);
             break;
     }
 };
@@ -52,8 +77,10 @@ Singleplayer.prototype.send_action = function(action) {
     data = {
         'type': 'action',
         'action': action,
+        'state_version': this.game.delta_state.get_state_version(),
     }
     this.ws_send(data);
+    this.game.predict_action(action);  // shown at once, the next update replaces it
 };
 
 
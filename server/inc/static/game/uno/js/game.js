@@ -1,5 +1,6 @@
 function Game(config) {
 	this.config = config;
+	this.delta_state = new DeltaState();
 	this.canvas_width = 1000;
 	this.canvas_height = 1000;
 	this.r_card_border = 12;
@@ -104,22 +105,29 @@ Game.prototype.init = function () {
 Game.prototype.load_images = function () {
 	this.dict_imgs = {}
 	this.imgs_loaded = false;
-	this.cnt_images_loaded = 0;
 
-	for(var i=0; i<this.list_assets.length; i++) {
-		var asset = this.list_assets[i];
+	// all images are packed into one atlas (python -m server.py.sprite_atlas), the map says where each one is
+	fetch(this.config.img_path + 'atlas.json').then(function(response) {
+		return response.json();
+	}).then(function(atlas) {
 		var img = new Image();
-		img.src = this.config.img_path + asset['src'];
 		img.onload = function() {
-	      	this.cnt_images_loaded++;
-			if(this.cnt_images_loaded==this.list_assets.length) {
-				this.imgs_loaded = true;
-				this.calc_objects_rect();
-				this.render();
+			for(var i=0; i<this.list_assets.length; i++) {
+				var asset = this.list_assets[i];
+				this.dict_imgs[asset['id']] = Object.assign({'img': img}, atlas.sprites[asset['src']]);
 			}
+			this.imgs_loaded = true;
+			this.calc_objects_rect();
+			this.render();
 	    }.bind(this);
-		this.dict_imgs[asset['id']] = img;
-	}
+		img.src = this.config.img_path + atlas.image;
+	}.bind(this));
+}
+
+Game.prototype.draw_sprite = function (id, x, y, w, h) {
+	var sprite = this.dict_imgs[id];
+	this.ctx.drawImage(sprite.img, sprite.x, sprite.y, sprite.w, sprite.h, x, y,
+		w==undefined ? sprite.source_w : w, h==undefined ? sprite.source_h : h);
 }
 
 Game.prototype.bind_events = function() {
@@ -146,6 +154,39 @@ Game.prototype.set_state = function(state) {
 	this.render();
 }
 
+// Takes an 'update' (full state) or a 'patch' message, returns the new state (null while waiting for a keyframe)
+Game.prototype.on_update = function(data) {
+	var state = this.delta_state.on_message(data);
+	if(state != null) {
+		this.set_state(state);
+	}
+	return state;
+}
+
+// Shows an own action at once, as far as this view can tell its result; the next update of the server replaces it
+Game.prototype.predict_action = function(action) {
+	var state = this.delta_state.get_state();
+	if(state == null || action == null) {
+		return;
+	}
+	var player = state.list_player[state.idx_player_you];
+	if(action.card != null) {
+		for(var i=0; i<player.list_card.length; i++) {
+			var card = player.list_card[i];
+			if(card.color==action.card.color && card.number==action.card.number && card.symbol==action.card.symbol) {
+				player.list_card.splice(i, 1);
+				state.list_card_discard.push(card);
+				break;
+			}
+		}
+		if(action.color != null) {
+			state.color = action.color;
+		}
+	}
+	state.list_action = [];
+	this.set_state(state);
+}
+
 Game.prototype.get_id_from_card = function(card) {
 	var id = card.color + '_' + card.number;
 	if(card.color=='any') {
@@ -582,7 +623,7 @@ Game.prototype.render_card_area = function (card) {
 }
 
 Game.prototype.render_card = function (card, idx_card) {
-	this.ctx.drawImage(this.dict_imgs[card.id], card.x, card.y, card.w, card.h);
+	this.draw_sprite(card.id, card.x, card.y, card.w, card.h);
 
 	if(card.is_selectable) {
 		var color = this.dict_colors[1];
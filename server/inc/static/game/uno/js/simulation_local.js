@@ -2,13 +2,15 @@ function Simulation(config) {
     this.config = config
     this.game = new Game(config.game_config);
     this.ws = null;
+    this.codec = new WireCodec(config.wire_format);
     this.main();
 };
 Simulation.prototype.main = function(){
     this.init_websocket();
 };
 Simulation.prototype.init_websocket = function(){
-    this.ws = new WebSocket(this.config.ws_endpoint);
+    this.ws = new WebSocket(this.config.ws_endpoint, this.codec.get_protocols());
+    this.codec.init_websocket(this.ws);
     this.ws.onopen = this.ws_onopen.bind(this);
     this.ws.onmessage = this.ws_onmessage.bind(this);
 }
@@ -17,16 +19,27 @@ Simulation.prototype.ws_onopen = function(event) {
 };
 Simulation.prototype.ws_send = function(data) {
     this.add_log('< '+data['type']);
-    this.ws.send(JSON.stringify(data))
+    this.ws.send(this.codec.encode(data, this.ws));
 };
 Simulation.prototype.ws_onmessage = function(event) {
-    var data = JSON.parse(event.data);
+    var data = this.codec.decode(event.data);
+    if(data == null) {
+        return;
+    }
     this.add_log('> '+data.type);
     switch(data['type']) {
         case 'update':
-    		this.add_log(data['state']);
-    		this.game.set_state(data['state']);
-    		this.apply_action(data['state']['selected_action']);
+        case 'patch':
+    		var state = this.game.on_update(data);
+    		if(state == null) {
+    			break;
+    		}
+    		this.add_log(state);
+    		this.apply_action(state['selected_action']);
+            break;
+        case 'spectate':
+            // others can watch this game at ?spectate=<game_id>
+            console.log('spectate: ' + window.location.pathname + '?spectate=' + data['game_id']);
             break;
     }
 };
@@ -35,6 +48,9 @@ Simulation.prototype.add_log = function(msg) {
 };
 
 Simulation.prototype.apply_action = function(action) {
+	if(this.config.watch_only) {
+		return;
+	}
 	if(this.game.state.phase=='finished') {
 		return;
 	}
@@ -0,0 +1,62 @@
+// Applies the 'patch' messages of the server (JSON patch, RFC 6902: add, remove, replace) to the last full state.
+function DeltaState() {
+    this.state = null;
+    this.version = null;
+};
+DeltaState.prototype.parse_pointer = function(path) {
+    return path.split('/').slice(1).map(function(key) {
+        return key.replace(/~1/g, '/').replace(/~0/g, '~');
+    });
+};
+DeltaState.prototype.apply_op = function(doc, op) {
+    var list_key = this.parse_pointer(op['path']);
+    if(list_key.length == 0) {
+        return op['value'];
+    }
+    var parent = doc;
+    for(var i = 0; i < list_key.length - 1; i++) {
+        parent = parent[list_key[i]];
+    }
+    var key = list_key[list_key.length - 1];
+    if(Array.isArray(parent)) {
+        var idx = key == '-' ? parent.length : parseInt(key, 10);
+        if(op['op'] == 'add') {
+            parent.splice(idx, 0, op['value']);
+        } else if(op['op'] == 'remove') {
+            parent.splice(idx, 1);
+        } else {
+            parent[idx] = op['value'];
+        }
+    } else if(op['op'] == 'remove') {
+        delete parent[key];
+    } else {
+        parent[key] = op['value'];
+    }
+    return doc;
+};
+// Returns a copy of the current state (the game may change the object it gets), null while out of sync.
+DeltaState.prototype.on_message = function(data) {
+    if(data['type'] == 'update') {
+        this.state = data['state'];
+        this.version = data['version'] === undefined ? null : data['version'];
+    } else if(data['type'] == 'patch') {
+        if(this.state == null || this.version != data['version'] - 1) {
+            // a patch was missed, wait for the next keyframe
+            this.state = null;
+            return null;
+        }
+        for(var i = 0; i < data['patch'].length; i++) {
+            this.state = this.apply_op(this.state, data['patch'][i]);
+        }
+        this.version = data['version'];
+    }
+    return this.get_state();
+};
+// A copy of the last state of the server (e.g. to show the predicted result of an own action on it).
+DeltaState.prototype.get_state = function() {
+    return this.state == null ? null : JSON.parse(JSON.stringify(this.state));
+};
+// The server's version of the game state, sent back with an action (null if the server doesn't send versions).
+DeltaState.prototype.get_state_version = function() {
+    return this.state == null || this.state['state_version'] === undefined ? null : this.state['state_version'];
+};
@@ -0,0 +1,223 @@
+// Minimal MessagePack codec for the game websockets: cards travel as extension type 1 (big-endian card id,
+// 1, 2 or 4 bytes), the card table arrives in the first message {'type': 'codec', 'cards': [...]}.
+var EXT_TYPE_CARD = 1;
+
+function WireCodec(format) {
+    this.format = format || 'json';
+    this.list_card = [];
+    this.dict_card_id = {};
+};
+// Subprotocols to offer on connect, the server answers with 'msgpack' or falls back to JSON
+WireCodec.prototype.get_protocols = function() {
+    return this.format == 'msgpack' ? ['msgpack'] : [];
+};
+WireCodec.prototype.init_websocket = function(ws) {
+    ws.binaryType = 'arraybuffer';  // text frames (JSON) still arrive as strings
+};
+WireCodec.prototype.get_card_key = function(card) {
+    return JSON.stringify(Object.keys(card).sort().map(function(key) { return [key, card[key]]; }));
+};
+// Returns the message, or null for messages handled by the codec itself
+WireCodec.prototype.decode = function(data) {
+    if(typeof data == 'string') {
+        return JSON.parse(data);
+    }
+    var message = new MsgpackDecoder(new Uint8Array(data), this.list_card).decode();
+    if(message['type'] == 'codec') {
+        this.list_card = message['cards'];
+        this.dict_card_id = {};
+        for(var i = 0; i < this.list_card.length; i++) {
+            this.dict_card_id[this.get_card_key(this.list_card[i])] = i;
+        }
+        return null;
+    }
+    return message;
+};
+WireCodec.prototype.encode = function(message, ws) {
+    if(ws.protocol != 'msgpack') {
+        return JSON.stringify(message);
+    }
+    var encoder = new MsgpackEncoder(this);
+    encoder.encode(message);
+    return encoder.get_bytes();
+};
+
+function MsgpackEncoder(codec) {
+    this.codec = codec;
+    this.list_byte = [];
+};
+MsgpackEncoder.prototype.get_bytes = function() {
+    return new Uint8Array(this.list_byte);
+};
+MsgpackEncoder.prototype.push_uint = function(value, cnt_byte) {
+    for(var i = cnt_byte - 1; i >= 0; i--) {
+        this.list_byte.push(Math.floor(value / Math.pow(2, 8 * i)) & 0xff);
+    }
+};
+MsgpackEncoder.prototype.push_length = function(length, fix_prefix, fix_max, code_8, code_16, code_32) {
+    if(length <= fix_max) {
+        this.list_byte.push(fix_prefix | length);
+    } else if(code_8 != null && length < 0x100) {
+        this.list_byte.push(code_8, length);
+    } else if(length < 0x10000) {
+        this.list_byte.push(code_16);
+        this.push_uint(length, 2);
+    } else {
+        this.list_byte.push(code_32);
+        this.push_uint(length, 4);
+    }
+};
+MsgpackEncoder.prototype.encode = function(value) {
+    if(value === null || value === undefined) {
+        this.list_byte.push(0xc0);
+    } else if(value === false || value === true) {
+        this.list_byte.push(value ? 0xc3 : 0xc2);
+    } else if(typeof value == 'number') {
+        this.encode_number(value);
+    } else if(typeof value == 'string') {
+        var bytes = new TextEncoder().encode(value);
+        this.push_length(bytes.length, 0xa0, 31, 0xd9, 0xda, 0xdb);
+        for(var i = 0; i < bytes.length; i++) {
+            this.list_byte.push(bytes[i]);
+        }
+    } else if(Array.isArray(value)) {
+        this.push_length(value.length, 0x90, 15, null, 0xdc, 0xdd);
+        for(var j = 0; j < value.length; j++) {
+            this.encode(value[j]);
+        }
+    } else {
+        var id = this.codec.dict_card_id[this.codec.get_card_key(value)];
+        if(id !== undefined) {
+            var size = id < 0x100 ? 1 : (id < 0x10000 ? 2 : 4);
+            this.list_byte.push({1: 0xd4, 2: 0xd5, 4: 0xd6}[size], EXT_TYPE_CARD);
+            this.push_uint(id, size);
+            return;
+        }
+        var list_key = Object.keys(value);
+        this.push_length(list_key.length, 0x80, 15, null, 0xde, 0xdf);
+        for(var k = 0; k < list_key.length; k++) {
+            this.encode(list_key[k]);
+            this.encode(value[list_key[k]]);
+        }
+    }
+};
+MsgpackEncoder.prototype.push_view = function(code, method, value) {
+    var view = new DataView(new ArrayBuffer(8));
+    view[method](0, value);
+    this.list_byte.push(code);
+    for(var i = 0; i < 8; i++) {
+        this.list_byte.push(view.getUint8(i));
+    }
+};
+MsgpackEncoder.prototype.encode_number = function(value) {
+    if(!Number.isInteger(value) || Math.abs(value) >= 0x100000000) {
+        this.push_view(0xcb, 'setFloat64', value);
+    } else if(value >= 0) {
+        if(value < 0x80) {
+            this.list_byte.push(value);
+        } else {
+            this.list_byte.push(0xce);
+            this.push_uint(value, 4);
+        }
+    } else if(value >= -32) {
+        this.list_byte.push(value & 0xff);
+    } else if(value >= -0x80000000) {
+        this.list_byte.push(0xd2);
+        this.push_uint(value >>> 0, 4);
+    } else {
+        // below int32, value >>> 0 would wrap around
+        this.push_view(0xd3, 'setBigInt64', BigInt(value));
+    }
+};
+
+function MsgpackDecoder(bytes, list_card) {
+    this.bytes = bytes;
+    this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    this.list_card = list_card;
+    this.pos = 0;
+};
+MsgpackDecoder.prototype.read = function(method, size) {
+    var value = this.view[method](this.pos);
+    this.pos += size;
+    return value;
+};
+MsgpackDecoder.prototype.read_str = function(length) {
+    var value = new TextDecoder().decode(this.bytes.subarray(this.pos, this.pos + length));
+    this.pos += length;
+    return value;
+};
+MsgpackDecoder.prototype.read_bin = function(length) {
+    var value = this.bytes.slice(this.pos, this.pos + length);
+    this.pos += length;
+    return value;
+};
+MsgpackDecoder.prototype.read_array = function(length) {
+    var list_value = [];
+    for(var i = 0; i < length; i++) {
+        list_value.push(this.decode());
+    }
+    return list_value;
+};
+MsgpackDecoder.prototype.read_map = function(length) {
+    var dict_value = {};
+    for(var i = 0; i < length; i++) {
+        var key = this.decode();
+        dict_value[key] = this.decode();
+    }
+    return dict_value;
+};
+MsgpackDecoder.prototype.read_ext = function(length) {
+    var code = this.read('getInt8', 1);
+    var data = this.bytes.subarray(this.pos, this.pos + length);
+    this.pos += length;
+    if(code == EXT_TYPE_CARD) {
+        var id = 0;
+        for(var i = 0; i < data.length; i++) {
+            id = id * 256 + data[i];
+        }
+        return Object.assign({}, this.list_card[id]);
+    }
+    return data;
+};
+MsgpackDecoder.prototype.decode = function() {
+    var code = this.read('getUint8', 1);
+    if(code < 0x80) return code;
+    if(code < 0x90) return this.read_map(code & 0x0f);
+    if(code < 0xa0) return this.read_array(code & 0x0f);
+    if(code < 0xc0) return this.read_str(code & 0x1f);
+    if(code >= 0xe0) return code - 0x100;
+    switch(code) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xc4: return this.read_bin(this.read('getUint8', 1));
+        case 0xc5: return this.read_bin(this.read('getUint16', 2));
+        case 0xc6: return this.read_bin(this.read('getUint32', 4));
+        case 0xca: return this.read('getFloat32', 4);
+        case 0xcb: return this.read('getFloat64', 8);
+        case 0xcc: return this.read('getUint8', 1);
+        case 0xcd: return this.read('getUint16', 2);
+        case 0xce: return this.read('getUint32', 4);
+        case 0xcf: return Number(this.read('getBigUint64', 8));
+        case 0xd0: return this.read('getInt8', 1);
+        case 0xd1: return this.read('getInt16', 2);
+        case 0xd2: return this.read('getInt32', 4);
+        case 0xd3: return Number(this.read('getBigInt64', 8));
+        case 0xd4: return this.read_ext(1);
+        case 0xd5: return this.read_ext(2);
+        case 0xd6: return this.read_ext(4);
+        case 0xd7: return this.read_ext(8);
+        case 0xd8: return this.read_ext(16);
+        case 0xc7: return this.read_ext(this.read('getUint8', 1));
+        case 0xc8: return this.read_ext(this.read('getUint16', 2));
+        case 0xc9: return this.read_ext(this.read('getUint32', 4));
+        case 0xd9: return this.read_str(this.read('getUint8', 1));
+        case 0xda: return this.read_str(this.read('getUint16', 2));
+        case 0xdb: return this.read_str(this.read('getUint32', 4));
+        case 0xdc: return this.read_array(this.read('getUint16', 2));
+        case 0xdd: return this.read_array(this.read('getUint32', 4));
+        case 0xde: return this.read_map(this.read('getUint16', 2));
+        case 0xdf: return this.read_map(this.read('getUint32', 4));
+    }
+    throw new Error('Unknown MessagePack type 0x' + code.toString(16));
+};
@@ -1,37 +1,57 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, TextIO, Union, overload
 from enum import Enum
-import random
+import string
+from pydantic import BaseModel
 from server.py.game import Game, Player
 
 
-class ActionType(str, Enum):
-    SET_SHIP = 'set_ship'
-    SHOOT = 'shoot'
+BOARD_SIZE = 10
+FLEET: Dict[str, int] = {
+    'carrier': 5,
+    'battleship': 4,
+    'cruiser': 3,
+    'submarine': 3,
+    'destroyer': 2,
+}
+
+
+def get_col_name(idx_col: int) -> str:
+    """ Get the name of a column: A to Z, then AA, AB, ... like spreadsheet columns """
+    name = ''
+    idx_col += 1
+    while idx_col > 0:
+        idx_col, remainder = divmod(idx_col - 1, 26)
+        name = string.ascii_uppercase[remainder] + name
+    return name
+
 
+def get_list_location(width: int, height: int) -> List[str]:
+    """ Get all location names of a board, column by column (A1, A2, ..., B1, ...) """
+    return [get_col_name(idx_col) + str(row) for idx_col in range(width) for row in range(1, height + 1)]
 
-class BattleshipAction:
 
-    def __init__(self, action_type: ActionType, ship_name: Optional[str], location: List[str]) -> None:
-        self.action_type = action_type
-        self.ship_name = ship_name # only for set_ship actions
-        self.location = location
+class ActionType(str, Enum):
+    SET_SHIP = 'set_ship'
+    SHOOT = 'shoot'
 
 
-class Ship:
+class BattleshipAction(BaseModel):
+    action_type: ActionType
+    ship_name: Optional[str]  # only for set_ship actions
+    location: List[str]
 
-    def __init__(self, name: str, length: int, location: Optional[List[str]]) -> None:
-        self.name = name
-        self.length = length
-        self.location = location
 
+class Ship(BaseModel):
+    name: str
+    length: int
+    location: Optional[List[str]]
 
-class PlayerState:
 
-    def __init__(self, name: str, ships: List[Ship], shots: List[str], successful_shots: List[str]) -> None:
-        self.name = name
-        self.ships = ships
-        self.shots = shots
-        self.successful_shots = successful_shots
+class PlayerState(BaseModel):
+    name: str
+    ships: List[Ship]
+    shots: List[str]
+    successful_shots: List[str]
 
 
 class GamePhase(str, Enum):
@@ -40,53 +60,311 @@ class GamePhase(str, Enum):
     FINISHED = 'finished'      # when the game is finished
 
 
-class BattleshipGameState:
+class BattleshipGameState(BaseModel):
+    idx_player_active: int
+    phase: GamePhase
+    winner: Optional[int]
+    players: List[PlayerState]
+
+
+class TargetPool:
+    """ Locations not yet shot at, with O(1) removal and O(1) random access """
+
+    def __init__(self, locations: Iterable[str]) -> None:
+        self._list_location = list(locations)
+        self._dict_index = {location: idx for idx, location in enumerate(self._list_location)}
+
+    def __len__(self) -> int:
+        return len(self._list_location)
+
+    def __contains__(self, location: object) -> bool:
+        return location in self._dict_index
+
+    def __getitem__(self, idx: int) -> str:
+        return self._list_location[idx]
+
+    def index(self, location: str) -> int:
+        """ Position of a remaining location, raises ValueError if it was shot at already """
+        idx = self._dict_index.get(location)
+        if idx is None:
+            raise ValueError(f"'{location}' is not a remaining target")
+        return idx
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._list_location)
+
+    def remove(self, location: str) -> None:
+        """ Remove a location by swapping it with the last one (order is not preserved) """
+        idx = self._dict_index.pop(location, None)
+        if idx is None:
+            return
+        last = self._list_location.pop()
+        if idx < len(self._list_location):
+            self._list_location[idx] = last
+            self._dict_index[last] = idx
+
+
+class ShootActionView(Sequence[BattleshipAction]):
+    """ Lazy list of shoot actions, only valid until the next apply_action """
+
+    def __init__(self, pool: TargetPool) -> None:
+        self._pool = pool
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    @overload
+    def __getitem__(self, idx: int) -> BattleshipAction: ...
 
-    def __init__(self, idx_player_active: int, phase: GamePhase, winner: Optional[int], players: List[PlayerState]) -> None:
-        self.idx_player_active = idx_player_active
-        self.phase = phase
-        self.winner = winner
-        self.players = players
+    @overload
+    def __getitem__(self, idx: slice) -> List[BattleshipAction]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[BattleshipAction, List[BattleshipAction]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return BattleshipAction(action_type=ActionType.SHOOT, ship_name=None, location=[self._pool[idx]])
+
+    def index(self, value: Any, start: int = 0, stop: Optional[int] = None) -> int:
+        """ Index of a shoot action, looked up in the pool instead of building every action """
+        if not isinstance(value, BattleshipAction) or value.action_type != ActionType.SHOOT or len(value.location) != 1:
+            raise ValueError('Not a shoot action')
+        idx = self._pool.index(value.location[0])
+        if idx < start or (stop is not None and idx >= stop):
+            raise ValueError('Shoot action is not in the given range')
+        return idx
+
+
+class PlacementActionView(Sequence[BattleshipAction]):
+    """ Lazy list of set ship actions, the locations are only built for the selected placement """
+
+    def __init__(self, battleship: 'Battleship', ship_name: str, list_placement: List[int]) -> None:
+        self._battleship = battleship
+        self._ship_name = ship_name
+        self._length = battleship.fleet[ship_name]
+        self._height = battleship.height
+        self._list_location = battleship.list_location
+        self._list_placement = list_placement  # start cell * 2 + 1 if horizontal
+
+    def __len__(self) -> int:
+        return len(self._list_placement)
+
+    @overload
+    def __getitem__(self, idx: int) -> BattleshipAction: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[BattleshipAction]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[BattleshipAction, List[BattleshipAction]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        start, is_horizontal = divmod(self._list_placement[idx], 2)
+        step = self._height if is_horizontal else 1
+        location = [self._list_location[start + i * step] for i in range(self._length)]
+        return BattleshipAction(action_type=ActionType.SET_SHIP, ship_name=self._ship_name, location=location)
+
+    def index(self, value: Any, start: int = 0, stop: Optional[int] = None) -> int:
+        """ Index of a set ship action, found by its placement codes instead of building every action """
+        if (not isinstance(value, BattleshipAction) or value.action_type != ActionType.SET_SHIP
+                or value.ship_name != self._ship_name or len(value.location) != self._length):
+            raise ValueError('Not a set ship action of this ship')
+        idx_start = self._battleship.get_location_index(value.location[0])
+        list_idx = [idx for idx, code in enumerate(self._list_placement)
+                    if idx_start is not None and code // 2 == idx_start]  # a cell starts at most two placements
+        for idx in list_idx:
+            if start <= idx and (stop is None or idx < stop) and self[idx] == value:
+                return idx
+        raise ValueError('Set ship action is not a possible placement')
 
 
 class Battleship(Game):
 
-    def __init__(self):
-        """ Game initialization (set_state call not necessary) """
-        pass
+    def __init__(self, width: int = BOARD_SIZE, height: int = BOARD_SIZE,
+                 fleet: Optional[Dict[str, int]] = None) -> None:
+        """ Game initialization (set_state call not necessary), the board and fleet default to the classic game """
+        self.width = width
+        self.height = height
+        self.fleet = dict(FLEET if fleet is None else fleet)
+        if width < 1 or height < 1:
+            raise ValueError(f'Invalid board size {width}x{height}')
+        for name, length in self.fleet.items():
+            if length < 1 or length > max(width, height):
+                raise ValueError(f"Ship '{name}' with length {length} does not fit on a {width}x{height} board")
+        self.list_location = get_list_location(width, height)
+        self._dict_location_index = {location: idx for idx, location in enumerate(self.list_location)}
+        players = [
+            PlayerState(
+                name=f'Player {idx + 1}',
+                ships=[Ship(name=name, length=length, location=None) for name, length in self.fleet.items()],
+                shots=[],
+                successful_shots=[])
+            for idx in range(2)
+        ]
+        self.state = BattleshipGameState(idx_player_active=0, phase=GamePhase.SETUP, winner=None, players=players)
+        self._reset_cache()
 
-    def print_state(self) -> None:
-        """ Set the game to a given state """
-        pass
+    def get_location_index(self, location: str) -> Optional[int]:
+        """ Position of a location in list_location (None if it is not on the board) """
+        return self._dict_location_index.get(location)
+
+    def _reset_cache(self) -> None:
+        """ Forget all structures derived from the state """
+        cnt_player = len(self.state.players)
+        self._list_pool: List[Optional[TargetPool]] = [None] * cnt_player
+        self._list_cnt_shots_pooled = [0] * cnt_player
+        self._list_ship_cells: List[Optional[Set[str]]] = [None] * cnt_player
+        self._list_cnt_hit_left = [0] * cnt_player
+        self._list_cnt_hits_counted = [0] * cnt_player
+
+    def print_state(self, file: Optional[TextIO] = None) -> None:
+        """ Print the current game state """
+        print(f'Board: {self.width}x{self.height}, phase: {self.state.phase.value}, '
+              f'active player: {self.state.idx_player_active}, winner: {self.state.winner}', file=file)
+        for player_state in self.state.players:
+            cnt_placed = sum(1 for ship in player_state.ships if ship.location is not None)
+            print(f'{player_state.name}: {cnt_placed}/{len(player_state.ships)} ships placed, '
+                  f'{len(player_state.successful_shots)}/{len(player_state.shots)} shots hit', file=file)
 
     def get_state(self) -> BattleshipGameState:
         """ Get the complete, unmasked game state """
-        pass
+        return self.state
 
     def set_state(self, state: BattleshipGameState) -> None:
-        """ Print the current game state """
-        pass
+        """ Set the game to a given state """
+        self.state = state
+        self._reset_cache()
+
+    def _get_pool(self, idx_player: int) -> TargetPool:
+        """ Get the remaining targets of a player, rebuilding them only if the shots were changed externally """
+        shots = self.state.players[idx_player].shots
+        pool = self._list_pool[idx_player]
+        if pool is None or self._list_cnt_shots_pooled[idx_player] != len(shots):
+            # removing the shots in their order gives the same pool order as playing them, so the action
+            # indices only depend on the state (replay logs store actions as indices)
+            pool = TargetPool(self.list_location)
+            for location in shots:
+                pool.remove(location)
+            self._list_pool[idx_player] = pool
+            self._list_cnt_shots_pooled[idx_player] = len(shots)
+        return pool
 
-    def get_list_action(self) -> List[BattleshipAction]:
+    def _get_ship_cells(self, idx_player: int, idx_shooter: int) -> Set[str]:
+        """ Get the occupied cells of a player and count the ones the shooter has not hit yet """
+        cells = self._list_ship_cells[idx_player]
+        successful_shots = self.state.players[idx_shooter].successful_shots
+        if cells is None or self._list_cnt_hits_counted[idx_shooter] != len(successful_shots):
+            cells = {location for ship in self.state.players[idx_player].ships if ship.location is not None
+                     for location in ship.location}
+            self._list_ship_cells[idx_player] = cells
+            self._list_cnt_hit_left[idx_shooter] = len(cells.difference(successful_shots))
+            self._list_cnt_hits_counted[idx_shooter] = len(successful_shots)
+        return cells
+
+    def _get_next_ship(self, player_state: PlayerState) -> Optional[str]:
+        """ Get the name of the next ship of the fleet which has not been placed yet """
+        set_placed = {ship.name for ship in player_state.ships if ship.location is not None}
+        for name in self.fleet:
+            if name not in set_placed:
+                return name
+        return None
+
+    def _get_list_placement(self, player_state: PlayerState, length: int) -> List[int]:
+        """ Get all placements (start cell * 2 + 1 if horizontal) where a ship fits without overlapping """
+        width, height = self.width, self.height
+        cnt_cell = width * height
+        occupied = bytearray(cnt_cell)
+        for ship in player_state.ships:
+            for location in ship.location or []:
+                occupied[self._dict_location_index[location]] = 1
+
+        # free_down/free_right: number of free cells starting at a cell going down (rows) or right (columns)
+        free_down = [0] * (cnt_cell + 1)
+        free_right = [0] * (cnt_cell + height)
+        list_placement = []
+        for idx in range(cnt_cell - 1, -1, -1):
+            if occupied[idx]:
+                continue
+            free_down[idx] = 1 if idx % height == height - 1 else free_down[idx + 1] + 1
+            free_right[idx] = free_right[idx + height] + 1
+            if free_down[idx] >= length:
+                list_placement.append(idx * 2)
+            if free_right[idx] >= length:
+                list_placement.append(idx * 2 + 1)
+        return list_placement
+
+    def get_list_action(self) -> Sequence[BattleshipAction]:
         """ Get a list of possible actions for the active player """
-        pass
+        idx = self.state.idx_player_active
+        if self.state.phase == GamePhase.SETUP:
+            name = self._get_next_ship(self.state.players[idx])
+            if name is None:
+                return []
+            list_placement = self._get_list_placement(self.state.players[idx], self.fleet[name])
+            return PlacementActionView(battleship=self, ship_name=name, list_placement=list_placement)
+        if self.state.phase == GamePhase.RUNNING:
+            return ShootActionView(self._get_pool(idx))
+        return []
+
+    def apply_action(self, action: Optional[BattleshipAction]) -> None:
+        """ Apply the given action to the game (None: the active player had no action, the opponent goes on) """
+        idx = self.state.idx_player_active
+        idx_opponent = (idx + 1) % len(self.state.players)
+        if action is None:
+            if self.state.phase != GamePhase.FINISHED:
+                self.state.idx_player_active = idx_opponent
+            return
+        player_state = self.state.players[idx]
+        if action.action_type == ActionType.SET_SHIP:
+            for ship in player_state.ships:
+                if ship.name == action.ship_name:
+                    ship.location = action.location
+                    break
+            else:
+                player_state.ships.append(Ship(name=str(action.ship_name), length=len(action.location),
+                                               location=action.location))
+            self._list_ship_cells[idx] = None
+            self.state.idx_player_active = idx_opponent
+            if all(self._get_next_ship(player_state) is None for player_state in self.state.players):
+                self.state.phase = GamePhase.RUNNING
+            return
 
-    def apply_action(self, action: BattleshipAction) -> None:
-        """ Apply the given action to the game """
-        pass
+        location = action.location[0]
+        pool = self._get_pool(idx)
+        ship_cells = self._get_ship_cells(idx_opponent, idx)
+        is_new_target = location in pool
+        pool.remove(location)
+        player_state.shots.append(location)
+        self._list_cnt_shots_pooled[idx] = len(player_state.shots)
+        if location in ship_cells:
+            player_state.successful_shots.append(location)
+            self._list_cnt_hits_counted[idx] = len(player_state.successful_shots)
+            if is_new_target:
+                self._list_cnt_hit_left[idx] -= 1
+            if self._list_cnt_hit_left[idx] <= 0:
+                self.state.phase = GamePhase.FINISHED
+                self.state.winner = idx
+                return
+        self.state.idx_player_active = idx_opponent
 
     def get_player_view(self, idx_player: int) -> BattleshipGameState:
         """ Get the masked state for the active player (e.g. the oppontent's cards are face down)"""
-        pass
+        players = []
+        for idx, player_state in enumerate(self.state.players):
+            ships = player_state.ships
+            if idx != idx_player:
+                ships = [Ship(name=ship.name, length=ship.length, location=None) for ship in player_state.ships]
+            players.append(PlayerState(name=player_state.name, ships=ships, shots=player_state.shots,
+                                       successful_shots=player_state.successful_shots))
+        return BattleshipGameState(idx_player_active=self.state.idx_player_active, phase=self.state.phase,
+                                   winner=self.state.winner, players=players)
 
 
 class RandomPlayer(Player):
 
-    def select_action(self, state: BattleshipGameState, actions: List[BattleshipAction]) -> BattleshipAction:
+    def select_action(self, state: BattleshipGameState, actions: Sequence[BattleshipAction]) -> BattleshipAction:
         """ Given masked game state and possible actions, select the next action """
         if len(actions) == 0:
             raise ValueError('There are no actions to choose from')
-        return random.choice(actions)
+        return self.rng.choice(actions)
 
 
 if __name__ == "__main__":
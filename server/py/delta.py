@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional
+from fastapi import WebSocket
+
+KEYFRAME_INTERVAL = 20  # a full state every n updates, so a client can always resync
+
+
+def escape_key(key: str) -> str:
+    """ Escape a key for a JSON pointer (RFC 6901) """
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def make_patch(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """ Build the JSON patch (RFC 6902) which changes old into new, using add, remove and replace only """
+    list_op: List[Dict[str, Any]] = []
+    _diff(old, new, path, list_op)
+    return list_op
+
+
+def is_equal(old: Any, new: Any) -> bool:
+    """ Equality as JSON sees it (in Python 1 == True == 1.0) """
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(is_equal(value, new[key]) for key, value in old.items())
+    if isinstance(old, list):
+        return len(old) == len(new) and all(is_equal(a, b) for a, b in zip(old, new))
+    return bool(old == new)
+
+
+def _diff(old: Any, new: Any, path: str, list_op: List[Dict[str, Any]]) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        _diff_dict(old, new, path, list_op)
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, list_op)
+    elif not is_equal(old, new):
+        list_op.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def _diff_dict(old: Dict[str, Any], new: Dict[str, Any], path: str, list_op: List[Dict[str, Any]]) -> None:
+    for key, value in old.items():
+        if key not in new:
+            list_op.append({'op': 'remove', 'path': f'{path}/{escape_key(key)}'})
+        else:
+            _diff(value, new[key], f'{path}/{escape_key(key)}', list_op)
+    for key, value in new.items():
+        if key not in old:
+            list_op.append({'op': 'add', 'path': f'{path}/{escape_key(key)}', 'value': value})
+
+
+def _diff_list(old: List[Any], new: List[Any], path: str, list_op: List[Dict[str, Any]]) -> None:
+    """ Skip the common head and tail, so cards drawn or played from either end of a pile give a few ops only """
+    cnt_min = min(len(old), len(new))
+    idx_start = 0
+    while idx_start < cnt_min and is_equal(old[idx_start], new[idx_start]):
+        idx_start += 1
+    cnt_tail = 0
+    while cnt_tail < cnt_min - idx_start and is_equal(old[-1 - cnt_tail], new[-1 - cnt_tail]):
+        cnt_tail += 1
+    cnt_old = len(old) - cnt_tail - idx_start
+    cnt_new = len(new) - cnt_tail - idx_start
+    for idx in range(idx_start, idx_start + min(cnt_old, cnt_new)):
+        _diff(old[idx], new[idx], f'{path}/{idx}', list_op)
+    for idx in range(idx_start + cnt_old - 1, idx_start + cnt_new - 1, -1):
+        list_op.append({'op': 'remove', 'path': f'{path}/{idx}'})
+    for idx in range(idx_start + cnt_old, idx_start + cnt_new):
+        list_op.append({'op': 'add', 'path': f'{path}/{idx}', 'value': new[idx]})
+
+
+class DeltaEncoder:
+    """ Turns the updates of one connection into patches against the update sent before
+
+    The first update and every KEYFRAME_INTERVAL-th are sent in full ('update'), the others as
+    {'type': 'patch', 'version': n, 'patch': [...]}, to be applied to the state of version n - 1.
+    """
+
+    def __init__(self, enabled: bool = True, keyframe_interval: int = KEYFRAME_INTERVAL) -> None:
+        self.enabled = enabled
+        self.keyframe_interval = keyframe_interval
+        self.version = 0
+        self._state_sent: Optional[Dict[str, Any]] = None
+
+    def encode(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.enabled or message['type'] != 'update':
+            return message
+        self.version += 1
+        state = message['state']
+        state_sent, self._state_sent = self._state_sent, state
+        if state_sent is None or self.version % self.keyframe_interval == 1:
+            return {**message, 'version': self.version}
+        return {'type': 'patch', 'version': self.version, 'patch': make_patch(state_sent, state)}
+
+
+def create_encoder(websocket: WebSocket) -> DeltaEncoder:
+    """ Clients opt in to patches with ?delta=1 on the websocket URL """
+    return DeltaEncoder(enabled=websocket.query_params.get('delta') == '1')
@@ -0,0 +1,142 @@
+from typing import Any, Callable, Dict, Optional, TypeVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import functools
+import os
+import threading
+import time
+
+T = TypeVar('T')
+
+EXECUTOR_KINDS = ('inline', 'thread', 'process')
+
+
+class ExecutorMetrics:
+    """ Counters of one executor (queue depth = calls submitted but not yet started) """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.cnt_submitted = 0
+        self.cnt_started = 0
+        self.cnt_completed = 0
+        self.max_queue_depth = 0
+        self.sec_wait_total = 0.0  # time between submit and start
+        self.sec_run_total = 0.0   # time between start and end
+
+    def on_submit(self) -> None:
+        with self._lock:
+            self.cnt_submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.cnt_submitted - self.cnt_started)
+
+    def on_start(self, sec_wait: float) -> None:
+        with self._lock:
+            self.cnt_started += 1
+            self.sec_wait_total += sec_wait
+
+    def on_end(self, sec_run: float) -> None:
+        with self._lock:
+            self.cnt_completed += 1
+            self.sec_run_total += sec_run
+
+    def get_queue_depth(self) -> int:
+        return self.cnt_submitted - self.cnt_started
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'submitted': self.cnt_submitted,
+                'completed': self.cnt_completed,
+                'queue_depth': self.cnt_submitted - self.cnt_started,
+                'in_flight': self.cnt_submitted - self.cnt_completed,
+                'max_queue_depth': self.max_queue_depth,
+                'sec_wait_total': self.sec_wait_total,
+                'sec_run_total': self.sec_run_total,
+            }
+
+
+def _call_timed(func: Callable[..., T], time_submitted: float, metrics: ExecutorMetrics, *args: Any) -> T:
+    """ Run a function inside a worker thread and record its waiting and running time """
+    time_start = time.perf_counter()
+    metrics.on_start(time_start - time_submitted)
+    try:
+        return func(*args)
+    finally:
+        metrics.on_end(time.perf_counter() - time_start)
+
+
+class EngineExecutor:
+    """ Runs blocking engine or bot calls off the event loop, inline, on a thread pool or on a process pool """
+
+    def __init__(self, kind: str = 'thread', max_workers: Optional[int] = None,
+                 initializer: Optional[Callable[[], None]] = None) -> None:
+        """ initializer is called at the start of each worker process (e.g. to set up its logging) """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', use one of {', '.join(EXECUTOR_KINDS)}")
+        self.kind = kind
+        self.metrics = ExecutorMetrics()
+        self._executor: Optional[Executor] = None
+        if kind == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='engine')
+        elif kind == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """ Run func(*args) and wait for the result without blocking the event loop """
+        self.metrics.on_submit()
+        time_submitted = time.perf_counter()
+        if self._executor is None:
+            return _call_timed(func, time_submitted, self.metrics, *args)
+        loop = asyncio.get_running_loop()
+        if self.kind == 'process':
+            # the worker lives in another process, so the start of the call is not observable here
+            self.metrics.on_start(0.0)
+            try:
+                return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+            finally:
+                self.metrics.on_end(time.perf_counter() - time_submitted)
+        return await loop.run_in_executor(
+            self._executor, functools.partial(_call_timed, func, time_submitted, self.metrics, *args))
+
+    def session(self, executor_bot: Optional['EngineExecutor'] = None) -> 'EngineSession':
+        """ Create a session which runs its calls one after the other, in the order they were submitted """
+        return EngineSession(self, executor_bot)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class EngineSession:
+    """ Calls of one game: never run concurrently and always in submission order """
+
+    def __init__(self, executor: EngineExecutor, executor_bot: Optional[EngineExecutor] = None) -> None:
+        if executor.kind == 'process':
+            raise ValueError('Engine calls change the game object and cannot run in a process pool')
+        self.executor = executor
+        self.executor_bot = executor if executor_bot is None else executor_bot
+        self._lock = asyncio.Lock()  # asyncio.Lock wakes up its waiters in FIFO order
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """ Run an engine call (the game object stays in this process) """
+        async with self._lock:
+            return await self.executor.run(func, *args)
+
+    async def run_bot(self, func: Callable[..., T], *args: Any) -> T:
+        """ Run a bot call, which may go to a process pool (arguments and result must be picklable)
+
+        A stateful player among the arguments (Player.is_stateful) would lose its state in a worker process,
+        its calls run on the engine executor instead.
+        """
+        executor = self.executor_bot
+        if executor.kind == 'process' and any(getattr(arg, 'is_stateful', False) for arg in args):
+            executor = self.executor
+        async with self._lock:
+            return await executor.run(func, *args)
+
+
+def create_executor_from_env(name: str, default_kind: str,
+                             initializer: Optional[Callable[[], None]] = None) -> EngineExecutor:
+    """ Create an executor configured by the environment, e.g. ENGINE_EXECUTOR=thread, ENGINE_WORKERS=4 """
+    kind = os.environ.get(f'{name}_EXECUTOR', default_kind)
+    max_workers = os.environ.get(f'{name}_WORKERS')
+    return EngineExecutor(kind, int(max_workers) if max_workers else None, initializer)
@@ -1,12 +1,56 @@
-from typing import List, Any
+from typing import Any, Callable, List, Optional, Sequence, TextIO
 from abc import ABCMeta, abstractmethod
+import functools
+import random
 
 GameState = Any
 GameAction = Any
 
 
+def _bump_state_version(func: Callable[..., None]) -> Callable[..., None]:
+    @functools.wraps(func)
+    def wrapper(self: 'Game', *args: Any, **kwargs: Any) -> None:
+        if self.__dict__.get('_is_changing'):
+            # a super() call or an apply_action() which calls set_state(), the outermost call counts
+            func(self, *args, **kwargs)
+            return
+        self.__dict__['_is_changing'] = True
+        try:
+            func(self, *args, **kwargs)
+        finally:
+            self.__dict__['_is_changing'] = False
+            self.state_version += 1
+    return wrapper
+
+
 class Game(metaclass=ABCMeta):
 
+    # increases with every set_state() and apply_action() of a subclass, so views can be cached per version
+    # (a state changed in place through get_state() has to be passed to set_state() again)
+    state_version = 0
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for name in ('set_state', 'apply_action'):
+            if name in cls.__dict__:
+                setattr(cls, name, _bump_state_version(cls.__dict__[name]))
+
+    @property
+    def rng(self) -> random.Random:
+        """ The random numbers of the engine (the hangman word, shuffling, dealing), each game has its own generator
+
+        Engines draw from it instead of the random module, so a replay recorder can seed it per turn without
+        touching the random numbers of other games or of the bots, and a seeded game is played the same way again.
+        """
+        rng: Optional[random.Random] = self.__dict__.get('_rng')
+        if rng is None:
+            rng = self.__dict__['_rng'] = random.Random()
+        return rng
+
+    @rng.setter
+    def rng(self, rng: random.Random) -> None:
+        self.__dict__['_rng'] = rng
+
     @abstractmethod
     def set_state(self, state: GameState) -> None:
         """ Set the game to a given state """
@@ -18,12 +62,12 @@ class Game(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def print_state(self) -> None:
-        """ Print the current game state """
+    def print_state(self, file: Optional[TextIO] = None) -> None:
+        """ Print the current game state (to file, by default to sys.stdout) """
         pass
 
     @abstractmethod
-    def get_list_action(self) -> List[GameAction]:
+    def get_list_action(self) -> Sequence[GameAction]:
         """ Get a list of possible actions for the active player """
         pass
 
@@ -40,6 +84,13 @@ class Game(metaclass=ABCMeta):
 
 class Player(metaclass=ABCMeta):
 
+    # the player keeps what it learned between select_action() calls, so it must not run in a worker process
+    # (it would be pickled for every call and lose that state)
+    is_stateful = False
+
+    # the random numbers of the bot, a simulation gives the bots of a game the generator of that game
+    rng = random.Random()
+
     @abstractmethod
     def select_action(self, state: GameState, actions: List[GameAction]) -> GameAction:
         """ Given masked game state and possible actions, select the next action """
@@ -0,0 +1,150 @@
+from typing import Any, Dict, Optional, TextIO
+import atexit
+import contextlib
+import io
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from server.py.game import Game
+
+LOGGER_ROOT = 'server'
+LOGGER_GAME = LOGGER_ROOT + '.game'
+# attributes every log record has, everything else was passed as extra={...} and becomes a field
+SET_RECORD_ATTR = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+def get_logger(area: str) -> logging.Logger:
+    """ Logger of a part of the server, e.g. 'rooms' -> server.rooms """
+    return logging.getLogger(f'{LOGGER_ROOT}.{area}')
+
+
+def get_game_logger(game_name: str) -> logging.Logger:
+    """ Logger of a game type, its level can be set on its own (LOG_LEVEL_HANGMAN=DEBUG) """
+    return logging.getLogger(f'{LOGGER_GAME}.{game_name}')
+
+
+def to_json(value: Any) -> Any:
+    """ Fields are rendered in the logging thread, actions and states only when their record is written """
+    model_dump = getattr(value, 'model_dump', None)
+    if model_dump is not None:
+        return model_dump(mode='json')
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line: time, level, logger, message and the extra fields of the record """
+
+    def format(self, record: logging.LogRecord) -> str:
+        dict_log: Dict[str, Any] = {
+            'time': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in SET_RECORD_ATTR:
+                dict_log[key] = value
+        if record.exc_info:
+            dict_log['exception'] = self.formatException(record.exc_info)
+        return json.dumps(dict_log, default=to_json, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """ Human readable lines for development, the extra fields follow the message as key=value """
+
+    def __init__(self) -> None:
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        list_field = [f'{key}={value}' for key, value in record.__dict__.items() if key not in SET_RECORD_ATTR]
+        return ' '.join([text] + list_field)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """ Hands records to the logging thread without ever waiting, records are dropped while the queue is full """
+
+    def __init__(self, log_queue: 'queue.Queue[Any]') -> None:
+        super().__init__(log_queue)
+        self.cnt_dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # unlike QueueHandler.prepare, the message is not formatted here but in the logging thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.cnt_dropped += 1
+
+
+def render_state(game: Game) -> str:
+    """ What game.print_state() prints (run it in the game's engine session, only if it is logged) """
+    output = io.StringIO()
+    game.print_state(output)
+    return output.getvalue().rstrip('\n')
+
+
+def configure_logging(level: str = 'INFO', dict_level_game: Optional[Dict[str, str]] = None,
+                      log_format: str = 'json', max_queue: int = 10000,
+                      stream: TextIO = sys.stderr) -> logging.handlers.QueueListener:
+    """ Send all server.* records through a bounded queue to a thread which formats and writes them """
+    log_queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max_queue)
+    listener = logging.handlers.QueueListener(log_queue, create_stream_handler(log_format, stream))
+    set_handler(DroppingQueueHandler(log_queue), level, dict_level_game)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def configure_worker_logging(level: str = 'INFO', dict_level_game: Optional[Dict[str, str]] = None,
+                             log_format: str = 'json', stream: TextIO = sys.stderr) -> None:
+    """ Write the server.* records of a worker process directly to the stream
+
+    A forked worker inherits the queue handler of the server but not the thread which writes the queued records,
+    so without this its records (e.g. a failed simulated game) would be lost.
+    """
+    set_handler(create_stream_handler(log_format, stream), level, dict_level_game)
+
+
+def create_stream_handler(log_format: str, stream: TextIO) -> logging.Handler:
+    handler_stream = logging.StreamHandler(stream)
+    handler_stream.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+    return handler_stream
+
+
+def set_handler(handler: logging.Handler, level: str, dict_level_game: Optional[Dict[str, str]]) -> None:
+    """ Let the handler alone receive the server.* records and set the levels """
+    logger = logging.getLogger(LOGGER_ROOT)
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    for game_name, level_game in (dict_level_game or {}).items():
+        get_game_logger(game_name).setLevel(level_game.upper())
+
+
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """ Write the queued records and stop the logging thread (does nothing if it was already stopped) """
+    with contextlib.suppress(AttributeError):  # QueueListener.stop() fails on a stopped listener
+        listener.stop()
+
+
+def configure_logging_from_env() -> logging.handlers.QueueListener:
+    """ LOG_LEVEL (default INFO), LOG_LEVEL_<GAME> per game type, LOG_FORMAT=json|text, LOG_QUEUE: max records """
+    return configure_logging(os.environ.get('LOG_LEVEL', 'INFO'), get_dict_level_game_from_env(),
+                             os.environ.get('LOG_FORMAT', 'json'), int(os.environ.get('LOG_QUEUE', '10000')))
+
+
+def configure_worker_logging_from_env() -> None:
+    """ The initializer of worker processes, configured by the same variables as the server """
+    configure_worker_logging(os.environ.get('LOG_LEVEL', 'INFO'), get_dict_level_game_from_env(),
+                             os.environ.get('LOG_FORMAT', 'json'), sys.stderr)
+
+
+def get_dict_level_game_from_env() -> Dict[str, str]:
+    prefix = 'LOG_LEVEL_'
+    return {key[len(prefix):].lower(): value for key, value in os.environ.items() if key.startswith(prefix)}
@@ -0,0 +1,216 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from dataclasses import KW_ONLY, dataclass, field
+from types import ModuleType
+import importlib
+import importlib.metadata
+import random
+import threading
+import time
+from server.py.game import Game, Player
+from server.py.word_corpus import WordCorpusService
+
+ENTRY_POINT_GROUP = 'server.games'  # installed packages add games with entry points to their GameSpec
+
+# called with the module name and the seconds of each first import of a game module
+_list_import_listener: List[Callable[[str, float], None]] = []
+
+PATH_HANGMAN_WORDS = 'server/inc/static/hangman_words.json'
+# the word list new hangman games and the solver bot draw from, the one of the server context (set_hangman_words)
+_list_hangman_words: List[WordCorpusService] = []
+
+
+@dataclass
+class GameHooks:
+    """ The steps of a game spec which differ between games, beyond creating the game class """
+    init_game: Optional[Callable[[ModuleType, Game, int], None]] = None  # module, new game, number of players
+    get_winner: Optional[Callable[[Any], Optional[int]]] = None  # winner of a finished state
+    init_singleplayer: Optional[Callable[[Game, int], None]] = None  # new game, seat of the human
+
+
+@dataclass(eq=False)
+class GameSpec:
+    """ Everything needed to create a game and its bots by name (the game module is imported on first use) """
+    name: str
+    module_name: str
+    class_name: str
+    cnt_player: int  # default number of players
+    dict_bot: Dict[str, str]  # bot name -> player class name in the game module (or 'module:class')
+    action_class_name: str
+    _: KW_ONLY
+    hooks: GameHooks = field(default_factory=GameHooks)
+    list_mode: Sequence[str] = ()  # turn loops served at /<name>/<mode>/ws ('simulation', 'singleplayer')
+    bot_delay: float = 0.5  # seconds a bot move is shown in singleplayer games
+    _module: Optional[ModuleType] = field(default=None, init=False, repr=False)
+    # the first games may start on several engine threads at once
+    _lock_import: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def get_module(self) -> ModuleType:
+        """ The game module, imported on first use (a worker only pays for the games it plays) """
+        with self._lock_import:
+            if self._module is None:
+                time_start = time.perf_counter()
+                self._module = importlib.import_module(self.module_name)
+                for listener in _list_import_listener:
+                    listener(self.module_name, time.perf_counter() - time_start)
+            return self._module
+
+    def create_game(self, cnt_player: Optional[int] = None, rng: Optional[random.Random] = None) -> Game:
+        """ Create a game which is ready to be played (drawing from rng, if given) """
+        module = self.get_module()
+        game: Game = getattr(module, self.class_name)()
+        if rng is not None:
+            game.rng = rng
+        if self.hooks.init_game is not None:
+            self.hooks.init_game(module, game, self.cnt_player if cnt_player is None else cnt_player)
+        return game
+
+    def create_singleplayer_game(self, idx_player_you: int) -> Game:
+        """ Create a game against bots, which the human at idx_player_you may start """
+        game = self.create_game()
+        if self.hooks.init_singleplayer is not None:
+            self.hooks.init_singleplayer(game, idx_player_you)
+        return game
+
+    def create_player(self, bot_name: str) -> Player:
+        if bot_name not in self.dict_bot:
+            raise ValueError(f"Unknown bot '{bot_name}' for {self.name}, use one of {', '.join(self.dict_bot)}")
+        module_name, _, class_name = self.dict_bot[bot_name].rpartition(':')
+        module = self.get_module() if not module_name else importlib.import_module(module_name)
+        player: Player = getattr(module, class_name)()
+        return player
+
+    def parse_action(self, data: Optional[Dict[str, Any]]) -> Any:
+        """ Create an action from its JSON form (None stays None, e.g. for 'no action possible') """
+        if data is None:
+            return None
+        action_class = getattr(self.get_module(), self.action_class_name)
+        if hasattr(action_class, 'model_validate'):
+            return action_class.model_validate(data)
+        return action_class(**data)
+
+    def get_list_card(self) -> List[Any]:
+        """ All cards of the game (LIST_CARD of its GameState), empty for games without cards """
+        state_class = getattr(self.get_module(), 'GameState', None)
+        if state_class is None:
+            return []
+        if 'LIST_CARD' in state_class.model_fields:  # a field with a default, not a class variable (Uno)
+            list_card: List[Any] = state_class.model_fields['LIST_CARD'].default
+            return list_card
+        return list(getattr(state_class, 'LIST_CARD', []))
+
+    def is_finished(self, state: Any) -> bool:
+        return bool(state.phase == 'finished')
+
+    def get_winner(self, state: Any) -> Optional[int]:
+        """ Index of the winning player, None if there is none (yet) or the game can't tell """
+        if self.hooks.get_winner is None or not self.is_finished(state):
+            return None
+        return self.hooks.get_winner(state)
+
+
+def set_hangman_words(service: WordCorpusService) -> None:
+    """ Let new hangman games and solver bots use the word list of the server context """
+    _list_hangman_words[:] = [service]
+
+
+def get_hangman_words() -> WordCorpusService:
+    """ The word list of the server context, outside of a server (scripts, tests) the one at PATH_HANGMAN_WORDS """
+    if not _list_hangman_words:
+        _list_hangman_words.append(WordCorpusService(PATH_HANGMAN_WORDS))
+    return _list_hangman_words[0]
+
+
+def init_hangman(module: ModuleType, game: Game, _cnt_player: int) -> None:
+    game.set_state(module.HangmanGameState(
+        word_to_guess=get_hangman_words().get_random_word(rng=game.rng), phase=module.GamePhase.RUNNING, guesses=[],
+        incorrect_guesses=[]))
+
+
+def init_uno(module: ModuleType, game: Game, cnt_player: int) -> None:
+    game.set_state(module.GameState(
+        list_card_draw=None, list_card_discard=None, list_player=[], phase=module.GamePhase.SETUP,
+        cnt_player=cnt_player, idx_player_active=None, direction=1, color=None, cnt_to_draw=0, has_drawn=False))
+
+
+def init_singleplayer_dog(game: Game, idx_player_you: int) -> None:
+    state = game.get_state()
+    state.idx_player_started = idx_player_you
+    state.idx_player_active = idx_player_you
+    state.bool_card_exchanged = True
+    game.set_state(state)
+
+
+def get_winner_hangman(state: Any) -> Optional[int]:
+    return 0 if set(state.word_to_guess.upper()).issubset(state.guesses) else None
+
+
+def get_winner_battleship(state: Any) -> Optional[int]:
+    winner: Optional[int] = state.winner
+    return winner
+
+
+def get_winner_uno(state: Any) -> Optional[int]:
+    for idx, player in enumerate(state.list_player):
+        if len(player.list_card) == 0:
+            return idx
+    return None
+
+
+GAMES: Dict[str, GameSpec] = {
+    'hangman': GameSpec('hangman', 'server.py.hangman', 'Hangman', 1,
+                        {'random': 'RandomPlayer', 'solver': 'server.py.hangman_solver:SolverPlayer'},
+                        'GuessLetterAction',
+                        hooks=GameHooks(init_game=init_hangman, get_winner=get_winner_hangman),
+                        list_mode=('singleplayer',)),
+    'battleship': GameSpec('battleship', 'server.py.battleship', 'Battleship', 2,
+                           {'random': 'RandomPlayer'}, 'BattleshipAction',
+                           hooks=GameHooks(get_winner=get_winner_battleship),
+                           list_mode=('simulation', 'singleplayer'), bot_delay=1.0),
+    'uno': GameSpec('uno', 'server.py.uno', 'Uno', 4,
+                    {'random': 'RandomPlayer'}, 'Action',
+                    hooks=GameHooks(init_game=init_uno, get_winner=get_winner_uno),
+                    list_mode=('simulation', 'singleplayer')),
+    'dog': GameSpec('dog', 'server.py.dog', 'Dog', 4, {'random': 'RandomPlayer'}, 'Action',
+                    hooks=GameHooks(init_singleplayer=init_singleplayer_dog), list_mode=('simulation', 'singleplayer')),
+}
+
+
+def register_game(spec: GameSpec) -> None:
+    GAMES[spec.name] = spec
+
+
+def register_entry_points() -> List[str]:
+    """ Register the games of installed packages (entry points of ENTRY_POINT_GROUP), returns their names """
+    list_name = []
+    for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+        spec: GameSpec = entry_point.load()
+        register_game(spec)
+        list_name.append(spec.name)
+    return list_name
+
+
+def add_import_listener(listener: Callable[[str, float], None]) -> None:
+    _list_import_listener.append(listener)
+
+
+def remove_import_listener(listener: Callable[[str, float], None]) -> None:
+    """ Stop reporting imports to a listener (does nothing if it was not added) """
+    if listener in _list_import_listener:
+        _list_import_listener.remove(listener)
+
+
+def get_game_spec(name: str) -> GameSpec:
+    if name not in GAMES:
+        raise ValueError(f"Unknown game '{name}', use one of {', '.join(GAMES)}")
+    return GAMES[name]
+
+
+def get_list_game_spec(list_name: Optional[Sequence[str]] = None) -> List[GameSpec]:
+    """ The specs of the given games (all without names), unknown names raise a ValueError """
+    if list_name is None:
+        return list(GAMES.values())
+    return [get_game_spec(name) for name in list_name]
+
+
+def get_list_game_name() -> List[str]:
+    return list(GAMES)
@@ -0,0 +1,102 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+from server.py.game import Game
+from server.py.metrics import NULL_TIMER, StageTimer
+
+
+def build_simulation_update(state: Any, idx_player_you: int, selected_action: Optional[Any],
+                            timer: StageTimer = NULL_TIMER) -> Dict[str, Any]:
+    """ Build the 'update' message of a simulation: the full state and the action the bot chose on it """
+    with timer.span('model_dump'):
+        dict_update = build_update_from_dump(state.model_dump(), idx_player_you, [])
+        dict_update['state']['selected_action'] = None if selected_action is None else selected_action.model_dump()
+    return dict_update
+
+
+def build_update_from_dump(dict_state: Dict[str, Any], idx_player_you: int, list_action: Sequence[Any],
+                           state_version: Optional[int] = None) -> Dict[str, Any]:
+    """ Build the 'update' message from a dumped state, which is not changed (it may be cached)
+
+    With a state version, clients send it back with their action and may show the action's result before the
+    next update arrives (it replaces their prediction).
+    """
+    dict_state = dict(dict_state)
+    dict_state['idx_player_you'] = idx_player_you
+    dict_state['list_action'] = [action.model_dump() for action in list_action]
+    if state_version is not None:
+        dict_state['state_version'] = state_version
+    return {'type': 'update', 'state': dict_state}
+
+
+def is_action_current(data: Dict[str, Any], game: Game) -> bool:
+    """ Whether an action message was chosen on the current state (actions of clients without versions always are)
+
+    An action on an older state (e.g. sent before a reconnect) is dropped, the client gets the current state again.
+    """
+    state_version = data.get('state_version')
+    return state_version is None or state_version == game.state_version
+
+
+def get_state_and_actions(game: Game, timer: StageTimer = NULL_TIMER) -> Tuple[Any, Sequence[Any]]:
+    """ Get the full state and the actions of the active player """
+    with timer.span('get_state'):
+        state = game.get_state()
+    with timer.span('get_list_action'):
+        return state, game.get_list_action()
+
+
+class ViewCache:
+    """ The views, actions and update messages of one game, computed once per state version
+
+    Only the current version is kept. An update which is requested again is the same dict object,
+    so a connection can send the frame it already encoded for it (messages are never changed once built).
+    Runs inside the game's engine session like every other engine call.
+    """
+
+    def __init__(self, game: Game, timer: StageTimer = NULL_TIMER) -> None:
+        self.game = game
+        self.timer = timer
+        self.version: Optional[int] = None
+        self._dict_view: Dict[int, Tuple[Any, Dict[str, Any]]] = {}  # player -> view and its dump
+        self._list_action: Optional[Sequence[Any]] = None
+        self._dict_update: Dict[Tuple[int, bool], Dict[str, Any]] = {}  # (player, with actions) -> message
+
+    def _check_version(self) -> None:
+        if self.game.state_version != self.version:
+            self.version = self.game.state_version
+            self._dict_view.clear()
+            self._list_action = None
+            self._dict_update.clear()
+
+    def get_view(self, idx_player: int) -> Tuple[Any, Dict[str, Any]]:
+        """ Get the masked state of a player and its dump """
+        self._check_version()
+        view_and_dump = self._dict_view.get(idx_player)
+        if view_and_dump is None:
+            with self.timer.span('get_player_view'):
+                view = self.game.get_player_view(idx_player)
+            with self.timer.span('model_dump'):
+                view_and_dump = self._dict_view[idx_player] = (view, view.model_dump())
+        return view_and_dump
+
+    def get_list_action(self) -> Sequence[Any]:
+        """ Get the actions of the active player """
+        self._check_version()
+        if self._list_action is None:
+            with self.timer.span('get_list_action'):
+                self._list_action = self.game.get_list_action()
+        return self._list_action
+
+    def get_view_and_actions(self, idx_player: int) -> Tuple[Any, Sequence[Any]]:
+        """ Get the masked state of a player and the actions of the active player """
+        return self.get_view(idx_player)[0], self.get_list_action()
+
+    def get_player_update(self, idx_player_you: int, with_actions: bool) -> Tuple[Any, Sequence[Any], Dict[str, Any]]:
+        """ Get the masked state, the actions (only if the player has to act) and the update message """
+        state, dict_state = self.get_view(idx_player_you)
+        list_action = self.get_list_action() if with_actions else []
+        data = self._dict_update.get((idx_player_you, with_actions))
+        if data is None:
+            with self.timer.span('model_dump'):
+                data = self._dict_update[idx_player_you, with_actions] = build_update_from_dump(
+                    dict_state, idx_player_you, list_action, self.version)
+        return state, list_action, data
@@ -1,13 +1,15 @@
-from typing import List, Optional
-import random
+from typing import List, Optional, TextIO
+import string
 from enum import Enum
+from pydantic import BaseModel
 from server.py.game import Game, Player
 
 
-class GuessLetterAction:
+CNT_MAX_INCORRECT_GUESSES = 8
 
-    def __init__(self, letter: str) -> None:
-        self.letter = letter
+
+class GuessLetterAction(BaseModel):
+    letter: str
 
 
 class GamePhase(str, Enum):
@@ -16,44 +18,61 @@ class GamePhase(str, Enum):
     FINISHED = 'finished'      # when the game is finished
 
 
-class HangmanGameState:
-
-    def __init__(self, word_to_guess: str, phase: GamePhase, guesses: List[str], incorrect_guesses: List[str]) -> None:
-        self.word_to_guess = word_to_guess
-        self.phase = phase
-        self.guesses = guesses
-        self.incorrect_guesses = incorrect_guesses
+class HangmanGameState(BaseModel):
+    word_to_guess: str
+    phase: GamePhase
+    guesses: List[str]
+    incorrect_guesses: List[str]
 
 
 class Hangman(Game):
 
     def __init__(self) -> None:
         """ Important: Game initialization also requires a set_state call to set the 'word_to_guess' """
-        pass
+        self.state = HangmanGameState(word_to_guess='', phase=GamePhase.SETUP, guesses=[], incorrect_guesses=[])
 
     def get_state(self) -> HangmanGameState:
-        """ Set the game to a given state """
-        pass
+        """ Get the complete, unmasked game state """
+        return self.state
 
     def set_state(self, state: HangmanGameState) -> None:
-        """ Get the complete, unmasked game state """
-        pass
+        """ Set the game to a given state """
+        self.state = state
 
-    def print_state(self) -> None:
+    def print_state(self, file: Optional[TextIO] = None) -> None:
         """ Print the current game state """
-        pass
+        print(f'Word: {self.get_player_view(0).word_to_guess}, phase: {self.state.phase.value}, '
+              f'incorrect guesses: {", ".join(self.state.incorrect_guesses)} '
+              f'({len(self.state.incorrect_guesses)}/{CNT_MAX_INCORRECT_GUESSES})', file=file)
 
     def get_list_action(self) -> List[GuessLetterAction]:
         """ Get a list of possible actions for the active player """
-        pass
+        if self.state.phase == GamePhase.FINISHED:
+            return []
+        set_guessed = set(self.state.guesses)
+        return [GuessLetterAction(letter=letter) for letter in string.ascii_uppercase if letter not in set_guessed]
 
     def apply_action(self, action: GuessLetterAction) -> None:
         """ Apply the given action to the game """
-        pass
+        letter = action.letter.upper()
+        word = self.state.word_to_guess.upper()
+        if letter not in self.state.guesses:
+            self.state.guesses.append(letter)
+            if letter not in word and letter not in self.state.incorrect_guesses:
+                self.state.incorrect_guesses.append(letter)
+        cnt_incorrect = sum(1 for guess in self.state.guesses if guess not in word)
+        if cnt_incorrect >= CNT_MAX_INCORRECT_GUESSES or set(word).issubset(self.state.guesses):
+            self.state.phase = GamePhase.FINISHED
+        else:
+            self.state.phase = GamePhase.RUNNING
 
     def get_player_view(self, idx_player: int) -> HangmanGameState:
         """ Get the masked state for the active player (e.g. the oppontent's cards are face down)"""
-        pass
+        word = self.state.word_to_guess
+        if self.state.phase != GamePhase.FINISHED:
+            word = ''.join(char if char.upper() in self.state.guesses else '_' for char in word)
+        return HangmanGameState(word_to_guess=word, phase=self.state.phase, guesses=list(self.state.guesses),
+                                incorrect_guesses=list(self.state.incorrect_guesses))
 
 
 class RandomPlayer(Player):
@@ -62,7 +81,7 @@ class RandomPlayer(Player):
         """ Given masked game state and possible actions, select the next action """
         if len(actions) == 0:
             raise ValueError('There are no actions to choose from')
-        return random.choice(actions)
+        return self.rng.choice(actions)
 
 
 if __name__ == "__main__":
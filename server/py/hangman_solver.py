@@ -0,0 +1,66 @@
+from typing import Dict, List, Optional, Set
+from server.py.game import Player
+from server.py.game_registry import get_hangman_words
+from server.py.hangman import GuessLetterAction, HangmanGameState
+from server.py.word_corpus import BaseLengthIndex, BaseWordCorpus
+
+
+class SolverPlayer(Player):
+    """ Keeps the words of the corpus which match the masked word and guesses the most informative letter
+
+    Without a corpus of its own, the solver uses the server's word list and picks up a reloaded list with the
+    next word.
+    """
+
+    is_stateful = True  # the candidates are narrowed down guess by guess
+
+    def __init__(self, corpus: Optional[BaseWordCorpus] = None) -> None:
+        self.corpus = corpus
+        self._index: Optional[BaseLengthIndex] = None
+        self._candidates = 0
+        self._set_applied: Set[str] = set()
+
+    def _update_candidates(self, state: HangmanGameState) -> BaseLengthIndex:
+        """ Prune the candidates with the guesses made since the last call (restarts for a new word) """
+        word = state.word_to_guess.upper()
+        if self._index is None or self._index.length != len(word) or not self._set_applied.issubset(state.guesses):
+            corpus = get_hangman_words().get() if self.corpus is None else self.corpus
+            self._index = corpus.get_length_index(len(word))
+            self._candidates = self._index.bitset_all
+            self._set_applied = set()
+        index = self._index
+        candidates = self._candidates
+        for letter in state.guesses:
+            if letter in self._set_applied:
+                continue
+            self._set_applied.add(letter)
+            if letter not in word:
+                candidates &= ~index.get_letter_bitset(letter)
+                continue
+            for pos, char in enumerate(word):
+                if char == letter:
+                    candidates &= index.get_position_bitset(pos, letter)
+                elif char == '_':
+                    candidates &= ~index.get_position_bitset(pos, letter)
+        self._candidates = candidates
+        return index
+
+    def select_action(self, state: HangmanGameState, actions: List[GuessLetterAction]) -> GuessLetterAction:
+        """ Given masked game state and possible actions, select the next action """
+        if len(actions) == 0:
+            raise ValueError('There are no actions to choose from')
+        index = self._update_candidates(state)
+        # without candidates (word not in corpus) fall back to the letter frequency of all words of this length
+        candidates = self._candidates or index.bitset_all
+        cnt_candidates = candidates.bit_count()
+        dict_action: Dict[str, GuessLetterAction] = {action.letter.upper(): action for action in actions}
+        best_letter, best_score = None, (-1, -1)
+        for letter in dict_action:
+            cnt_with = (candidates & index.get_letter_bitset(letter)).bit_count()
+            # the split closest to half of the candidates carries the most information (ties: more frequent letter)
+            score = (min(cnt_with, cnt_candidates - cnt_with), cnt_with)
+            if score > best_score:
+                best_letter, best_score = letter, score
+        if best_letter is None or best_score[1] == 0:
+            return self.rng.choice(actions)
+        return dict_action[best_letter]
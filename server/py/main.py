@@ -1,362 +1,361 @@
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+import asyncio
+import contextlib
 import json
+import os
 import random
-import asyncio
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel, Field
+from starlette.requests import HTTPConnection
 from starlette.templating import _TemplateResponse
-from server.py import hangman
-from server.py import battleship
-from server.py import uno
-from server.py import dog
-
-app = FastAPI()
-app.mount("/inc/static", StaticFiles(directory="server/inc/static"), name="static")
+from server.py.game_updates import build_simulation_update
+from server.py.game_registry import (add_import_listener, get_game_spec, get_list_game_name, get_list_game_spec,
+                                    register_entry_points, remove_import_listener, set_hangman_words)
+from server.py.game_logging import configure_logging_from_env, get_logger
+from server.py.rooms import RoomError
+from server.py.replay import Replayer
+from server.py.server_context import ServerContext, create_context_from_env
+from server.py.static_assets import mount_static_from_env
+from server.py.wire import SEND_ERRORS, accept_connection, get_message_type
+from server.py.simulation import SimulationStats, run_games, MAX_ACTIONS, MAX_CHUNKS_IN_FLIGHT, MAX_GAMES
+from server.py.turn_loop import TurnLoop
+
+router = APIRouter()
 templates = Jinja2Templates(directory="server/inc/templates")
+logger_server = get_logger('main')
+
 
+def get_context(connection: HTTPConnection) -> ServerContext:
+    """ The services of the app serving a request or websocket (created by create_app) """
+    context: ServerContext = connection.app.state.context
+    return context
 
-@app.get("/", response_class=HTMLResponse)
+
+@router.get("/", response_class=HTMLResponse)
 async def get(request: Request) -> _TemplateResponse:
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-# ----- Hangman -----
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_get(request: Request) -> PlainTextResponse:
+    """ Prometheus text format: game_stage_seconds{game, stage} histograms and game_executor_* counters """
+    return PlainTextResponse(get_context(request).metrics.render(), media_type='text/plain; version=0.0.4')
 
-@app.get("/hangman/singleplayer/local/", response_class=HTMLResponse)
-async def hangman_singleplayer(request: Request) -> _TemplateResponse:
-    return templates.TemplateResponse("game/hangman/singleplayer_local.html", {"request": request})
 
-@app.websocket("/hangman/singleplayer/ws")
-async def hangman_singleplayer_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
-    try:
-        game = hangman.Hangman()
-        words = []
-        with open('server/inc/static/hangman_words.json', encoding='utf-8') as fin:
-            words = json.load(fin)
-        word_to_guess = random.choice(words)
-        state = hangman.HangmanGameState(
-            word_to_guess=word_to_guess, phase=hangman.GamePhase.RUNNING, guesses=[], incorrect_guesses=[])
-        game.set_state(state)
-        while True:
-            state = game.get_player_view(idx_player_you)
-            game.print_state()
-            state = game.get_player_view(idx_player_you)
-            list_action = game.get_list_action()
-            dict_state = state.model_dump()
-            dict_state['idx_player_you'] = idx_player_you
-            dict_state['list_action'] = [action.model_dump() for action in list_action]
-            data = {'type': 'update', 'state': dict_state}
-            await websocket.send_json(data)
-            if state.phase == hangman.GamePhase.FINISHED:
-                break
-            if len(list_action) > 0:
-                data = await websocket.receive_json()
-                if data['type'] == 'action':
-                    action = hangman.GuessLetterAction.model_validate(data['action'])
-                    game.apply_action(action)
-                    print(action)
-    except WebSocketDisconnect:
-        print('DISCONNECTED')
+@router.post("/sessions/release")
+async def sessions_release(request: Request, count: int = 1) -> Dict[str, int]:
+    """ Hand games of a busy worker over to the others: their clients reconnect and resume them elsewhere """
+    return {'released': await get_context(request).games.release(count)}
 
 
-# ----- Battleship -----
+# ----- Simulation -----
 
-@app.get("/battleship/simulation/", response_class=HTMLResponse)
-async def battleship_simulation(request: Request) -> _TemplateResponse:
-    return templates.TemplateResponse("game/battleship/simulation.html", {"request": request})
+class SimulationQuery(BaseModel):
+    cnt_games: int = Field(100, ge=1, le=MAX_GAMES)
+    bots: Optional[str] = None  # comma separated bot per seat
+    seed: Optional[int] = None
+    max_actions: int = MAX_ACTIONS
 
 
-@app.websocket("/battleship/simulation/ws")
-async def battleship_simulation_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
+@router.get("/simulation/{game_name}/run")
+async def simulation_run(request: Request, game_name: str,
+                         query: Annotated[SimulationQuery, Query()]) -> StreamingResponse:
+    """ Play cnt_games games headless (bots: comma separated bot per seat) and stream the statistics as NDJSON """
+    context = get_context(request)
+    cnt_games = query.cnt_games
+    try:
+        spec = get_game_spec(game_name)
+        await context.load_game(spec)
+        list_bot_name = query.bots.split(',') if query.bots else ['random'] * spec.cnt_player
+        for bot_name in list_bot_name:
+            spec.create_player(bot_name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    rng = random.Random(query.seed)
+    size_chunk = max(1, min(50, cnt_games // 32))
+
+    async def stream() -> AsyncIterator[str]:
+        stats = SimulationStats(game_name, list_bot_name, cnt_games)
+        set_task: Set['asyncio.Future[List[Dict[str, Any]]]'] = set()
+        cnt_submitted = 0
+        try:
+            while cnt_submitted < cnt_games or set_task:
+                while cnt_submitted < cnt_games and len(set_task) < MAX_CHUNKS_IN_FLIGHT:
+                    list_seed = [rng.getrandbits(32) for _ in range(min(size_chunk, cnt_games - cnt_submitted))]
+                    set_task.add(asyncio.ensure_future(context.simulation_executor.run(
+                        run_games, game_name, list_bot_name, list_seed, query.max_actions)))
+                    cnt_submitted += len(list_seed)
+                set_done, set_task = await asyncio.wait(set_task, return_when=asyncio.FIRST_COMPLETED)
+                for task in set_done:
+                    for result in task.result():
+                        stats.add(result)
+                    yield json.dumps(stats.to_dict()) + '\n'
+            yield json.dumps(stats.to_dict(is_final=True)) + '\n'
+        finally:
+            for task in set_task:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
+# ----- Rooms -----
+
+@router.websocket("/room/{game_name}/ws")
+async def room_ws(websocket: WebSocket, game_name: str, game_id: Optional[str] = None,
+                  seat: Optional[int] = None) -> None:
+    """ Join a room (a new one without game_id) and play at a seat, other players see every update """
+    context = get_context(websocket)
+    list_card = []
+    if game_name in get_list_game_name():
+        await context.load_game(get_game_spec(game_name))
+        list_card = get_game_spec(game_name).get_list_card()
+    connection = await accept_connection(websocket, list_card)
     try:
-        game = battleship.Battleship()
-        player = battleship.RandomPlayer()
+        spec = get_game_spec(game_name)
+        room = context.rooms.create_room(spec) if game_id is None else context.rooms.get_room(game_id)
+        if room.spec is not spec:
+            raise RoomError(f"Room '{room.game_id}' plays {room.spec.name}")
+        seat = context.rooms.join(room, connection, seat)
+    except (ValueError, RoomError) as e:
+        await connection.send({'type': 'error', 'message': str(e)})
+        await websocket.close(code=1013)
+        return
+    try:
+        await connection.send({'type': 'joined', 'game_id': room.game_id, 'seat': seat})
+        await room.start()
         while True:
-            state = game.get_state()
-            list_action = game.get_list_action()
-            action = None
-            if len(list_action) > 0:
-                action = player.select_action(state, list_action)
-            dict_state = state.model_dump()
-            dict_state['idx_player_you'] = idx_player_you
-            dict_state['list_action'] = []
-            dict_state['selected_action'] = None if action is None else action.model_dump()
-            data = {'type': 'update', 'state': dict_state}
-            await websocket.send_json(data)
-            if state.phase == battleship.GamePhase.FINISHED:
-                break
-            data = await websocket.receive_json()
-            if data['type'] == 'action':
-                action = battleship.BattleshipAction.model_validate(data['action'])
-                game.apply_action(action)
+            data = await connection.receive()
+            if get_message_type(data) == 'action':
+                try:
+                    if 'action' not in data:
+                        raise ValueError('The action message has no action')
+                    await room.apply_action(seat, data['action'], data.get('state_version'))
+                except (ValueError, RoomError) as e:
+                    await connection.send({'type': 'error', 'message': str(e)})
+                    await room.resend(seat)
     except WebSocketDisconnect:
-        print('DISCONNECTED')
+        logger_server.info('disconnected', extra={'game_id': room.game_id, 'seat': seat})
+    finally:
+        context.rooms.leave(room, seat)
+        if room.dict_connection:
+            await room.start()  # a bot takes over the free seat
+
+
+# ----- Spectators -----
+
+@router.get("/spectate/")
+async def spectate_list(request: Request) -> List[Dict[str, Any]]:
+    return get_context(request).spectators.get_list_channel()
+
+
+@router.websocket("/spectate/{game_id}/ws")
+async def spectate_ws(websocket: WebSocket, game_id: str) -> None:
+    """ Watch a running simulation, slow spectators skip updates and are dropped if they fall too far behind """
+    channel = get_context(websocket).spectators.get_channel(game_id)
+    list_card = [] if channel is None else get_game_spec(channel.game_name).get_list_card()
+    connection = await accept_connection(websocket, list_card)
+    if channel is None:
+        await connection.send({'type': 'error', 'message': f"There is no game '{game_id}' to watch"})
+        await websocket.close(code=1008)
+        return
+    subscriber = channel.subscribe(connection)
+    try:
+        await subscriber.run()
+        if not subscriber.is_disconnected:
+            await websocket.close(code=1013 if subscriber.is_dropped else 1000)
+    except SEND_ERRORS:
+        subscriber.is_disconnected = True
+    finally:
+        channel.unsubscribe(subscriber)
+    if subscriber.is_disconnected:
+        logger_server.info('disconnected', extra={'game_id': game_id})
 
 
-@app.get("/battleship/singleplayer", response_class=HTMLResponse)
-async def battleship_singleplayer(request: Request) -> _TemplateResponse:
-    return templates.TemplateResponse("game/battleship/singleplayer.html", {"request": request})
+# ----- Replays -----
 
+REPLAY_DELAY = 0.5  # seconds per turn at speed 1
+MAX_SPEED = 1000.0
 
-@app.websocket("/battleship/singleplayer/ws")
-async def battleship_singleplayer_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
+
+@router.websocket("/replay/{game_id}/ws")
+async def replay_ws(websocket: WebSocket, game_id: str, speed: Annotated[float, Query(ge=0, le=MAX_SPEED)] = 1.0,
+                    turn: Annotated[int, Query(ge=0)] = 0) -> None:
+    """ Stream a logged game turn by turn (speed 0: as fast as possible), the client may send
+    {'type': 'seek', 'turn': n} or {'type': 'speed', 'speed': x} at any time """
+    context = get_context(websocket)
+    try:
+        replayer = await context.engine_executor.run(context.replays.load, game_id)
+    except ValueError as e:
+        connection = await accept_connection(websocket)
+        await connection.send({'type': 'error', 'message': str(e)})
+        await websocket.close(code=1008)
+        return
+    connection = await accept_connection(websocket, replayer.spec.get_list_card())
+    session = context.engine_executor.session()
+    # one pending read for the whole replay: control messages are read between turns at every speed
+    task_receive: Optional['asyncio.Task[Any]'] = None
     try:
-        game = battleship.Battleship()
-        player = battleship.RandomPlayer()
         while True:
-            state = game.get_state()
-            if state.phase == battleship.GamePhase.FINISHED:
-                break
-            if state.idx_player_active == idx_player_you:
-                state = game.get_player_view(idx_player_you)
-                list_action = game.get_list_action()
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = [action.model_dump() for action in list_action]
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-                if len(list_action) > 0:
-                    data = await websocket.receive_json()
-                    if data['type'] == 'action':
-                        action = battleship.BattleshipAction.model_validate(data['action'])
-                        game.apply_action(action)
-                        print(action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-            else:
-                state = game.get_player_view(state.idx_player_active)
-                list_action = game.get_list_action()
-                next_action = player.select_action(state=state, actions=list_action)
-                if next_action is not None:
-                    await asyncio.sleep(1)
-                    game.apply_action(next_action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
+            timeout = None  # after the last turn, only wait for seek or speed messages
+            if turn <= replayer.cnt_turn:
+                data = await session.run(get_replay_update, replayer, turn)
+                await connection.send(data)
+                turn += 1
+                timeout = 0.0 if speed == 0 else REPLAY_DELAY / speed
+            if task_receive is None:
+                task_receive = asyncio.ensure_future(connection.receive())
+            await asyncio.wait((task_receive,), timeout=timeout)
+            if not task_receive.done():
+                continue
+            data, task_receive = task_receive.result(), None
+            try:
+                turn, speed = parse_replay_control(data, turn, speed)
+            except ValueError as e:
+                await connection.send({'type': 'error', 'message': str(e)})
     except WebSocketDisconnect:
-        print('DISCONNECTED')
+        logger_server.info('disconnected', extra={'game_id': game_id})
+    except ValueError as e:  # the log does not fit the engine
+        logger_server.warning('replay failed', extra={'game_id': game_id, 'error': str(e)})
+        await connection.send({'type': 'error', 'message': str(e)})
+        await websocket.close(code=1011)
+    finally:
+        if task_receive is not None:
+            task_receive.cancel()
+
+
+def parse_replay_control(data: Any, turn: int, speed: float) -> Tuple[int, float]:
+    """ The turn and speed after a control message of a replay client (ValueError if it is malformed) """
+    message_type = get_message_type(data)
+    try:
+        if message_type == 'seek':
+            turn = int(data['turn'])
+        elif message_type == 'speed':
+            speed = float(data['speed'])
+        else:
+            raise ValueError(f"Unknown message type '{message_type}', use seek or speed")
+    except (KeyError, TypeError) as e:
+        raise ValueError(f'Malformed {message_type} message') from e
+    if turn < 0 or not 0 <= speed <= MAX_SPEED:
+        raise ValueError(f'The turn must be at least 0 and the speed between 0 and {MAX_SPEED}')
+    return turn, speed
+
+
+def get_replay_update(replayer: Replayer, turn: int) -> Dict[str, Any]:
+    """ The full state of a turn and the action applied next, like a simulation update """
+    state = replayer.seek(turn)
+    data = build_simulation_update(state, 0, replayer.get_next_action())
+    data['state']['turn'] = replayer.turn
+    data['state']['cnt_turn'] = replayer.cnt_turn
+    return data
+
+
+# ----- Hangman -----
+
+@router.get("/hangman/singleplayer/local/", response_class=HTMLResponse)
+async def hangman_singleplayer(request: Request) -> _TemplateResponse:
+    return templates.TemplateResponse("game/hangman/singleplayer_local.html", {"request": request})
+
+
+# ----- Battleship -----
+
+@router.get("/battleship/simulation/", response_class=HTMLResponse)
+async def battleship_simulation(request: Request) -> _TemplateResponse:
+    return templates.TemplateResponse("game/battleship/simulation.html", {"request": request})
+
+
+@router.get("/battleship/singleplayer", response_class=HTMLResponse)
+async def battleship_singleplayer(request: Request) -> _TemplateResponse:
+    return templates.TemplateResponse("game/battleship/singleplayer.html", {"request": request})
 
 
 # ----- UNO -----
 
-@app.get("/uno/simulation/", response_class=HTMLResponse)
+@router.get("/uno/simulation/", response_class=HTMLResponse)
 async def uno_simulation(request: Request) -> _TemplateResponse:
     return templates.TemplateResponse("game/uno/simulation.html", {"request": request})
 
 
-@app.websocket("/uno/simulation/ws")
-async def uno_simulation_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
-    try:
-        game = uno.Uno()
-        state = uno.GameState(
-            list_card_draw=None,
-            list_card_discard=None,
-            list_player=[],
-            phase=uno.GamePhase.SETUP,
-            cnt_player=4,
-            idx_player_active=None,
-            direction=1,
-            color=None,
-            cnt_to_draw=0,
-            has_drawn=False
-        )
-        game.set_state(state)
-        player = uno.RandomPlayer()
-        while True:
-            state = game.get_state()
-            list_action = game.get_list_action()
-            action = player.select_action(state, list_action)
-            dict_state = state.model_dump()
-            dict_state['idx_player_you'] = idx_player_you
-            dict_state['list_action'] = []
-            dict_state['selected_action'] = None if action is None else action.model_dump()
-            data = {'type': 'update', 'state': dict_state}
-            await websocket.send_json(data)
-            if state.phase == uno.GamePhase.FINISHED:
-                break
-            data = await websocket.receive_json()
-            if data['type'] == 'action':
-                action = None
-                if data['action'] is not None:
-                    action = uno.Action.model_validate(data['action'])
-                game.apply_action(action)
-    except WebSocketDisconnect:
-        print('DISCONNECTED')
-
-
-@app.get("/uno/singleplayer", response_class=HTMLResponse)
+@router.get("/uno/singleplayer", response_class=HTMLResponse)
 async def uno_singleplayer(request: Request) -> _TemplateResponse:
     return templates.TemplateResponse("game/uno/singleplayer.html", {"request": request})
 
 
-@app.websocket("/uno/singleplayer/ws")
-async def uno_singleplayer_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
-    try:
-        game = uno.Uno()
-        state = uno.GameState(
-            list_card_draw=None,
-            list_card_discard=None,
-            list_player=[],
-            phase=uno.GamePhase.SETUP,
-            cnt_player=4,
-            idx_player_active=None,
-            direction=1,
-            color=None,
-            cnt_to_draw=0,
-            has_drawn=False
-        )
-        game.set_state(state)
-        player = uno.RandomPlayer()
-        while True:
-            state = game.get_state()
-            if state.phase == uno.GamePhase.FINISHED:
-                break
-            if state.idx_player_active == idx_player_you:
-                state = game.get_player_view(idx_player_you)
-                list_action = game.get_list_action()
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = [action.model_dump() for action in list_action]
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-                if len(list_action) > 0:
-                    data = await websocket.receive_json()
-                    if data['type'] == 'action':
-                        action = None
-                        if data['action'] is not None:
-                            action = uno.Action.model_validate(data['action'])
-                        game.apply_action(action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-            else:
-                state = game.get_player_view(state.idx_player_active)
-                list_action = game.get_list_action()
-                action = player.select_action(state, list_action)
-                if action is not None:
-                    await asyncio.sleep(0.5)
-                game.apply_action(action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-    except WebSocketDisconnect:
-        print('DISCONNECTED')
-
-
 # ----- Dog -----
 
-@app.get("/dog/simulation/", response_class=HTMLResponse)
+@router.get("/dog/simulation/", response_class=HTMLResponse)
 async def dog_simulation(request: Request) -> _TemplateResponse:
     return templates.TemplateResponse("game/dog/simulation.html", {"request": request})
 
 
-@app.websocket("/dog/simulation/ws")
-async def dog_simulation_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
-    try:
-        game = dog.Dog()
-        player = dog.RandomPlayer()
-        while True:
-            state = game.get_state()
-            list_action = game.get_list_action()
-            action = player.select_action(state, list_action)
-            dict_state = state.model_dump()
-            dict_state['idx_player_you'] = idx_player_you
-            dict_state['list_action'] = []
-            dict_state['selected_action'] = None if action is None else action.model_dump()
-            data = {'type': 'update', 'state': dict_state}
-            await websocket.send_json(data)
-            if state.phase == dog.GamePhase.FINISHED:
-                break
-            data = await websocket.receive_json()
-            if data['type'] == 'action':
-                action = None
-                if data['action'] is not None:
-                    action = dog.Action.model_validate(data['action'])
-                game.apply_action(action)
-    except WebSocketDisconnect:
-        print('DISCONNECTED')
-
-
-@app.get("/dog/singleplayer", response_class=HTMLResponse)
+@router.get("/dog/singleplayer", response_class=HTMLResponse)
 async def dog_singleplayer(request: Request) -> _TemplateResponse:
     return templates.TemplateResponse("game/dog/singleplayer.html", {"request": request})
 
 
-@app.websocket("/dog/singleplayer/ws")
-async def dog_singleplayer_ws(websocket: WebSocket) -> None:
-    await websocket.accept()
-    idx_player_you = 0
-    try:
-        game = dog.Dog()
-        player = dog.RandomPlayer()
-        gamestate = game.get_state()
-        gamestate.idx_player_started = idx_player_you
-        gamestate.idx_player_active = idx_player_you
-        gamestate.bool_card_exchanged = True
-        game.set_state(gamestate)
-
-        while True:
-            gamestate = game.get_state()
-            if gamestate.idx_player_active == idx_player_you:
-                state = game.get_player_view(idx_player_you)
-                list_action = game.get_list_action()
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = [action.model_dump() for action in list_action]
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-
-                if len(list_action) > 0:
-                    data = await websocket.receive_json()
-                    if data['type'] == 'action':
-                        action = None
-                        if data['action'] is not None:
-                            action = dog.Action.model_validate(data['action'])
-                        game.apply_action(action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-            else:
-                state = game.get_player_view(gamestate.idx_player_active)
-                list_action = game.get_list_action()
-                action = player.select_action(state, list_action)
-                if action is not None:
-                    await asyncio.sleep(0.5)
-                    game.apply_action(action)
-                state = game.get_player_view(idx_player_you)
-                dict_state = state.model_dump()
-                dict_state['idx_player_you'] = idx_player_you
-                dict_state['list_action'] = []
-                data = {'type': 'update', 'state': dict_state}
-                await websocket.send_json(data)
-    except WebSocketDisconnect:
-        print('DISCONNECTED')
+# ----- App -----
+
+def create_app(list_game_name: Optional[Sequence[str]] = None, preload: bool = False,
+               context: Optional[ServerContext] = None) -> FastAPI:
+    """ The app with the turn loops of the given games (all without names), preload imports their modules now
+
+    Without a context, the executors, stores and managers are configured by their own variables (e.g.
+    ENGINE_EXECUTOR, BOT_EXECUTOR, REPLAY_DIR, SNAPSHOT_STORE, SESSION_STORE, ROOMS_MAX, METRICS_ENABLED,
+    HANGMAN_WORDS). The app closes such a context when it shuts down, a given context is closed by its owner.
+    """
+    context_own: Optional[ServerContext] = None
+    if context is None:
+        context = context_own = create_context_from_env()
+    # game modules are imported with their first game, each import is reported as a startup step
+    startup = context.metrics.startup
+
+    def on_import(module_name: str, sec: float) -> None:
+        startup.add(f'import {module_name}', sec)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        yield
+        remove_import_listener(on_import)
+        if context_own is not None:
+            context_own.close()
+
+    with context.metrics.startup.span('create_app'):
+        with context.metrics.startup.span('entry_points'):
+            register_entry_points()
+        # new hangman games and solver bots draw from the word list of this context
+        set_hangman_words(context.hangman_words)
+        app_new = FastAPI(lifespan=lifespan)
+        app_new.state.context = context
+        with context.metrics.startup.span('static'):
+            mount_static_from_env(app_new, templates, "server/inc/static")
+        app_new.include_router(router)
+        add_import_listener(on_import)
+        # the simulation and singleplayer websockets of the games, /<game>/<mode>/ws for the modes of the registry
+        turn_loop = TurnLoop(context)
+        for spec in get_list_game_spec(list_game_name):
+            for mode in spec.list_mode:
+                app_new.add_api_websocket_route(f"/{spec.name}/{mode}/ws", turn_loop.get_endpoint(spec, mode))
+            if preload:
+                spec.get_module()
+    return app_new
+
+
+def create_app_from_env() -> FastAPI:
+    """ GAMES=uno,dog: a worker for some games only, GAMES_PRELOAD=1: import their modules before taking traffic
+
+    Log records are formatted and written by a logging thread (LOG_LEVEL, LOG_LEVEL_<GAME>, LOG_FORMAT=json|text).
+    """
+    configure_logging_from_env()
+    list_game_name = os.environ.get('GAMES')
+    return create_app(list_game_name.split(',') if list_game_name else None,
+                      preload=os.environ.get('GAMES_PRELOAD', '0') == '1')
+
+
+def __getattr__(name: str) -> Any:
+    """ `uvicorn server.py.main:app` builds the app on first access, importing this module starts nothing """
+    if name == 'app':
+        app_env = create_app_from_env()
+        globals()['app'] = app_env
+        return app_env
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
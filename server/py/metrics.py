@@ -0,0 +1,187 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import contextlib
+import os
+import threading
+import time
+from server.py.engine_executor import ExecutorMetrics
+from server.py.game_logging import get_logger
+
+# upper bounds in seconds, from a quick engine call to a slow bot or a client on a bad connection
+LIST_BUCKET = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_STAGE = 'game_stage_seconds'
+METRIC_STARTUP = 'server_startup_seconds'
+DICT_METRIC_EXECUTOR = {  # key of ExecutorMetrics.to_dict() -> metric name and type
+    'submitted': ('game_executor_submitted_total', 'counter'),
+    'completed': ('game_executor_completed_total', 'counter'),
+    'queue_depth': ('game_executor_queue_depth', 'gauge'),
+    'in_flight': ('game_executor_in_flight', 'gauge'),
+    'max_queue_depth': ('game_executor_max_queue_depth', 'gauge'),
+    'sec_wait_total': ('game_executor_wait_seconds_total', 'counter'),
+    'sec_run_total': ('game_executor_run_seconds_total', 'counter'),
+}
+
+
+class Histogram:
+    """ Durations of one stage, counted per bucket like a Prometheus histogram """
+
+    def __init__(self, list_bucket: Sequence[float] = LIST_BUCKET) -> None:
+        self.list_bucket = list_bucket
+        self.list_count = [0] * (len(list_bucket) + 1)  # the last bucket is +Inf
+        self.sec_sum = 0.0
+        self.cnt = 0
+        self._lock = threading.Lock()  # stages run on the event loop and in the engine threads
+
+    def observe(self, sec: float) -> None:
+        idx = bisect.bisect_left(self.list_bucket, sec)
+        with self._lock:
+            self.list_count[idx] += 1
+            self.sec_sum += sec
+            self.cnt += 1
+
+    def get_cumulative(self) -> Tuple[List[int], float, int]:
+        """ Get the cumulative count per bucket (incl. +Inf), the sum and the count """
+        with self._lock:
+            list_count, sec_sum, cnt = list(self.list_count), self.sec_sum, self.cnt
+        for idx in range(1, len(list_count)):
+            list_count[idx] += list_count[idx - 1]
+        return list_count, sec_sum, cnt
+
+
+class Span:
+    """ Times the block it guards and adds the duration to a histogram """
+
+    __slots__ = ('histogram', 'time_start')
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+        self.time_start = 0.0
+
+    def __enter__(self) -> 'Span':
+        self.time_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.histogram.observe(time.perf_counter() - self.time_start)
+
+
+class StageTimer:
+    """ The stage histograms of one game type, e.g. timer.span('get_player_view') """
+
+    def __init__(self) -> None:
+        self.dict_histogram: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def get_histogram(self, stage: str) -> Histogram:
+        histogram = self.dict_histogram.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.dict_histogram.setdefault(stage, Histogram())
+        return histogram
+
+    def span(self, stage: str) -> contextlib.AbstractContextManager:
+        return Span(self.get_histogram(stage))
+
+
+class NullTimer(StageTimer):
+    """ The timer handed out while metrics are disabled: a span costs one call and records nothing """
+
+    _span = contextlib.nullcontext()
+
+    def span(self, stage: str) -> contextlib.AbstractContextManager:
+        return self._span
+
+
+NULL_TIMER = NullTimer()
+
+
+class StartupTimer:
+    """ How long each step of the server start took, e.g. mounting the static files or importing a game module
+
+    Game modules are imported on first use, their import is added when it happens (not always at startup).
+    """
+
+    def __init__(self) -> None:
+        self.dict_sec: Dict[str, float] = {}
+        self.logger = get_logger('startup')
+
+    @contextlib.contextmanager
+    def span(self, step: str) -> Iterator[None]:
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(step, time.perf_counter() - time_start)
+
+    def add(self, step: str, sec: float) -> None:
+        self.dict_sec[step] = sec
+        self.logger.info('startup', extra={'step': step, 'ms': round(sec * 1000, 1)})
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class TurnMetrics:
+    """ Per-stage timings of the websocket turn loops, per game type, rendered in the Prometheus text format """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.dict_timer: Dict[str, StageTimer] = {}
+        self.dict_executor: Dict[str, ExecutorMetrics] = {}
+        self.startup = StartupTimer()
+
+    def get_timer(self, game_name: str) -> StageTimer:
+        if not self.enabled:
+            return NULL_TIMER
+        return self.dict_timer.setdefault(game_name, StageTimer())
+
+    def add_executor(self, name: str, metrics: ExecutorMetrics) -> None:
+        """ Also export the counters of an executor (queue depth, waiting and running time) """
+        self.dict_executor[name] = metrics
+
+    def render(self) -> str:
+        return '\n'.join(self._render_stages() + self._render_executors() + self._render_startup()) + '\n'
+
+    def _render_stages(self) -> List[str]:
+        list_line = [f'# HELP {METRIC_STAGE} Time spent in each stage of the websocket turn loop',
+                     f'# TYPE {METRIC_STAGE} histogram']
+        for game_name, timer in sorted(self.dict_timer.items()):
+            for stage, histogram in sorted(timer.dict_histogram.items()):
+                labels = f'game="{escape_label(game_name)}",stage="{escape_label(stage)}"'
+                list_count, sec_sum, cnt = histogram.get_cumulative()
+                for bound, count in zip(list(histogram.list_bucket) + [None], list_count):
+                    le = '+Inf' if bound is None else format_number(bound)
+                    list_line.append(f'{METRIC_STAGE}_bucket{{{labels},le="{le}"}} {count}')
+                list_line.append(f'{METRIC_STAGE}_sum{{{labels}}} {format_number(sec_sum)}')
+                list_line.append(f'{METRIC_STAGE}_count{{{labels}}} {cnt}')
+        return list_line
+
+    def _render_executors(self) -> List[str]:
+        list_line: List[str] = []
+        dict_executor = {name: metrics.to_dict() for name, metrics in sorted(self.dict_executor.items())}
+        for key, (name, kind) in DICT_METRIC_EXECUTOR.items() if dict_executor else ():
+            list_line.append(f'# TYPE {name} {kind}')
+            for executor_name, dict_value in dict_executor.items():
+                list_line.append(f'{name}{{executor="{escape_label(executor_name)}"}} '
+                                 f'{format_number(dict_value[key])}')
+        return list_line
+
+    def _render_startup(self) -> List[str]:
+        list_line = [f'# HELP {METRIC_STARTUP} Duration of each step of the server start',
+                     f'# TYPE {METRIC_STARTUP} gauge']
+        for step, sec in sorted(self.startup.dict_sec.items()):
+            list_line.append(f'{METRIC_STARTUP}{{step="{escape_label(step)}"}} {format_number(sec)}')
+        return list_line
+
+
+def create_metrics_from_env(dict_executor: Optional[Dict[str, ExecutorMetrics]] = None) -> TurnMetrics:
+    """ METRICS_ENABLED=0 turns the stage timings off """
+    metrics = TurnMetrics(enabled=os.environ.get('METRICS_ENABLED', '1') == '1')
+    for name, executor_metrics in (dict_executor or {}).items():
+        metrics.add_executor(name, executor_metrics)
+    return metrics
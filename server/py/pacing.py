@@ -0,0 +1,44 @@
+from typing import Optional
+import asyncio
+import os
+
+
+class BotPacer:
+    """ Shows bot moves at a fixed pace: the delay runs from the last update sent, while the bot is thinking """
+
+    def __init__(self, delay: float, turbo: bool = False) -> None:
+        self.delay = delay
+        self.turbo = turbo  # no delay at all, e.g. for automated load tests
+        self._time_shown: Optional[float] = None
+
+    def mark_shown(self) -> None:
+        """ Remember when the last update was sent, the next bot move is due one delay later """
+        self._time_shown = asyncio.get_running_loop().time()
+
+    def get_deadline(self) -> float:
+        loop = asyncio.get_running_loop()
+        if self._time_shown is None:
+            return loop.time() + self.delay
+        return self._time_shown + self.delay
+
+    async def wait(self) -> None:
+        """ Wait until the next bot move is due (returns at once if the bot already needed longer) """
+        if self.turbo:
+            return
+        remaining = self.get_deadline() - asyncio.get_running_loop().time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+
+class PacingScheduler:
+    """ Creates the pacers of all sessions, PACING_TURBO=1 disables all delays """
+
+    def __init__(self, turbo: bool = False) -> None:
+        self.turbo = turbo
+
+    def create_pacer(self, delay: float, turbo: bool = False) -> BotPacer:
+        return BotPacer(delay, turbo=self.turbo or turbo)
+
+
+def create_scheduler_from_env() -> PacingScheduler:
+    return PacingScheduler(turbo=os.environ.get('PACING_TURBO', '0') == '1')
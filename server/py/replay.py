@@ -0,0 +1,224 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import random
+import uuid
+import zlib
+from server.py.game import Game
+from server.py.game_registry import GameSpec, get_game_spec
+
+REPLAY_MAGIC = b'GRL1'
+REPLAY_EXTENSION = '.grl'
+FLUSH_INTERVAL = 64     # actions buffered before they are appended to the file
+SNAPSHOT_INTERVAL = 32  # turns between the snapshots a replayer keeps in memory
+
+# action codes: 0 = no action, 1 = raw action (JSON follows), n + 2 = the n-th action of get_list_action()
+CODE_NONE = 0
+CODE_RAW = 1
+CODE_INDEX = 2
+
+
+def write_varint(value: int) -> bytes:
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """ Read an unsigned LEB128 number, returns the value and the position after it """
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def write_blob(data: bytes) -> bytes:
+    return write_varint(len(data)) + data
+
+
+def read_blob(data: bytes, pos: int) -> Tuple[bytes, int]:
+    length, pos = read_varint(data, pos)
+    if pos + length > len(data):
+        raise ValueError('The replay log is cut off')
+    return data[pos:pos + length], pos + length
+
+
+def seed_turn(game: Game, seed: int, turn: int) -> None:
+    """ Seed the game's own generator for a turn, the engine draws the same numbers when the turn is replayed """
+    game.rng.seed(seed * 1_000_003 + turn)
+
+
+def encode_action(list_action: Sequence[Any], action: Any) -> bytes:
+    """ Encode an action as its index in the list of possible actions (a few bits instead of a JSON object)
+
+    Lazy action lists (Battleship) find the index without building their actions.
+    """
+    if action is None:
+        return write_varint(CODE_NONE)
+    try:
+        return write_varint(list_action.index(action) + CODE_INDEX)
+    except ValueError:
+        return write_varint(CODE_RAW) + write_blob(action.model_dump_json().encode())
+
+
+class ReplayRecorder:
+    """ Applies the actions of one game and appends them to its replay log
+
+    The log holds the game name, the seed, the initial state (compressed JSON) and one varint per action.
+    """
+
+    def __init__(self, game_name: str, game: Game, directory: Optional[str], seed: Optional[int] = None) -> None:
+        """ Without a directory nothing is written, the actions are only applied with the seeded generator """
+        self.game_name = game_name
+        self.game = game
+        self.game_id = uuid.uuid4().hex
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.cnt_turn = 0
+        self.path = None if directory is None else os.path.join(directory, self.game_id + REPLAY_EXTENSION)
+        self._buffer = bytearray()
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            state_json = game.get_state().model_dump_json().encode()
+            with open(self.path, 'wb') as file_replay:
+                file_replay.write(REPLAY_MAGIC + write_blob(game_name.encode()) + write_varint(self.seed)
+                                  + write_blob(zlib.compress(state_json, 9)))
+
+    def apply_action(self, action: Any, list_action: Optional[Sequence[Any]] = None) -> None:
+        """ Record and apply an action (runs inside the engine executor like game.apply_action)
+
+        list_action: the actions it was chosen from, callers which have them save a second get_list_action()
+        """
+        if self.path is not None:
+            if list_action is None:
+                list_action = self.game.get_list_action()
+            self._buffer += encode_action(list_action, action)
+        seed_turn(self.game, self.seed, self.cnt_turn)
+        self.game.apply_action(action)
+        self.cnt_turn += 1
+        if len(self._buffer) >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer and self.path is not None:
+            with open(self.path, 'ab') as file_replay:
+                file_replay.write(self._buffer)
+            self._buffer.clear()
+
+
+class ReplayLog:
+    """ A replay log read back from a file """
+
+    def __init__(self, data: bytes) -> None:
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError('Not a replay log')
+        pos = len(REPLAY_MAGIC)
+        self.list_code: List[Tuple[int, Optional[bytes]]] = []  # action code and, for raw actions, the JSON
+        try:
+            name, pos = read_blob(data, pos)
+            self.game_name = name.decode()
+            self.seed, pos = read_varint(data, pos)
+            state_compressed, pos = read_blob(data, pos)
+            self.state_initial: Dict[str, Any] = json.loads(zlib.decompress(state_compressed))
+            while pos < len(data):
+                code, pos = read_varint(data, pos)
+                raw = None
+                if code == CODE_RAW:
+                    raw, pos = read_blob(data, pos)
+                self.list_code.append((code, raw))
+        except (IndexError, zlib.error) as e:  # a varint runs past the end, the state is cut off
+            raise ValueError(f'The replay log is corrupt ({e})') from e
+
+    @classmethod
+    def from_file(cls, path: str) -> 'ReplayLog':
+        with open(path, 'rb') as file_replay:
+            return cls(file_replay.read())
+
+
+class Replayer:
+    """ Reconstructs any turn of a logged game, from the closest snapshot instead of from the start """
+
+    def __init__(self, log: ReplayLog, snapshot_interval: int = SNAPSHOT_INTERVAL) -> None:
+        self.log = log
+        self.spec: GameSpec = get_game_spec(log.game_name)
+        self.snapshot_interval = snapshot_interval
+        self.game = self.spec.create_game()
+        self._state_class = type(self.game.get_state())
+        self.game.set_state(self._state_class.model_validate(log.state_initial))
+        self.turn = 0
+        self._dict_snapshot: Dict[int, Any] = {0: self.game.get_state().model_copy(deep=True)}
+
+    @property
+    def cnt_turn(self) -> int:
+        return len(self.log.list_code)
+
+    def _decode_action(self, code: int, raw: Optional[bytes]) -> Any:
+        if code == CODE_NONE:
+            return None
+        if code == CODE_RAW:
+            return self.spec.parse_action(json.loads(raw or b'null'))
+        list_action = self.game.get_list_action()
+        if code - CODE_INDEX >= len(list_action):
+            raise ValueError(f'The replay log has action {code - CODE_INDEX} of {len(list_action)} at turn {self.turn}')
+        return list_action[code - CODE_INDEX]
+
+    def get_next_action(self) -> Any:
+        """ The action which was applied to the current state (None after the last turn) """
+        if self.turn >= self.cnt_turn:
+            return None
+        code, raw = self.log.list_code[self.turn]
+        return self._decode_action(code, raw)
+
+    def _step(self) -> None:
+        action = self.get_next_action()
+        seed_turn(self.game, self.log.seed, self.turn)
+        self.game.apply_action(action)
+        self.turn += 1
+        if self.turn % self.snapshot_interval == 0 and self.turn not in self._dict_snapshot:
+            self._dict_snapshot[self.turn] = self.game.get_state().model_copy(deep=True)
+
+    def seek(self, turn: int) -> Any:
+        """ Get the state after the given number of actions (0 = initial state) """
+        turn = max(0, min(turn, self.cnt_turn))
+        if turn < self.turn or turn - self.turn > self.snapshot_interval:
+            turn_snapshot = max(t for t in self._dict_snapshot if t <= turn)
+            if turn < self.turn or turn_snapshot > self.turn:
+                self.game.set_state(self._dict_snapshot[turn_snapshot].model_copy(deep=True))
+                self.turn = turn_snapshot
+        while self.turn < turn:
+            self._step()
+        return self.game.get_state()
+
+
+class ReplayStore:
+    """ The replay logs of all games, one file per game """
+
+    def __init__(self, directory: str, enabled: bool = True) -> None:
+        self.directory = directory
+        self.enabled = enabled
+
+    def create_recorder(self, game_name: str, game: Game) -> ReplayRecorder:
+        """ Create the recorder of a game, call it after the initial state was set """
+        return ReplayRecorder(game_name, game, self.directory if self.enabled else None)
+
+    def get_path(self, game_id: str) -> str:
+        if not game_id.isalnum():
+            raise ValueError(f"Invalid game id '{game_id}'")
+        return os.path.join(self.directory, game_id + REPLAY_EXTENSION)
+
+    def load(self, game_id: str) -> Replayer:
+        path = self.get_path(game_id)
+        if not os.path.exists(path):
+            raise ValueError(f"There is no replay of game '{game_id}'")
+        return Replayer(ReplayLog.from_file(path))
+
+
+def create_store_from_env() -> ReplayStore:
+    """ REPLAY_DIR: where the logs are written, REPLAY_ENABLED=0 turns recording off """
+    return ReplayStore(os.environ.get('REPLAY_DIR', 'replays'), enabled=os.environ.get('REPLAY_ENABLED', '1') == '1')
@@ -0,0 +1,209 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import time
+import uuid
+from server.py.game import Player
+from server.py.game_registry import GameSpec
+from server.py.engine_executor import EngineExecutor, EngineSession
+from server.py.game_updates import ViewCache
+from server.py.pacing import BotPacer, PacingScheduler
+from server.py.replay import ReplayRecorder, ReplayStore
+from server.py.simulation import select_action
+from server.py.wire import Connection
+
+
+class RoomError(Exception):
+    """ A room can't be created or joined (unknown id, seat taken, capacity reached) """
+
+
+def get_idx_player_active(state: Any) -> int:
+    """ Games with a single player (Hangman) or without an active player yet count as seat 0 """
+    idx: Optional[int] = getattr(state, 'idx_player_active', None)
+    return 0 if idx is None else idx
+
+
+class Room:
+    """ One table: a game, its seats and the connections of the humans, free seats are played by bots """
+
+    def __init__(self, game_id: str, spec: GameSpec, session: EngineSession, pacer: BotPacer) -> None:
+        self.game_id = game_id
+        self.spec = spec
+        self.cnt_player = spec.cnt_player
+        self.game = spec.create_game(self.cnt_player)
+        self.views = ViewCache(self.game)  # a reconnect or a bot takeover resends the cached updates
+        self.list_bot: List[Player] = [spec.create_player('random') for _ in range(self.cnt_player)]
+        self.dict_connection: Dict[int, Connection] = {}  # seat -> connection of a human
+        self.session = session
+        self.pacer = pacer
+        self.recorder = ReplayRecorder(spec.name, self.game, None)  # replaced by a logging one by the manager
+        self.lock = asyncio.Lock()
+        self.time_last_active = time.monotonic()
+
+    def touch(self) -> None:
+        self.time_last_active = time.monotonic()
+
+    def get_free_seat(self) -> Optional[int]:
+        for seat in range(self.cnt_player):
+            if seat not in self.dict_connection:
+                return seat
+        return None
+
+    async def broadcast(self) -> bool:
+        """ Send every seated human its own view, concurrently; returns False if the game is finished """
+        state = await self.session.run(self.game.get_state)
+        idx_active = get_idx_player_active(state)
+        list_seat = list(self.dict_connection)
+        list_update = [await self.session.run(self.views.get_player_update, seat, seat == idx_active)
+                       for seat in list_seat]
+        list_result = await asyncio.gather(
+            *(self.dict_connection[seat].send(data) for seat, (_, _, data) in zip(list_seat, list_update)),
+            return_exceptions=True)
+        for seat, result in zip(list_seat, list_result):
+            if isinstance(result, Exception):
+                self.dict_connection.pop(seat, None)
+        self.pacer.mark_shown()
+        return not self.spec.is_finished(state)
+
+    async def play_bots(self) -> None:
+        """ Let the bots play until a seat with a human is active (stops when no human is left)
+
+        The lock is not held while a bot's move waits for its pace, so humans can meanwhile rejoin or be sent
+        their update again. A move whose state changed during the wait is dropped and chosen anew.
+        """
+        while True:
+            async with self.lock:
+                turn = await self._choose_bot_action()
+            if turn is None:
+                return
+            seat, state_version, action, list_action = turn
+            await self.pacer.wait()
+            async with self.lock:
+                if self.game.state_version != state_version or seat in self.dict_connection:
+                    continue
+                await self.session.run(self.recorder.apply_action, action, list_action)
+                self.touch()
+                await self.broadcast()
+
+    async def _choose_bot_action(self) -> Optional[Tuple[int, int, Any, Sequence[Any]]]:
+        """ The seat, state version, action and actions of a bot's move, None if no bot has to move """
+        if not self.dict_connection:
+            return None
+        state = await self.session.run(self.game.get_state)
+        idx_active = get_idx_player_active(state)
+        if self.spec.is_finished(state) or idx_active in self.dict_connection:
+            return None
+        view, list_action = await self.session.run(self.views.get_view_and_actions, idx_active)
+        action = await self.session.run_bot(select_action, self.list_bot[idx_active], view, list_action)
+        return idx_active, self.game.state_version, action, list_action
+
+    async def apply_action(self, seat: int, data: Any, state_version: Optional[int] = None) -> None:
+        """ Apply the action of a human, but only if it is the active seat and (if given) the state is unchanged """
+        async with self.lock:
+            state = await self.session.run(self.game.get_state)
+            if get_idx_player_active(state) != seat or self.spec.is_finished(state):
+                raise RoomError('It is not your turn')
+            if state_version is not None and state_version != self.game.state_version:
+                raise RoomError('The game changed since the action was chosen')
+            action = self.spec.parse_action(data)
+            list_action = await self.session.run(self.views.get_list_action)
+            await self.session.run(self.recorder.apply_action, action, list_action)
+            self.touch()
+            await self.broadcast()
+        await self.play_bots()
+
+    async def resend(self, seat: int) -> None:
+        """ Send a seat its current update again, e.g. after a rejected action (the client drops its prediction) """
+        async with self.lock:
+            connection = self.dict_connection.get(seat)
+            if connection is not None:
+                state = await self.session.run(self.game.get_state)
+                update = await self.session.run(
+                    self.views.get_player_update, seat, seat == get_idx_player_active(state))
+                await connection.send(update[2])
+
+    async def start(self) -> None:
+        """ Send the current state to everybody and let the bots play if it's their turn """
+        async with self.lock:
+            await self.broadcast()
+        await self.play_bots()
+
+
+class RoomManager:
+    """ All rooms of this worker, with capacity limits and eviction of idle rooms """
+
+    def __init__(self, create_session: Callable[[], EngineSession], pacing: PacingScheduler, max_rooms: int = 10000,
+                 ttl: float = 600.0) -> None:
+        self.create_session = create_session  # the engine session of a new room
+        self.pacing = pacing
+        self.replays: Optional[ReplayStore] = None  # where the games of the rooms are logged
+        self.max_rooms = max_rooms
+        self.ttl = ttl  # seconds without any action or connection before a room is evicted
+        self.dict_room: Dict[str, Room] = {}
+        self._task_evict: Optional[asyncio.Task[None]] = None
+
+    def create_room(self, spec: GameSpec) -> Room:
+        if len(self.dict_room) >= self.max_rooms:
+            self.evict_idle()
+            if len(self.dict_room) >= self.max_rooms:
+                raise RoomError(f'Capacity of {self.max_rooms} rooms reached')
+        game_id = uuid.uuid4().hex
+        room = Room(game_id, spec, self.create_session(), self.pacing.create_pacer(spec.bot_delay))
+        if self.replays is not None:
+            room.recorder = self.replays.create_recorder(spec.name, room.game)
+        self.dict_room[game_id] = room
+        self._ensure_eviction()
+        return room
+
+    def get_room(self, game_id: str) -> Room:
+        room = self.dict_room.get(game_id)
+        if room is None:
+            raise RoomError(f"There is no room '{game_id}'")
+        return room
+
+    def join(self, room: Room, connection: Connection, seat: Optional[int] = None) -> int:
+        """ Seat a connection, at the given or the first free seat """
+        if seat is None:
+            seat = room.get_free_seat()
+            if seat is None:
+                raise RoomError('All seats are taken')
+        if not 0 <= seat < room.cnt_player:
+            raise RoomError(f'There is no seat {seat}')
+        if seat in room.dict_connection:
+            raise RoomError(f'Seat {seat} is taken')
+        room.dict_connection[seat] = connection
+        room.touch()
+        return seat
+
+    def leave(self, room: Room, seat: int) -> None:
+        room.dict_connection.pop(seat, None)
+        room.recorder.flush()
+        room.touch()
+
+    def evict_idle(self) -> int:
+        """ Remove rooms without connections which were idle for longer than the TTL """
+        time_limit = time.monotonic() - self.ttl
+        list_game_id = [game_id for game_id, room in self.dict_room.items()
+                        if not room.dict_connection and room.time_last_active < time_limit]
+        for game_id in list_game_id:
+            self.dict_room.pop(game_id).recorder.flush()
+        return len(list_game_id)
+
+    def _ensure_eviction(self) -> None:
+        if self._task_evict is None or self._task_evict.done():
+            self._task_evict = asyncio.create_task(self._evict_loop())
+
+    async def _evict_loop(self) -> None:
+        while self.dict_room:
+            await asyncio.sleep(min(60.0, self.ttl))
+            self.evict_idle()
+
+
+def create_room_manager_from_env(executor: EngineExecutor, executor_bot: EngineExecutor,
+                                 pacing: PacingScheduler, replays: Optional[ReplayStore] = None) -> RoomManager:
+    """ ROOMS_MAX: maximum number of rooms per worker, ROOMS_TTL: seconds until idle rooms are evicted """
+    manager = RoomManager(lambda: executor.session(executor_bot), pacing,
+                          max_rooms=int(os.environ.get('ROOMS_MAX', '10000')),
+                          ttl=float(os.environ.get('ROOMS_TTL', '600')))
+    manager.replays = replays
+    return manager
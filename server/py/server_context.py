@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+import os
+from server.py.engine_executor import EngineExecutor, create_executor_from_env
+from server.py.game_logging import configure_worker_logging_from_env
+from server.py.game_registry import PATH_HANGMAN_WORDS, GameSpec
+from server.py.metrics import TurnMetrics, create_metrics_from_env
+from server.py.pacing import PacingScheduler, create_scheduler_from_env
+from server.py.replay import ReplayStore, create_store_from_env
+from server.py.rooms import RoomManager, create_room_manager_from_env
+from server.py.sessions import GameManager, create_manager_from_env
+from server.py.snapshots import SnapshotWriter, create_writer_from_env
+from server.py.spectators import SpectatorHub, create_hub_from_env
+from server.py.word_corpus import WordCorpusService
+
+
+@dataclass
+class ServerContext:
+    """ The services shared by the handlers and turn loops of one app """
+    engine_executor: EngineExecutor  # engine calls, one session per game keeps them in order
+    bot_executor: EngineExecutor  # bot calls, may be a process pool for stateless bots
+    simulation_executor: EngineExecutor  # headless batch simulations
+    pacing: PacingScheduler  # delays of the bot moves shown to humans
+    replays: ReplayStore  # every game played is logged and can be replayed
+    snapshots: SnapshotWriter  # durable copies of the singleplayer games
+    games: GameManager  # the singleplayer games of this worker in the session store
+    rooms: RoomManager  # multiplayer tables
+    spectators: SpectatorHub  # simulation updates fanned out to their watchers
+    metrics: TurnMetrics  # stage timings, executor counters and startup steps
+    hangman_words: WordCorpusService  # words of new hangman games and of the solver bot, reloaded when changed
+
+    def close(self) -> None:
+        """ Write the queued snapshots and stop the executors (the app of this context shuts down) """
+        self.snapshots.close()
+        for executor in (self.engine_executor, self.bot_executor, self.simulation_executor):
+            executor.shutdown()
+
+    async def load_game(self, spec: GameSpec) -> None:
+        """ Import the game module on the engine executor, its first import would block every connection """
+        await self.engine_executor.run(spec.get_module)
+
+
+def create_context_from_env() -> ServerContext:
+    """ Each service is configured by its own variables, see the create_*_from_env function of its module """
+    # engine calls run on a thread pool, bots may use a process pool (BOT_EXECUTOR=process)
+    engine_executor = create_executor_from_env('ENGINE', 'thread')
+    bot_executor = create_executor_from_env('BOT', 'thread', configure_worker_logging_from_env)
+    simulation_executor = create_executor_from_env('SIMULATION', 'process', configure_worker_logging_from_env)
+    # bot moves are shown with a delay, which overlaps with the bot's thinking time (PACING_TURBO=1 or ?turbo=1: none)
+    pacing = create_scheduler_from_env()
+    replays = create_store_from_env()
+    snapshots = create_writer_from_env()
+    return ServerContext(
+        engine_executor=engine_executor, bot_executor=bot_executor, simulation_executor=simulation_executor,
+        pacing=pacing, replays=replays, snapshots=snapshots, games=create_manager_from_env(snapshots),
+        rooms=create_room_manager_from_env(engine_executor, bot_executor, pacing, replays),
+        spectators=create_hub_from_env(),
+        metrics=create_metrics_from_env({'engine': engine_executor.metrics, 'bot': bot_executor.metrics,
+                                         'simulation': simulation_executor.metrics}),
+        hangman_words=WordCorpusService(os.environ.get('HANGMAN_WORDS', PATH_HANGMAN_WORDS)))
@@ -0,0 +1,314 @@
+from typing import Any, Dict, Optional, Tuple
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from fastapi import WebSocket
+from server.py.engine_executor import EngineExecutor, EngineSession
+from server.py.game import Game
+from server.py.game_logging import configure_logging_from_env, get_logger
+from server.py.game_registry import get_game_spec
+from server.py.snapshots import SnapshotWriter, set_state_json
+
+SESSION_BACKENDS = ('memory', 'socket', 'off')
+SWEEP_INTERVAL = 1000  # puts between two sweeps for expired sessions
+
+# a session: game name, version in the store and the JSON of the state
+SessionRecord = Tuple[str, int, str]
+
+logger = get_logger('sessions')
+
+
+class SessionConflict(Exception):
+    """ The game was changed by another connection since it was loaded, its version in the store is newer """
+
+
+class SessionStore(metaclass=ABCMeta):
+    """ The current state of every running game, shared by the workers """
+
+    is_local = False  # the store lives in this process, only the connections of this worker can take a game over
+
+    @abstractmethod
+    def get(self, game_id: str) -> Optional[SessionRecord]:
+        pass
+
+    @abstractmethod
+    def put(self, game_id: str, game_name: str, state_json: str, version: int) -> int:
+        """ Store a state if the stored version is still the given one (0: the game must not exist yet)
+
+        Returns the new version, raises SessionConflict if somebody else stored a newer state in between.
+        """
+
+    @abstractmethod
+    def delete(self, game_id: str) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """ Sessions in this process: shared by the connections of one worker, or by all workers behind a socket server """
+
+    is_local = True
+
+    def __init__(self, ttl: float = 600.0) -> None:
+        self.ttl = ttl  # seconds without a put until a session expires
+        self._lock = threading.Lock()
+        self.dict_session: Dict[str, Tuple[SessionRecord, float]] = {}
+        self._cnt_put = 0
+
+    def get(self, game_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            item = self.dict_session.get(game_id)
+        return None if item is None else item[0]
+
+    def put(self, game_id: str, game_name: str, state_json: str, version: int) -> int:
+        time_now = time.monotonic()
+        with self._lock:
+            item = self.dict_session.get(game_id)
+            version_stored = 0 if item is None else item[0][1]
+            if version_stored != version:
+                raise SessionConflict(f"Game '{game_id}' is at version {version_stored}, not {version}")
+            self.dict_session[game_id] = ((game_name, version + 1, state_json), time_now)
+            self._cnt_put += 1
+            if self._cnt_put % SWEEP_INTERVAL == 0:
+                self._sweep(time_now - self.ttl)
+        return version + 1
+
+    def delete(self, game_id: str) -> None:
+        with self._lock:
+            self.dict_session.pop(game_id, None)
+
+    def _sweep(self, time_limit: float) -> None:
+        for game_id in [game_id for game_id, (_, time_put) in self.dict_session.items() if time_put < time_limit]:
+            del self.dict_session[game_id]
+
+
+def handle_request(store: SessionStore, request: Dict[str, Any]) -> Dict[str, Any]:
+    """ Answer one request of the socket protocol (one JSON object per line in both directions) """
+    op = request.get('op')
+    if op == 'get':
+        return {'record': store.get(request['game_id'])}
+    if op == 'put':
+        try:
+            return {'version': store.put(request['game_id'], request['game_name'], request['state'],
+                                         request['version'])}
+        except SessionConflict as e:
+            return {'error': 'conflict', 'message': str(e)}
+    if op == 'delete':
+        store.delete(request['game_id'])
+        return {}
+    return {'error': 'request', 'message': f"Unknown operation '{op}'"}
+
+
+async def serve(store: SessionStore, host: str, port: int) -> None:
+    """ Share a store with the workers of this host over a local socket (a stand-in for a Redis-like service) """
+
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                writer.write(json.dumps(handle_request(store, json.loads(line))).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError) as e:
+            logger.info('client dropped', extra={'error': str(e)})
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+class SocketSessionStore(SessionStore):
+    """ Client of the socket server, one connection per thread (calls block, run them on an executor) """
+
+    def __init__(self, host: str, port: int, timeout: float = 5.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        data = json.dumps(request).encode() + b'\n'
+        for attempt in range(2):  # a broken connection is opened again once
+            file_socket = getattr(self._local, 'file_socket', None)
+            try:
+                if file_socket is None:
+                    connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    file_socket = self._local.file_socket = connection.makefile('rwb')
+                file_socket.write(data)
+                file_socket.flush()
+                line = file_socket.readline()
+                if not line:
+                    raise ConnectionError('Session server closed the connection')
+                response: Dict[str, Any] = json.loads(line)
+                break
+            except OSError:
+                self._local.file_socket = None
+                if attempt == 1:
+                    raise
+        if response.get('error') == 'conflict':
+            raise SessionConflict(response['message'])
+        if 'error' in response:
+            raise ValueError(response['message'])
+        return response
+
+    def get(self, game_id: str) -> Optional[SessionRecord]:
+        record = self._request({'op': 'get', 'game_id': game_id})['record']
+        return None if record is None else (record[0], record[1], record[2])
+
+    def put(self, game_id: str, game_name: str, state_json: str, version: int) -> int:
+        response = self._request({'op': 'put', 'game_id': game_id, 'game_name': game_name, 'state': state_json,
+                                  'version': version})
+        new_version: int = response['version']
+        return new_version
+
+    def delete(self, game_id: str) -> None:
+        self._request({'op': 'delete', 'game_id': game_id})
+
+
+def dump_state(game: Game) -> str:
+    state_json: str = game.get_state().model_dump_json()
+    return state_json
+
+
+@dataclass
+class ManagedGame:
+    """ A game played on this worker, with the version of its state in the session store """
+    game_id: str
+    game_name: str
+    game: Game
+    session: EngineSession
+    websocket: WebSocket
+    version: int
+    is_stale: bool = False  # another connection took the game over, this one must not write it any more
+    is_dirty: bool = False  # actions were applied since the state was last written to the store
+    task_write: Optional['asyncio.Task[None]'] = None  # the write behind the actions, if one is running
+
+
+class GameManager:
+    """ The games of this worker, written to the session store behind the actions so any worker can take one over
+
+    Writes are optimistic: a write fails with SessionConflict if the game was written by another connection since
+    this one loaded it (e.g. the client reconnected to another worker), the older connection then gives up at its
+    next action. A turn never waits for the store: one write per game runs in the background and takes the latest
+    state, the actions applied meanwhile are coalesced into its next write. A store local to this process is only
+    written when the connection closes, as no other worker can read it.
+    """
+
+    def __init__(self, store: Optional[SessionStore], snapshots: SnapshotWriter, executor: EngineExecutor) -> None:
+        """ Without a store, games can only be resumed from their snapshots """
+        self.store = store
+        self.snapshots = snapshots  # durable copies, for games which are not in the store (any more)
+        self.executor = executor
+        self.dict_game: Dict[str, ManagedGame] = {}
+
+    async def open(self, session: EngineSession, game: Game, game_name: str, websocket: WebSocket) -> ManagedGame:
+        """ Continue the game of ?game_id= from the store or its snapshot, or start managing a new game """
+        game_id = websocket.query_params.get('game_id')
+        managed_before = None if game_id is None else self.dict_game.get(game_id)
+        if managed_before is not None:
+            # taken over on this worker: the older connection hands its latest state over and gives up
+            await self.flush(managed_before)
+            managed_before.is_stale = True
+        record = None
+        if game_id is not None and self.store is not None:
+            record = await self.executor.run(self.store.get, game_id)
+        if game_id is not None and record is not None and record[0] == game_name:
+            await session.run(set_state_json, game, record[2])
+            managed = ManagedGame(game_id, game_name, game, session, websocket, record[1])
+        else:
+            game_id = await self.snapshots.resume(session, game, game_name, game_id)
+            managed = ManagedGame(game_id, game_name, game, session, websocket, 0)
+            if self.store is not None:
+                state_json = await session.run(dump_state, game)
+                managed.version = await self.executor.run(self.store.put, game_id, game_name, state_json, 0)
+        self.dict_game[game_id] = managed
+        return managed
+
+    async def commit(self, managed: ManagedGame) -> None:
+        """ Note an action, its state is written behind (raises SessionConflict if another connection took over) """
+        if managed.is_stale:
+            raise SessionConflict(f"Game '{managed.game_id}' was continued on another connection")
+        managed.is_dirty = True
+        if self.store is not None and not self.store.is_local and \
+                (managed.task_write is None or managed.task_write.done()):
+            managed.task_write = asyncio.create_task(self._write_behind(managed))
+        await self.snapshots.save(managed.session, managed.game_id, managed.game_name, managed.game)
+
+    async def flush(self, managed: ManagedGame) -> None:
+        """ Wait until the latest state of the game is in the store """
+        if managed.task_write is not None:
+            await managed.task_write
+        await self._write_behind(managed)
+
+    async def _write_behind(self, managed: ManagedGame) -> None:
+        while self.store is not None and managed.is_dirty and not managed.is_stale:
+            managed.is_dirty = False
+            state_json = await managed.session.run(dump_state, managed.game)
+            try:
+                managed.version = await self.executor.run(
+                    self.store.put, managed.game_id, managed.game_name, state_json, managed.version)
+            except SessionConflict as e:
+                managed.is_stale = True
+                logger.info('taken over', extra={'game_id': managed.game_id, 'error': str(e)})
+            except (OSError, ValueError) as e:
+                managed.is_dirty = True  # written with the next action or when the connection closes
+                logger.warning('write failed', extra={'game_id': managed.game_id, 'error': str(e)})
+                return
+
+    async def close(self, managed: ManagedGame) -> None:
+        """ The connection is gone: finished games are removed, the others wait in the store for a reconnect """
+        if self.dict_game.get(managed.game_id) is managed:
+            del self.dict_game[managed.game_id]
+        self.snapshots.close_game(managed.game_id)
+        await self.flush(managed)
+        if managed.is_stale:
+            return
+        await self.snapshots.save_final(managed.session, managed.game_id, managed.game_name, managed.game)
+        state = await managed.session.run(managed.game.get_state)
+        if self.store is not None and get_game_spec(managed.game_name).is_finished(state):
+            await self.executor.run(self.store.delete, managed.game_id)
+
+    async def release(self, count: int) -> int:
+        """ Close the connections of up to count games (oldest first), their clients resume on another worker """
+        list_managed = list(self.dict_game.values())[:count]
+        for managed in list_managed:
+            await managed.websocket.close(code=1012)  # service restart: the clients reconnect
+        return len(list_managed)
+
+
+def create_session_store_from_env() -> Optional[SessionStore]:
+    """ SESSION_STORE=memory|socket|off, SESSION_ADDRESS: host:port of the socket server, SESSION_TTL: seconds """
+    backend = os.environ.get('SESSION_STORE', 'memory')
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown session store '{backend}', use one of {', '.join(SESSION_BACKENDS)}")
+    if backend == 'memory':
+        return MemorySessionStore(ttl=float(os.environ.get('SESSION_TTL', '600')))
+    if backend == 'socket':
+        host, port = os.environ.get('SESSION_ADDRESS', '127.0.0.1:8100').rsplit(':', 1)
+        return SocketSessionStore(host, int(port))
+    return None
+
+
+def create_manager_from_env(snapshots: SnapshotWriter) -> GameManager:
+    store = create_session_store_from_env()
+    # the in-process store answers at once, the socket client blocks and gets its own threads
+    executor = EngineExecutor('thread' if isinstance(store, SocketSessionStore) else 'inline')
+    return GameManager(store, snapshots, executor)
+
+
+if __name__ == '__main__':
+
+    # e.g. "python -m server.py.sessions --port 8100", then start the workers with SESSION_STORE=socket
+    parser = argparse.ArgumentParser(description='Session server shared by the uvicorn workers of a host')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--ttl', type=float, default=600.0, help='seconds until abandoned games expire')
+    args = parser.parse_args()
+    configure_logging_from_env()
+    asyncio.run(serve(MemorySessionStore(ttl=args.ttl), args.host, args.port))
@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Optional, Sequence, cast
+import os
+import random
+import time
+import traceback
+from server.py.game import Player
+from server.py.game_logging import get_logger
+from server.py.game_registry import GameSpec, get_game_spec
+
+MAX_ACTIONS = 10000
+MAX_GAMES = 100000  # per request
+MAX_CHUNKS_IN_FLIGHT = 32  # chunks of games submitted to the executor, the next one when one is done
+LIST_PERCENTILE = [10, 50, 90, 99]
+# what a buggy engine or bot raises, such a game is counted as an error and the batch goes on
+ENGINE_ERRORS = (ArithmeticError, AssertionError, AttributeError, LookupError, RuntimeError, TypeError, ValueError)
+
+logger = get_logger('simulation')
+
+
+def select_action(player: Player, state: Any, list_action: Sequence[Any]) -> Optional[Any]:
+    """ Let a bot select an action (None if there is nothing to do) """
+    if len(list_action) == 0:
+        return None
+    # lazy action views (e.g. Battleship shots) are passed on as they are, bots only need len() and indexing
+    return player.select_action(state, cast(List[Any], list_action))
+
+
+def play_game(spec: GameSpec, list_bot_name: List[str], max_actions: int, rng: random.Random) -> Dict[str, Any]:
+    """ Play one game until it is finished (or max_actions were applied), the game and its bots draw from rng """
+    game = spec.create_game(len(list_bot_name), rng)
+    list_player = [spec.create_player(bot_name) for bot_name in list_bot_name]
+    for player in list_player:
+        player.rng = rng
+    cnt_actions = 0
+    state = game.get_state()
+    while not spec.is_finished(state) and cnt_actions < max_actions:
+        idx_active = getattr(state, 'idx_player_active', None) or 0
+        list_action = game.get_list_action()
+        action = None
+        if len(list_action) > 0:
+            action = select_action(list_player[idx_active % len(list_player)], game.get_player_view(idx_active),
+                                   list_action)
+        game.apply_action(action)
+        cnt_actions += 1
+        state = game.get_state()
+    return {'finished': spec.is_finished(state), 'winner': spec.get_winner(state), 'cnt_actions': cnt_actions}
+
+
+def run_games(game_name: str, list_bot_name: List[str], list_seed: List[int],
+              max_actions: int = MAX_ACTIONS) -> List[Dict[str, Any]]:
+    """ Play games headless, one per seed (runs inside a worker process) """
+    spec = get_game_spec(game_name)
+    list_result = []
+    for seed in list_seed:
+        time_start = time.perf_counter()
+        try:
+            result = play_game(spec, list_bot_name, max_actions, random.Random(seed))
+        except ENGINE_ERRORS as e:
+            frame = traceback.extract_tb(e.__traceback__)[-1]
+            result = {'error': f'{type(e).__name__}: {e} ({os.path.basename(frame.filename)}:{frame.lineno})'}
+            logger.exception('game failed', extra={'game': game_name, 'seed': seed})
+        result['seed'] = seed
+        result['duration'] = time.perf_counter() - time_start
+        list_result.append(result)
+    return list_result
+
+
+def get_percentile(list_value: List[int], percentile: int) -> Optional[int]:
+    if len(list_value) == 0:
+        return None
+    list_sorted = sorted(list_value)
+    return list_sorted[min(len(list_sorted) - 1, len(list_sorted) * percentile // 100)]
+
+
+class SimulationStats:
+    """ Aggregated results of a batch of simulated games """
+
+    def __init__(self, game_name: str, list_bot_name: List[str], cnt_games: int) -> None:
+        self.game_name = game_name
+        self.list_bot_name = list_bot_name
+        self.cnt_games = cnt_games
+        self.cnt_done = 0
+        self.cnt_finished = 0
+        self.cnt_errors = 0
+        self.list_wins = [0] * len(list_bot_name)
+        self.list_game_length: List[int] = []
+        self.cnt_actions = 0
+        self.sec_engine = 0.0
+        self.list_error: List[str] = []
+        self.time_start = time.perf_counter()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.cnt_done += 1
+        self.sec_engine += result['duration']
+        if 'error' in result:
+            self.cnt_errors += 1
+            if len(self.list_error) < 5:
+                self.list_error.append(result['error'])
+            return
+        self.cnt_actions += result['cnt_actions']
+        if result['finished']:
+            self.cnt_finished += 1
+            self.list_game_length.append(result['cnt_actions'])
+        winner = result['winner']
+        if winner is not None and 0 <= winner < len(self.list_wins):
+            self.list_wins[winner] += 1
+
+    def to_dict(self, is_final: bool = False) -> Dict[str, Any]:
+        sec_wall = time.perf_counter() - self.time_start
+        return {
+            'type': 'result' if is_final else 'progress',
+            'game': self.game_name,
+            'bots': self.list_bot_name,
+            'cnt_games': self.cnt_games,
+            'cnt_done': self.cnt_done,
+            'cnt_finished': self.cnt_finished,
+            'cnt_errors': self.cnt_errors,
+            'win_rate': [wins / self.cnt_done if self.cnt_done else 0.0 for wins in self.list_wins],
+            'game_length': {
+                'mean': sum(self.list_game_length) / len(self.list_game_length) if self.list_game_length else None,
+                'min': min(self.list_game_length, default=None),
+                'max': max(self.list_game_length, default=None),
+                **{f'p{p}': get_percentile(self.list_game_length, p) for p in LIST_PERCENTILE},
+            },
+            'actions_per_sec': self.cnt_actions / self.sec_engine if self.sec_engine else 0.0,
+            'games_per_sec': self.cnt_done / sec_wall if sec_wall else 0.0,
+            'errors': self.list_error,
+        }
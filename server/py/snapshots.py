@@ -0,0 +1,262 @@
+from typing import Dict, List, Optional, Tuple, Union
+from abc import ABCMeta, abstractmethod
+import asyncio
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from server.py.engine_executor import EngineExecutor, EngineSession
+from server.py.game import Game
+from server.py.game_registry import get_game_spec
+from server.py.game_logging import get_logger
+
+SNAPSHOT_BACKENDS = ('memory', 'sqlite', 'off')
+
+# a snapshot: game name, state version and the compressed JSON of the state, None = delete the snapshot
+Snapshot = Tuple[str, int, bytes]
+
+logger = get_logger('snapshots')
+
+
+class SnapshotStore(metaclass=ABCMeta):
+    """ Where the snapshots are kept, one per game id """
+
+    @abstractmethod
+    def save_many(self, list_item: List[Tuple[str, Optional[Snapshot]]]) -> None:
+        pass
+
+    @abstractmethod
+    def load(self, game_id: str) -> Optional[Snapshot]:
+        pass
+
+    @abstractmethod
+    def delete_older_than(self, time_limit: float) -> int:
+        pass
+
+
+class MemorySnapshotStore(SnapshotStore):
+    """ Snapshots in this process only (survives reconnects, not restarts) """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.dict_snapshot: Dict[str, Tuple[Snapshot, float]] = {}
+
+    def save_many(self, list_item: List[Tuple[str, Optional[Snapshot]]]) -> None:
+        time_saved = time.time()
+        with self._lock:
+            for game_id, snapshot in list_item:
+                if snapshot is None:
+                    self.dict_snapshot.pop(game_id, None)
+                else:
+                    self.dict_snapshot[game_id] = (snapshot, time_saved)
+
+    def load(self, game_id: str) -> Optional[Snapshot]:
+        with self._lock:
+            item = self.dict_snapshot.get(game_id)
+        return None if item is None else item[0]
+
+    def delete_older_than(self, time_limit: float) -> int:
+        with self._lock:
+            list_game_id = [game_id for game_id, (_, time_saved) in self.dict_snapshot.items()
+                            if time_saved < time_limit]
+            for game_id in list_game_id:
+                del self.dict_snapshot[game_id]
+        return len(list_game_id)
+
+
+class SqliteSnapshotStore(SnapshotStore):
+    """ Snapshots in a SQLite file, shared by all workers of a host (WAL mode, one transaction per batch) """
+
+    def __init__(self, path: str) -> None:
+        """ The file is created when it is first used, not when the store is configured """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _get_db(self) -> sqlite3.Connection:
+        """ The connection, opened on first use (call with the lock held) """
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS snapshot (game_id TEXT PRIMARY KEY, game_name TEXT NOT NULL, '
+                       'version INTEGER NOT NULL, state BLOB NOT NULL, time_saved REAL NOT NULL)')
+            self._db = db
+        return self._db
+
+    def save_many(self, list_item: List[Tuple[str, Optional[Snapshot]]]) -> None:
+        time_saved = time.time()
+        list_upsert = [(game_id, *snapshot, time_saved) for game_id, snapshot in list_item if snapshot is not None]
+        list_delete = [(game_id,) for game_id, snapshot in list_item if snapshot is None]
+        with self._lock:
+            db = self._get_db()
+            db.execute('BEGIN')
+            try:
+                db.executemany('INSERT OR REPLACE INTO snapshot VALUES (?, ?, ?, ?, ?)', list_upsert)
+                db.executemany('DELETE FROM snapshot WHERE game_id = ?', list_delete)
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                db.execute('ROLLBACK')
+                raise
+
+    def load(self, game_id: str) -> Optional[Snapshot]:
+        if not os.path.exists(self.path):
+            return None  # nothing was saved yet, the file is not created for a lookup
+        with self._lock:
+            row = self._get_db().execute('SELECT game_name, version, state FROM snapshot WHERE game_id = ?',
+                                         (game_id,)).fetchone()
+        return None if row is None else (row[0], row[1], row[2])
+
+    def delete_older_than(self, time_limit: float) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with self._lock:
+            return self._get_db().execute('DELETE FROM snapshot WHERE time_saved < ?', (time_limit,)).rowcount
+
+
+class SnapshotWriter:
+    """ Write-behind of the game states: a snapshot every few actions, written in batches by a background task
+
+    The state is dumped in the game's engine session (only when a snapshot is due), compressing and writing
+    happen on the writer's own thread, so a turn never waits for the store. Only the newest snapshot of a
+    game is kept until the next batch; a crash loses at most the actions since the last written one.
+    """
+
+    def __init__(self, store: Optional[SnapshotStore], every: int = 8, flush_interval: float = 1.0,
+                 ttl: float = 86400.0) -> None:
+        """ Without a store nothing is saved and nothing can be resumed """
+        self.store = store
+        self.every = every  # actions between two snapshots of a game
+        self.flush_interval = flush_interval  # seconds between two batches
+        self.ttl = ttl  # seconds until the snapshot of an abandoned game is deleted
+        self.executor = EngineExecutor('thread', 1)  # a single writer keeps the batches in order
+        self._lock = threading.Lock()
+        self._dict_pending: Dict[str, Tuple[str, int, Optional[bytes]]] = {}  # game id -> name, version, JSON
+        self._dict_version_saved: Dict[str, int] = {}
+        self._task_flush: Optional[asyncio.Task[None]] = None
+        self._time_cleanup = 0.0
+        if store is not None:
+            atexit.register(self.flush_pending)  # a process which exits without close() still writes its last batch
+
+    async def resume(self, session: EngineSession, game: Game, game_name: str, game_id: Optional[str]) -> str:
+        """ Restore the snapshot of a game id into game, returns the id the game is saved under from now on
+
+        An unknown (or expired) id starts a new game with a new id.
+        """
+        if game_id is not None and self.store is not None:
+            snapshot = await self.executor.run(self.store.load, game_id)
+            if snapshot is not None and snapshot[0] == game_name:
+                await session.run(set_state_json, game, zlib.decompress(snapshot[2]))
+                self._dict_version_saved[game_id] = game.state_version
+                return game_id
+            logger.info('unknown game', extra={'game_id': game_id})
+        return uuid.uuid4().hex
+
+    async def save(self, session: EngineSession, game_id: str, game_name: str, game: Game) -> None:
+        """ Queue a snapshot once `every` actions were applied since the last one """
+        if self._is_due(game_id, game, self.every):
+            await self._queue(session, game_id, game_name, game)
+
+    async def save_final(self, session: EngineSession, game_id: str, game_name: str, game: Game) -> None:
+        """ Queue a snapshot if anything changed since the last one (the connection of the game is gone) """
+        if self._is_due(game_id, game, 1):
+            await self._queue(session, game_id, game_name, game)
+
+    def _is_due(self, game_id: str, game: Game, cnt_action: int) -> bool:
+        return self.store is not None and game.state_version - self._dict_version_saved.get(game_id, 0) >= cnt_action
+
+    async def _queue(self, session: EngineSession, game_id: str, game_name: str, game: Game) -> None:
+        self._dict_version_saved[game_id] = game.state_version
+        await session.run(self.capture, game_id, game_name, game)
+        self._ensure_flush()
+
+    def capture(self, game_id: str, game_name: str, game: Game) -> None:
+        """ Dump the state (runs in the engine session), finished games are removed from the store instead """
+        state = game.get_state()
+        state_json = None if get_game_spec(game_name).is_finished(state) else state.model_dump_json().encode()
+        with self._lock:
+            self._dict_pending[game_id] = (game_name, game.state_version, state_json)
+
+    def close_game(self, game_id: str) -> None:
+        """ Forget the saved version of a game whose connection is gone (its snapshot stays until the TTL) """
+        self._dict_version_saved.pop(game_id, None)
+
+    def _take_batch(self) -> List[Tuple[str, Optional[Snapshot]]]:
+        with self._lock:
+            dict_pending, self._dict_pending = self._dict_pending, {}
+        return [(game_id, None if state_json is None else (game_name, version, zlib.compress(state_json)))
+                for game_id, (game_name, version, state_json) in dict_pending.items()]
+
+    def flush_pending(self) -> int:
+        """ Compress and write all queued snapshots in one batch (blocking), returns their number """
+        if self.store is None:
+            return 0
+        list_item = self._take_batch()
+        if list_item:
+            self.store.save_many(list_item)
+        if time.monotonic() > self._time_cleanup:
+            self._time_cleanup = time.monotonic() + min(3600.0, self.ttl)
+            self.store.delete_older_than(time.time() - self.ttl)
+        return len(list_item)
+
+    def close(self) -> None:
+        """ Write the queued snapshots and stop the writer (its app shuts down), it is not called at exit any more """
+        task = self._task_flush
+        if task is not None and not task.done():
+            task.cancel()
+        try:
+            self.flush_pending()
+        finally:
+            atexit.unregister(self.flush_pending)
+            self.executor.shutdown()
+
+    def _ensure_flush(self) -> None:
+        task = self._task_flush
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._task_flush = asyncio.create_task(self._flush_loop())
+            self._task_flush.add_done_callback(log_flush_failure)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if await self.executor.run(self.flush_pending) == 0 and not self._dict_pending:
+                    return  # nothing left to do, the next snapshot starts the loop again
+            except (sqlite3.Error, OSError) as e:
+                logger.warning('snapshots not written', extra={'error': str(e)})
+
+
+def log_flush_failure(task: 'asyncio.Task[None]') -> None:
+    """ Log what ended a flush loop unexpectedly (the next snapshot starts a new loop) """
+    if not task.cancelled() and task.exception() is not None:
+        logger.error('snapshot flusher failed', exc_info=task.exception())
+
+
+def set_state_json(game: Game, state_json: Union[str, bytes]) -> None:
+    """ Set the state of a game from its JSON dump (run it in the game's engine session) """
+    state_class = type(game.get_state())
+    game.set_state(state_class.model_validate_json(state_json))
+
+
+def create_writer_from_env() -> SnapshotWriter:
+    """ SNAPSHOT_STORE=memory|sqlite|off, SNAPSHOT_PATH: the SQLite file, SNAPSHOT_EVERY: actions between
+    snapshots, SNAPSHOT_FLUSH: seconds between batches, SNAPSHOT_TTL: seconds until abandoned games expire
+
+    The default SQLite file survives restarts and is shared by the workers of a host, SNAPSHOT_STORE=memory keeps
+    the snapshots in this process (e.g. for tests).
+    """
+    backend = os.environ.get('SNAPSHOT_STORE', 'sqlite')
+    if backend not in SNAPSHOT_BACKENDS:
+        raise ValueError(f"Unknown snapshot store '{backend}', use one of {', '.join(SNAPSHOT_BACKENDS)}")
+    store: Optional[SnapshotStore] = None
+    if backend == 'sqlite':
+        store = SqliteSnapshotStore(os.environ.get('SNAPSHOT_PATH', 'snapshots/games.sqlite3'))
+    elif backend == 'memory':
+        store = MemorySnapshotStore()
+    return SnapshotWriter(store, every=int(os.environ.get('SNAPSHOT_EVERY', '8')),
+                          flush_interval=float(os.environ.get('SNAPSHOT_FLUSH', '1.0')),
+                          ttl=float(os.environ.get('SNAPSHOT_TTL', '86400')))
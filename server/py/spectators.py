@@ -0,0 +1,146 @@
+from typing import Any, Dict, List, Optional, Set, Union
+import asyncio
+import os
+import uuid
+from server.py.wire import SEND_ERRORS, Connection
+
+Frame = Union[str, bytes]
+
+
+class Subscriber:
+    """ One spectator with a bounded buffer of encoded frames, written by its own websocket handler """
+
+    def __init__(self, connection: Connection, max_buffer: int, max_skipped: int) -> None:
+        self.connection = connection
+        self.queue: asyncio.Queue[Optional[Frame]] = asyncio.Queue(maxsize=max_buffer)
+        self.max_skipped = max_skipped  # frames skipped in a row before the spectator is dropped
+        self.cnt_skipped = 0
+        self.is_dropped = False
+        self.is_disconnected = False
+
+    def offer(self, frame: Frame) -> bool:
+        """ Queue a frame without ever waiting: the oldest frame is skipped if the buffer is full
+
+        Every update is a full state, so a skipped frame only means a spectator misses an intermediate turn.
+        Returns False if the spectator fell too far behind and has to be dropped.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.cnt_skipped += 1
+            if self.cnt_skipped > self.max_skipped:
+                self.close(is_dropped=True)
+                return False
+        else:
+            self.cnt_skipped = 0
+        self.queue.put_nowait(frame)
+        return True
+
+    def close(self, is_dropped: bool = False) -> None:
+        """ Stop the writer after the buffered frames (None is the end marker), a dropped spectator gets none """
+        self.is_dropped = is_dropped
+        while not self.queue.empty() and (is_dropped or self.queue.full()):
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def run(self) -> None:
+        """ Write the frames until the channel is closed, the spectator is dropped or it disconnects
+
+        The socket is read at the same time, so a spectator who left is noticed at once and not at the next update.
+        """
+        task_read = asyncio.create_task(self.read_until_disconnect())
+        try:
+            while True:
+                task_frame = asyncio.create_task(self.queue.get())
+                await asyncio.wait((task_frame, task_read), return_when=asyncio.FIRST_COMPLETED)
+                if task_read.done():
+                    task_frame.cancel()
+                    self.is_disconnected = True
+                    return
+                frame = task_frame.result()
+                if frame is None:
+                    return
+                await self.connection.codec.send_frame(self.connection.websocket, frame)
+        except SEND_ERRORS:
+            self.is_disconnected = True
+        finally:
+            task_read.cancel()
+
+    async def read_until_disconnect(self) -> None:
+        """ Ignore whatever the spectator sends, a failed read counts as a disconnect as well """
+        try:
+            while (await self.connection.websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+        except SEND_ERRORS:
+            pass
+
+
+class SpectatorChannel:
+    """ The updates of one game for all its spectators, each update is encoded once per wire format """
+
+    def __init__(self, game_id: str, game_name: str, max_buffer: int, max_skipped: int) -> None:
+        self.game_id = game_id
+        self.game_name = game_name
+        self.max_buffer = max_buffer
+        self.max_skipped = max_skipped
+        self.set_subscriber: Set[Subscriber] = set()
+        self.message_last: Optional[Dict[str, Any]] = None
+        self.cnt_dropped = 0
+
+    def subscribe(self, connection: Connection) -> Subscriber:
+        subscriber = Subscriber(connection, self.max_buffer, self.max_skipped)
+        self.set_subscriber.add(subscriber)
+        if self.message_last is not None:  # late spectators start with the current state
+            subscriber.offer(connection.codec.encode(self.message_last))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.set_subscriber.discard(subscriber)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """ Encode the message once per wire format and queue the same frame for every spectator (never waits) """
+        self.message_last = message
+        dict_frame: Dict[str, Frame] = {}
+        for subscriber in list(self.set_subscriber):
+            codec = subscriber.connection.codec
+            frame = dict_frame.get(codec.format)
+            if frame is None:
+                frame = dict_frame[codec.format] = codec.encode(message)
+            if not subscriber.offer(frame):
+                self.set_subscriber.discard(subscriber)
+                self.cnt_dropped += 1
+
+    def close(self) -> None:
+        for subscriber in self.set_subscriber:
+            subscriber.close()
+        self.set_subscriber.clear()
+
+
+class SpectatorHub:
+    """ The spectator channels of all running games """
+
+    def __init__(self, max_buffer: int = 8, max_skipped: int = 64) -> None:
+        self.max_buffer = max_buffer
+        self.max_skipped = max_skipped
+        self.dict_channel: Dict[str, SpectatorChannel] = {}
+
+    def create_channel(self, game_name: str) -> SpectatorChannel:
+        channel = SpectatorChannel(uuid.uuid4().hex, game_name, self.max_buffer, self.max_skipped)
+        self.dict_channel[channel.game_id] = channel
+        return channel
+
+    def get_channel(self, game_id: str) -> Optional[SpectatorChannel]:
+        return self.dict_channel.get(game_id)
+
+    def close_channel(self, channel: SpectatorChannel) -> None:
+        channel.close()
+        self.dict_channel.pop(channel.game_id, None)
+
+    def get_list_channel(self) -> List[Dict[str, Any]]:
+        return [{'game_id': channel.game_id, 'game': channel.game_name, 'cnt_spectators': len(channel.set_subscriber)}
+                for channel in self.dict_channel.values()]
+
+
+def create_hub_from_env() -> SpectatorHub:
+    """ SPECTATOR_BUFFER: frames buffered per spectator, SPECTATOR_MAX_SKIPPED: skipped in a row until dropped """
+    return SpectatorHub(max_buffer=int(os.environ.get('SPECTATOR_BUFFER', '8')),
+                        max_skipped=int(os.environ.get('SPECTATOR_MAX_SKIPPED', '64')))
@@ -0,0 +1,90 @@
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+from PIL import Image
+
+ATLAS_NAME = 'atlas'  # img/atlas.png and img/atlas.json next to the single images
+MAX_WIDTH = 4096  # texture size every browser and GPU handles
+PADDING = 2  # transparent pixels between sprites, scaled drawing doesn't bleed into the neighbours
+
+# per game: directories below img/ and the scale of their images in the atlas. The images are drawn at about
+# a third of their size (cards) or at full size (boards and balls), the atlas keeps twice the drawn resolution.
+DICT_ATLAS_GROUPS: Dict[str, List[Tuple[str, float]]] = {
+    'dog': [('boards', 1.0), ('balls', 1.0), ('cards', 0.6)],
+    'uno': [('cards', 0.66)],
+}
+
+# a sprite: its path below img/ (the 'src' of the assets in game.js) and the image scaled for the atlas
+Sprite = Tuple[str, Image.Image, Tuple[int, int]]
+
+
+def load_sprites(dir_img: str, list_group: List[Tuple[str, float]]) -> List[Sprite]:
+    list_sprite: List[Sprite] = []
+    for dir_group, scale in list_group:
+        for name in sorted(os.listdir(os.path.join(dir_img, dir_group))):
+            if not name.endswith('.png'):
+                continue
+            with Image.open(os.path.join(dir_img, dir_group, name)) as img_source:
+                img = img_source.convert('RGBA')
+            size_source = img.size
+            if scale != 1.0:
+                img = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+            list_sprite.append((f'{dir_group}/{name}', img, size_source))
+    return list_sprite
+
+
+def pack_shelves(list_size: List[Tuple[int, int]], max_width: int = MAX_WIDTH,
+                 padding: int = PADDING) -> Tuple[List[Tuple[int, int]], int, int]:
+    """ Place rectangles on shelves (rows), tallest first, returns their positions and the size of the atlas """
+    list_idx = sorted(range(len(list_size)), key=lambda idx: (-list_size[idx][1], -list_size[idx][0]))
+    list_pos = [(0, 0)] * len(list_size)
+    x, y, height_shelf, width = 0, 0, 0, 0
+    for idx in list_idx:
+        w, h = list_size[idx]
+        if w > max_width:
+            raise ValueError(f'Image of width {w} does not fit into an atlas of width {max_width}')
+        if x + w > max_width:
+            x, y, height_shelf = 0, y + height_shelf + padding, 0
+        list_pos[idx] = (x, y)
+        x += w + padding
+        height_shelf = max(height_shelf, h)
+        width = max(width, x - padding)
+    return list_pos, width, y + height_shelf
+
+
+def build_atlas(dir_img: str, list_group: List[Tuple[str, float]]) -> Tuple[Image.Image, Dict[str, object]]:
+    """ Pack the images of a game into one image, with the map of where each one is """
+    list_sprite = load_sprites(dir_img, list_group)
+    list_pos, width, height = pack_shelves([img.size for _, img, _ in list_sprite])
+    img_atlas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    dict_sprite = {}
+    for (src, img, size_source), (x, y) in zip(list_sprite, list_pos):
+        img_atlas.paste(img, (x, y))
+        # x, y, w, h: the sprite in the atlas, source_w, source_h: the size of the single image (default draw size)
+        dict_sprite[src] = {'x': x, 'y': y, 'w': img.width, 'h': img.height,
+                            'source_w': size_source[0], 'source_h': size_source[1]}
+    return img_atlas, {'image': f'{ATLAS_NAME}.png', 'width': width, 'height': height, 'sprites': dict_sprite}
+
+
+def write_atlas(dir_static: str, game_name: str) -> str:
+    dir_img = os.path.join(dir_static, 'game', game_name, 'img')
+    img_atlas, dict_atlas = build_atlas(dir_img, DICT_ATLAS_GROUPS[game_name])
+    path_png = os.path.join(dir_img, f'{ATLAS_NAME}.png')
+    img_atlas.save(path_png, optimize=True)
+    with open(os.path.join(dir_img, f'{ATLAS_NAME}.json'), 'w', encoding='utf-8') as file_json:
+        json.dump(dict_atlas, file_json, indent=1)
+    return path_png
+
+
+if __name__ == '__main__':
+
+    # e.g. "python -m server.py.sprite_atlas" after changing any of the card, board or ball images. The atlases
+    # are committed, the server only serves them, so Pillow is in requirements-build.txt and not needed to run it
+    parser = argparse.ArgumentParser(description='Pack the images of the games into sprite atlases')
+    parser.add_argument('--static', default='server/inc/static', help='the static directory')
+    parser.add_argument('games', nargs='*', default=list(DICT_ATLAS_GROUPS), help='games to pack (default: all)')
+    args = parser.parse_args()
+    for game in args.games:
+        path = write_atlas(args.static, game)
+        print(f'{game}: {path} ({os.path.getsize(path)} bytes)')
@@ -0,0 +1,258 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import contextlib
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+URL_STATIC = '/inc/static'
+PREFIX_VERSIONED_DIR = '_v'  # /inc/static/_v/<hash of the directory>/<path in the directory>
+TEXT_EXTENSIONS = ('.js', '.css', '.json', '.html', '.svg', '.txt', '.ttf', '.map')
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDATE = 'no-cache'  # unversioned URLs: the browser revalidates with the ETag
+LEN_HASH = 12
+NAME_CACHE_INDEX = 'index.json'
+
+
+class Asset:
+    """ One static file with its content hash and its precompressed variants (text files only) """
+
+    def __init__(self, path: str, path_file: str, digest: str) -> None:
+        self.path = path  # relative to the static directory, with '/'
+        self.path_file = path_file
+        self.digest = digest
+        self.media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.dict_encoded: Dict[str, bytes] = {}  # content encoding -> compressed content
+
+    @property
+    def path_fingerprinted(self) -> str:
+        stem, ext = os.path.splitext(self.path)
+        return f'{stem}.{self.digest}{ext}'
+
+    def precompress(self, content: bytes) -> None:
+        """ Keep the gzip and brotli variants which are noticeably smaller than the file """
+        list_variant = [('gzip', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            list_variant.append(('br', brotli.compress(content, quality=11)))
+        for encoding, content_encoded in list_variant:
+            if len(content_encoded) < 0.9 * len(content):
+                self.dict_encoded[encoding] = content_encoded
+
+
+def write_file_atomic(path: str, content: bytes) -> None:
+    """ Other workers starting at the same time read the old file or the new one, never a part of it """
+    path_tmp = f'{path}.{os.getpid()}.tmp'
+    with open(path_tmp, 'wb') as fout:
+        fout.write(content)
+    os.replace(path_tmp, path)
+
+
+class AssetCache:
+    """ Digests and compressed variants of the static files, reused while a file keeps its mtime and size
+
+    Every worker builds the manifest at startup, with the cache only the first one hashes and compresses the files.
+    The index maps a path to [mtime_ns, size, digest, encodings], the variants are stored as <digest>.<encoding>.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.dict_entry: Dict[str, List[Any]] = {}
+        self.set_path_seen: Set[str] = set()
+        self.is_changed = False
+        with contextlib.suppress(OSError, ValueError):  # no or a broken index: everything is built again
+            with open(os.path.join(directory, NAME_CACHE_INDEX), encoding='utf-8') as file_index:
+                self.dict_entry = json.load(file_index)
+
+    def get_path_variant(self, digest: str, encoding: str) -> str:
+        return os.path.join(self.directory, f'{digest}.{encoding}')
+
+    def load(self, path: str, path_file: str, stat: os.stat_result) -> Optional[Asset]:
+        """ The cached asset of a file, None if the file changed or the cache misses a variant """
+        self.set_path_seen.add(path)
+        entry = self.dict_entry.get(path)
+        if entry is None or entry[:2] != [stat.st_mtime_ns, stat.st_size]:
+            return None
+        asset = Asset(path, path_file, entry[2])
+        try:
+            for encoding in entry[3]:
+                with open(self.get_path_variant(asset.digest, encoding), 'rb') as file_variant:
+                    asset.dict_encoded[encoding] = file_variant.read()
+        except OSError:
+            return None
+        return asset
+
+    def store(self, asset: Asset, stat: os.stat_result) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for encoding, content_encoded in asset.dict_encoded.items():
+            write_file_atomic(self.get_path_variant(asset.digest, encoding), content_encoded)
+        self.dict_entry[asset.path] = [stat.st_mtime_ns, stat.st_size, asset.digest, sorted(asset.dict_encoded)]
+        self.is_changed = True
+
+    def save(self) -> None:
+        """ Write the index of the files seen by this build and remove the variants of older contents """
+        if not self.is_changed and set(self.dict_entry) == self.set_path_seen:
+            return
+        dict_entry = {path: entry for path, entry in self.dict_entry.items() if path in self.set_path_seen}
+        set_name = {NAME_CACHE_INDEX} | {f'{entry[2]}.{encoding}' for entry in dict_entry.values()
+                                         for encoding in entry[3]}
+        os.makedirs(self.directory, exist_ok=True)
+        write_file_atomic(os.path.join(self.directory, NAME_CACHE_INDEX), json.dumps(dict_entry).encode())
+        for name in os.listdir(self.directory):
+            if name not in set_name and not name.endswith('.tmp'):
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def create_asset(path: str, path_file: str, cache: Optional[AssetCache]) -> Asset:
+    """ Hash (and for text files precompress) a static file, unless the cache has it """
+    stat = os.stat(path_file)
+    if cache is not None:
+        asset = cache.load(path, path_file, stat)
+        if asset is not None:
+            return asset
+    with open(path_file, 'rb') as file_asset:
+        content = file_asset.read()
+    asset = Asset(path, path_file, hashlib.sha256(content).hexdigest()[:LEN_HASH])
+    if path.endswith(TEXT_EXTENSIONS):
+        asset.precompress(content)
+    if cache is not None:
+        with contextlib.suppress(OSError):  # a read-only cache only costs the time of building the asset again
+            cache.store(asset, stat)
+    return asset
+
+
+class AssetManifest:
+    """ Fingerprinted URLs of all static files, built once at startup
+
+    Templates reference files with static('lib/jquery/jquery-3.7.1.min.js') (name.<hash>.js) and directories whose
+    files are named by the JavaScript with static_dir('game/uno/img/') (_v/<hash of the directory>/game/uno/img/).
+    Both change whenever the content does, so they can be cached forever.
+    """
+
+    def __init__(self, directory: str, url: str = URL_STATIC, cache: Optional[AssetCache] = None) -> None:
+        self.directory = directory
+        self.url = url
+        self.dict_asset: Dict[str, Asset] = {}
+        self.dict_fingerprinted: Dict[str, Asset] = {}
+        self.dict_dir_hash: Dict[str, str] = {}
+        dict_list_digest: Dict[str, List[str]] = {}
+        for path_dir, _, list_file in sorted(os.walk(directory)):
+            for name in sorted(list_file):
+                path_file = os.path.join(path_dir, name)
+                path = os.path.relpath(path_file, directory).replace(os.sep, '/')
+                asset = create_asset(path, path_file, cache)
+                self.dict_asset[path] = asset
+                self.dict_fingerprinted[asset.path_fingerprinted] = asset
+                path_parent = os.path.dirname(path)
+                while True:  # every directory up to the root depends on the file
+                    dict_list_digest.setdefault(path_parent, []).append(path + asset.digest)
+                    if not path_parent:
+                        break
+                    path_parent = os.path.dirname(path_parent)
+        for path_dir, list_digest in dict_list_digest.items():
+            self.dict_dir_hash[path_dir] = hashlib.sha256(''.join(list_digest).encode()).hexdigest()[:LEN_HASH]
+        if cache is not None:
+            with contextlib.suppress(OSError):
+                cache.save()
+
+    def get_url(self, path: str) -> str:
+        """ URL of a file which changes with its content (unknown files keep their plain URL) """
+        asset = self.dict_asset.get(path)
+        return f'{self.url}/{path if asset is None else asset.path_fingerprinted}'
+
+    def get_url_dir(self, path: str) -> str:
+        """ URL prefix of a directory which changes with the content of any file below it (ends with '/') """
+        path = path.strip('/')
+        digest = self.dict_dir_hash.get(path)
+        if digest is None:
+            return f'{self.url}/{path}/'
+        return f'{self.url}/{PREFIX_VERSIONED_DIR}/{digest}/{path}/'
+
+    def resolve(self, path: str) -> Tuple[Optional[Asset], bool]:
+        """ Find the file of a request path, and whether the URL was versioned (i.e. may be cached forever) """
+        asset = self.dict_fingerprinted.get(path)
+        if asset is not None:
+            return asset, True
+        if path.startswith(PREFIX_VERSIONED_DIR + '/'):
+            _, digest, path = path.split('/', 2) if path.count('/') >= 2 else ('', '', '')
+            asset = self.dict_asset.get(path)
+            if asset is None:
+                return None, False
+            path_parent = os.path.dirname(path)
+            while path_parent and self.dict_dir_hash.get(path_parent) != digest:
+                path_parent = os.path.dirname(path_parent)
+            return asset, self.dict_dir_hash.get(path_parent) == digest
+        return self.dict_asset.get(path), False
+
+
+def select_encoding(asset: Asset, accept_encoding: str) -> Optional[str]:
+    """ The best precompressed variant the client accepts (brotli before gzip) """
+    set_accepted = {item.split(';')[0].strip() for item in accept_encoding.split(',')}
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.dict_encoded and encoding in set_accepted:
+            return encoding
+    return None
+
+
+class StaticAssets:
+    """ Serves the files of a manifest: precompressed variants, strong ETags and immutable caching of versioned URLs """
+
+    def __init__(self, manifest: AssetManifest) -> None:
+        self.manifest = manifest
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = self.get_response(scope)
+        await response(scope, receive, send)
+
+    def get_response(self, scope: Scope) -> Response:
+        if scope['method'] not in ('GET', 'HEAD'):
+            return PlainTextResponse('Method Not Allowed', status_code=405)
+        asset, is_versioned = self.manifest.resolve(scope['path'][len(scope.get('root_path', '')):].lstrip('/'))
+        if asset is None:
+            return PlainTextResponse('Not Found', status_code=404)
+        headers = Headers(scope=scope)
+        encoding = select_encoding(asset, headers.get('accept-encoding', ''))
+        etag = f'"{asset.digest}"' if encoding is None else f'"{asset.digest}-{encoding}"'
+        dict_header = {'etag': etag, 'cache-control': CACHE_IMMUTABLE if is_versioned else CACHE_REVALIDATE}
+        if asset.dict_encoded:
+            dict_header['vary'] = 'Accept-Encoding'
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return Response(status_code=304, headers=dict_header)
+        if encoding is not None:
+            dict_header['content-encoding'] = encoding
+            return Response(asset.dict_encoded[encoding], media_type=asset.media_type, headers=dict_header)
+        return FileResponse(asset.path_file, media_type=asset.media_type, headers=dict_header)
+
+
+def get_cache_dir_default(directory: str) -> str:
+    """ A cache directory per static directory in the temporary directory, shared by the workers of a server """
+    digest = hashlib.sha256(os.path.abspath(directory).encode()).hexdigest()[:LEN_HASH]
+    return os.path.join(tempfile.gettempdir(), f'static-assets-{digest}')
+
+
+def mount_static_from_env(app: Any, templates: Any, directory: str) -> None:
+    """ STATIC_PIPELINE=0: serve the files as they are (no fingerprints, no precompression, for development)
+
+    STATIC_CACHE_DIR: where digests and compressed variants are kept between starts (empty: no cache).
+    Mounts the static files at /inc/static and adds static() and static_dir() to the templates.
+    """
+    if os.environ.get('STATIC_PIPELINE', '1') == '0':
+        app.mount(URL_STATIC, StaticFiles(directory=directory), name='static')
+        templates.env.globals['static'] = lambda path: f'{URL_STATIC}/{path}'
+        templates.env.globals['static_dir'] = lambda path: f"{URL_STATIC}/{path.strip('/')}/"
+        return
+    cache_dir = os.environ.get('STATIC_CACHE_DIR', get_cache_dir_default(directory))
+    manifest = AssetManifest(directory, cache=AssetCache(cache_dir) if cache_dir else None)
+    app.mount(URL_STATIC, StaticAssets(manifest), name='static')
+    templates.env.globals['static'] = manifest.get_url
+    templates.env.globals['static_dir'] = manifest.get_url_dir
@@ -0,0 +1,165 @@
+from typing import Any, Awaitable, Callable, Optional, Sequence
+import logging
+from fastapi import WebSocket, WebSocketDisconnect
+from server.py.game_logging import get_game_logger, render_state
+from server.py.game_registry import GameSpec
+from server.py.game_updates import ViewCache, build_simulation_update, get_state_and_actions, is_action_current
+from server.py.replay import ReplayRecorder
+from server.py.rooms import get_idx_player_active
+from server.py.server_context import ServerContext
+from server.py.sessions import ManagedGame, SessionConflict
+from server.py.simulation import select_action
+from server.py.wire import Connection, accept_connection, get_message_type
+
+IDX_PLAYER_YOU = 0  # the seat of the human (singleplayer) or of the browser driving a simulation
+
+Endpoint = Callable[[WebSocket], Awaitable[None]]
+
+
+class SingleplayerTurns:
+    """ One human against the bots of a game, on one connection
+
+    Every update is built once per state version (ViewCache). Bot moves are shown one by one at the game's pace,
+    without pacing (turbo) consecutive bot turns are played as a batch and only their result is sent.
+    """
+
+    def __init__(self, context: ServerContext, spec: GameSpec, connection: Connection, managed: ManagedGame) -> None:
+        self.spec = spec
+        self.connection = connection
+        self.managed = managed
+        self.game = managed.game
+        self.session = managed.session
+        self.recorder = context.replays.create_recorder(spec.name, self.game)
+        self.pacer = context.pacing.create_pacer(
+            spec.bot_delay, turbo=managed.websocket.query_params.get('turbo') == '1')
+        self.games = context.games
+        self.timer = connection.timer
+        self.logger = get_game_logger(spec.name)
+        self.views = ViewCache(self.game, self.timer)
+        self.player = spec.create_player('random')
+        self.version_shown: Optional[int] = None  # state version of the last update sent
+
+    async def run(self) -> None:
+        """ Play until the game is finished """
+        while True:
+            state = await self.session.run(self.game.get_state)
+            if self.spec.is_finished(state):
+                if self.version_shown != self.game.state_version:
+                    await self.send_update(False)
+                return
+            idx_player_active = get_idx_player_active(state)
+            if idx_player_active == IDX_PLAYER_YOU:
+                await self.play_human()
+            else:
+                await self.play_bot(idx_player_active)
+
+    async def send_update(self, with_actions: bool) -> Sequence[Any]:
+        _, list_action, data = await self.session.run(self.views.get_player_update, IDX_PLAYER_YOU, with_actions)
+        await self.connection.send(data)
+        self.pacer.mark_shown()
+        self.version_shown = self.game.state_version
+        return list_action
+
+    async def play_human(self) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):  # print_state is only rendered if it is logged
+            text_state = await self.session.run(render_state, self.game)
+            self.logger.debug('state', extra={'game_id': self.recorder.game_id, 'state': text_state})
+        list_action = await self.send_update(True)
+        if len(list_action) == 0:
+            await self.apply_action(None, list_action)  # nothing to choose, like a bot without actions
+            return
+        data = await self.connection.receive()
+        if get_message_type(data) == 'action' and 'action' in data and is_action_current(data, self.game):
+            await self.apply_action(self.spec.parse_action(data['action']), list_action)
+
+    async def play_bot(self, idx_player: int) -> None:
+        if not self.pacer.turbo and self.version_shown != self.game.state_version:
+            await self.send_update(False)  # the previous move is shown while the bot thinks
+        view, list_action = await self.session.run(self.views.get_view_and_actions, idx_player)
+        with self.timer.span('select_action'):
+            action = await self.session.run_bot(select_action, self.player, view, list_action)
+        if action is not None:
+            await self.pacer.wait()
+        await self.apply_action(action, list_action)
+
+    async def apply_action(self, action: Any, list_action: Sequence[Any]) -> None:
+        """ Apply an action chosen from list_action (the recorder logs its index in it) """
+        with self.timer.span('apply_action'):
+            await self.session.run(self.recorder.apply_action, action, list_action)
+        await self.games.commit(self.managed)
+        self.logger.debug('action', extra={'game_id': self.recorder.game_id, 'action': action})
+
+
+class TurnLoop:
+    """ The simulation and singleplayer websockets of every game in the registry (GameSpec.list_mode) """
+
+    def __init__(self, context: ServerContext) -> None:
+        self.context = context
+
+    def get_endpoint(self, spec: GameSpec, mode: str) -> Endpoint:
+        play = {'simulation': self.play_simulation, 'singleplayer': self.play_singleplayer}[mode]
+
+        async def endpoint(websocket: WebSocket) -> None:
+            await self.context.load_game(spec)
+            await play(websocket, spec)
+        return endpoint
+
+    async def play_simulation(self, websocket: WebSocket, spec: GameSpec) -> None:
+        """ Bots play every seat, the browser shows each state with the bot's choice and sends it back to apply it """
+        timer = self.context.metrics.get_timer(spec.name)
+        logger = get_game_logger(spec.name)
+        connection = await accept_connection(websocket, spec.get_list_card(), timer)
+        channel = self.context.spectators.create_channel(spec.name)
+        recorder: Optional[ReplayRecorder] = None
+        try:
+            game = spec.create_game()
+            player = spec.create_player('random')
+            session = self.context.engine_executor.session(self.context.bot_executor)
+            await connection.send({'type': 'spectate', 'game_id': channel.game_id})
+            recorder = self.context.replays.create_recorder(spec.name, game)
+            await connection.send({'type': 'replay', 'game_id': recorder.game_id})
+            while True:
+                state, list_action = await session.run(get_state_and_actions, game, timer)
+                with timer.span('select_action'):
+                    action = await session.run_bot(select_action, player, state, list_action)
+                data = await session.run(build_simulation_update, state, IDX_PLAYER_YOU, action, timer)
+                await connection.send(data)
+                channel.publish(data)
+                if spec.is_finished(state):
+                    break
+                data = await connection.receive()
+                if get_message_type(data) == 'action' and 'action' in data:
+                    with timer.span('apply_action'):
+                        await session.run(recorder.apply_action, spec.parse_action(data['action']), list_action)
+        except WebSocketDisconnect:
+            logger.info('disconnected', extra={'game_id': None if recorder is None else recorder.game_id})
+        finally:
+            if recorder is not None:
+                recorder.flush()
+            self.context.spectators.close_channel(channel)
+
+    async def play_singleplayer(self, websocket: WebSocket, spec: GameSpec) -> None:
+        """ A human at seat 0 against bots, the game is stored after every action and resumed with ?game_id= """
+        timer = self.context.metrics.get_timer(spec.name)
+        connection = await accept_connection(websocket, spec.get_list_card(), timer)
+        turns: Optional[SingleplayerTurns] = None
+        managed: Optional[ManagedGame] = None
+        try:
+            game = spec.create_singleplayer_game(IDX_PLAYER_YOU)
+            session = self.context.engine_executor.session(self.context.bot_executor)
+            managed = await self.context.games.open(session, game, spec.name, websocket)
+            await connection.send({'type': 'resume', 'game_id': managed.game_id})
+            turns = SingleplayerTurns(self.context, spec, connection, managed)
+            await connection.send({'type': 'replay', 'game_id': turns.recorder.game_id})
+            await turns.run()
+        except WebSocketDisconnect:
+            get_game_logger(spec.name).info(
+                'disconnected', extra={'game_id': None if turns is None else turns.recorder.game_id})
+        except SessionConflict:
+            await connection.send({'type': 'error', 'message': 'The game was continued on another connection'})
+            await websocket.close(code=1000)
+        finally:
+            if turns is not None:
+                turns.recorder.flush()
+            if managed is not None:
+                await self.context.games.close(managed)
@@ -1,8 +1,7 @@
 from server.py.game import Game, Player
-from typing import List, Optional
+from typing import List, Optional, TextIO
 from pydantic import BaseModel
 from enum import Enum
-import random
 
 
 class Card(BaseModel):
@@ -99,7 +98,7 @@ class Uno(Game):
         """ Get the complete, unmasked game state """
         pass
 
-    def print_state(self) -> None:
+    def print_state(self, file: Optional[TextIO] = None) -> None:
         """ Print the current game state """
         pass
 
@@ -121,7 +120,7 @@ class RandomPlayer(Player):
     def select_action(self, state: GameState, actions: List[Action]) -> Optional[Action]:
         """ Given masked game state and possible actions, select the next action """
         if len(actions) > 0:
-            return random.choice(actions)
+            return self.rng.choice(actions)
         return None
 
 
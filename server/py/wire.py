@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import json
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+import msgpack
+from websockets.exceptions import ConnectionClosed
+from server.py.delta import DeltaEncoder, create_encoder
+from server.py.metrics import NULL_TIMER, StageTimer
+
+SUBPROTOCOL_MSGPACK = 'msgpack'
+EXT_TYPE_CARD = 1  # MessagePack extension type of a card id (big-endian, 1, 2 or 4 bytes)
+# what sending to a client which is gone raises, depending on where it is noticed (Starlette, uvicorn, websockets)
+SEND_ERRORS = (WebSocketDisconnect, RuntimeError, OSError, ConnectionClosed)
+
+
+def encode_card_id(idx: int) -> bytes:
+    """ The shortest fixext payload of a card id, most card tables fit one byte """
+    return idx.to_bytes(1 if idx < 0x100 else 2 if idx < 0x10000 else 4, 'big')
+
+
+class JsonCodec:
+    """ The default wire format: JSON text frames """
+
+    format = 'json'
+
+    def encode(self, message: Dict[str, Any]) -> Union[str, bytes]:
+        return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+    async def start(self, websocket: WebSocket) -> None:
+        pass
+
+    async def send_frame(self, websocket: WebSocket, frame: Union[str, bytes]) -> None:
+        """ Send an encoded message (e.g. one frame encoded once for many spectators) """
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+    async def send(self, websocket: WebSocket, message: Dict[str, Any]) -> None:
+        await self.send_frame(websocket, self.encode(message))
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        return await websocket.receive_json()
+
+
+class MessagePackCodec(JsonCodec):
+    """ MessagePack binary frames, cards are sent as ids into the card table (sent once as first message) """
+
+    format = 'msgpack'
+
+    def __init__(self, list_card: Sequence[BaseModel]) -> None:
+        self.list_card_table: List[Dict[str, Any]] = []
+        self._dict_card_id: Dict[Tuple[Any, ...], int] = {}
+        self._set_card_key: frozenset[str] = frozenset()
+        for card in list_card:
+            dict_card = card.model_dump()
+            key = tuple(dict_card.values())
+            if key not in self._dict_card_id:
+                self._dict_card_id[key] = len(self.list_card_table)
+                self.list_card_table.append(dict_card)
+                self._set_card_key = frozenset(dict_card)
+
+    def _pack_cards(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            if obj.keys() == self._set_card_key:
+                idx = self._dict_card_id.get(tuple(obj.values()))
+                if idx is not None:
+                    return msgpack.ExtType(EXT_TYPE_CARD, encode_card_id(idx))
+            return {key: self._pack_cards(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._pack_cards(value) for value in obj]
+        return obj
+
+    def _unpack_card(self, code: int, data: bytes) -> Any:
+        if code == EXT_TYPE_CARD:
+            return dict(self.list_card_table[int.from_bytes(data, 'big')])
+        return msgpack.ExtType(code, data)
+
+    def encode(self, message: Dict[str, Any]) -> Union[str, bytes]:
+        packed: bytes = msgpack.packb(self._pack_cards(message) if self._dict_card_id else message)
+        return packed
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._unpack_card)
+
+    async def start(self, websocket: WebSocket) -> None:
+        await websocket.send_bytes(msgpack.packb({'type': 'codec', 'cards': self.list_card_table}))
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        return self.decode(await websocket.receive_bytes())
+
+
+class Connection:
+    """ A client websocket with its negotiated wire format, its delta encoder and the timer of its game type """
+
+    def __init__(self, websocket: WebSocket, codec: JsonCodec, encoder: DeltaEncoder,
+                 timer: StageTimer = NULL_TIMER) -> None:
+        self.websocket = websocket
+        self.codec = codec
+        self.encoder = encoder
+        self.timer = timer
+        self._message_last: Optional[Dict[str, Any]] = None
+        self._frame_last: Union[str, bytes] = ''
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        """ Send a message, the same message object again reuses its frame (unless it is encoded as a patch) """
+        if message is self._message_last and not self.encoder.enabled:
+            frame = self._frame_last
+        else:
+            with self.timer.span('encode'):
+                frame = self.codec.encode(self.encoder.encode(message))
+            self._message_last, self._frame_last = message, frame
+        with self.timer.span('send'):
+            await self.codec.send_frame(self.websocket, frame)
+
+    async def receive(self) -> Any:
+        return await self.codec.receive(self.websocket)
+
+
+def get_message_type(data: Any) -> Optional[str]:
+    """ The type of a client message, None for messages without one (or which are not even objects) """
+    message_type = data.get('type') if isinstance(data, dict) else None
+    return message_type if isinstance(message_type, str) else None
+
+
+async def accept_connection(websocket: WebSocket, list_card: Sequence[BaseModel] = (),
+                            timer: StageTimer = NULL_TIMER) -> Connection:
+    """ Accept a websocket, clients which offer the 'msgpack' subprotocol get MessagePack, all others JSON """
+    if SUBPROTOCOL_MSGPACK in websocket.scope.get('subprotocols', []):
+        codec: JsonCodec = MessagePackCodec(list_card)
+        await websocket.accept(subprotocol=SUBPROTOCOL_MSGPACK)
+    else:
+        codec = JsonCodec()
+        await websocket.accept()
+    await codec.start(websocket)
+    return Connection(websocket, codec, create_encoder(websocket), timer)
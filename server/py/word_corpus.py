@@ -0,0 +1,412 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from abc import ABCMeta, abstractmethod
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+
+# binary word dictionary: header, alphabet, length table, letter frequencies, word offsets, UTF-8 words, bitsets
+# (per length: one bitset per letter, then one per position and letter, each over the words of that length)
+DICTIONARY_MAGIC = b'WDB2'
+DICTIONARY_EXTENSION = '.wdb'
+HEADER_FORMAT = '<4sIII'          # magic, number of words, number of lengths, number of letters
+LENGTH_FORMAT = '<III'            # length, index of first word, number of words
+
+Key = TypeVar('Key')
+
+# a plain logger: hangman.py imports this module and does not depend on the server's logging setup
+logger = logging.getLogger('server.word_corpus')
+
+
+def get_bitset_size(cnt_words: int) -> int:
+    """ Bytes of one bitset over cnt_words words in a dictionary file """
+    return (cnt_words + 7) // 8
+
+
+def iter_set_bits(bitset: int) -> Iterator[int]:
+    """ Indices of the set bits in ascending order, in one pass over the number (not one shift per bit) """
+    digits = bin(bitset)[:1:-1]  # lowest bit first, without '0b'
+    idx = digits.find('1')
+    while idx >= 0:
+        yield idx
+        idx = digits.find('1', idx + 1)
+
+
+def build_bitsets(list_key_per_word: Iterable[Iterable[Key]]) -> Dict[Key, int]:
+    """ Build one bitset per key, bit i is set if the i-th word has the key (linear in the number of words) """
+    dict_bits: Dict[Key, bytearray] = {}
+    list_key_per_word = list(list_key_per_word)
+    cnt_bytes = get_bitset_size(len(list_key_per_word))
+    for idx, list_key in enumerate(list_key_per_word):
+        for key in list_key:
+            bits = dict_bits.get(key)
+            if bits is None:
+                bits = dict_bits[key] = bytearray(cnt_bytes)
+            bits[idx >> 3] |= 1 << (idx & 7)
+    return {key: int.from_bytes(bits, 'little') for key, bits in dict_bits.items()}
+
+
+class BaseLengthIndex(metaclass=ABCMeta):
+    """ Bitsets over all words of one length (bit i: the i-th word of this length) """
+
+    def __init__(self, length: int, cnt_words: int) -> None:
+        self.length = length
+        self.bitset_all = (1 << cnt_words) - 1
+
+    @abstractmethod
+    def get_letters(self) -> List[str]:
+        """ The letters which can have a bitset """
+
+    @abstractmethod
+    def get_letter_bitset(self, letter: str) -> int:
+        """ The words containing the letter """
+
+    @abstractmethod
+    def get_position_bitset(self, pos: int, letter: str) -> int:
+        """ The words with the letter at the position """
+
+
+class LengthIndex(BaseLengthIndex):
+    """ Bitsets of a word list in memory, per letter and per (position, letter) """
+
+    def __init__(self, length: int, words: List[str]) -> None:
+        super().__init__(length, len(words))
+        list_word = [word.upper() for word in words]
+        self.dict_letter_bitset: Dict[str, int] = build_bitsets(set(word) for word in list_word)
+        self.list_position_bitset: List[Dict[str, int]] = [{} for _ in range(length)]
+        for (pos, letter), bitset in build_bitsets(enumerate(word) for word in list_word).items():
+            self.list_position_bitset[pos][letter] = bitset
+
+    def get_letters(self) -> List[str]:
+        return sorted(self.dict_letter_bitset)
+
+    def get_letter_bitset(self, letter: str) -> int:
+        return self.dict_letter_bitset.get(letter, 0)
+
+    def get_position_bitset(self, pos: int, letter: str) -> int:
+        return self.list_position_bitset[pos].get(letter, 0)
+
+
+class MappedLengthIndex(BaseLengthIndex):
+    """ Bitsets precomputed in a mapped dictionary, each one is read from the mapping when it is used
+
+    A worker keeps no words and no bitsets of its own, only the candidates of its games.
+    """
+
+    def __init__(self, corpus: 'MappedWordCorpus', length: int) -> None:
+        _, cnt_words = corpus.dict_length.get(length, (0, 0))
+        super().__init__(length, cnt_words)
+        self._mm = corpus.mm
+        self._offset = corpus.get_bitset_offset(length)
+        self._cnt_bytes = get_bitset_size(cnt_words)
+        self._alphabet = corpus.alphabet
+        self._dict_letter_idx = {letter: idx for idx, letter in enumerate(corpus.alphabet)}
+
+    def _read_bitset(self, idx_bitset: int) -> int:
+        start = self._offset + idx_bitset * self._cnt_bytes
+        return int.from_bytes(self._mm[start:start + self._cnt_bytes], 'little')
+
+    def get_letters(self) -> List[str]:
+        return list(self._alphabet)
+
+    def get_letter_bitset(self, letter: str) -> int:
+        idx = self._dict_letter_idx.get(letter)
+        return 0 if idx is None else self._read_bitset(idx)
+
+    def get_position_bitset(self, pos: int, letter: str) -> int:
+        idx = self._dict_letter_idx.get(letter)
+        return 0 if idx is None else self._read_bitset(len(self._alphabet) * (pos + 1) + idx)
+
+
+class BaseWordCorpus(metaclass=ABCMeta):
+
+    def __init__(self) -> None:
+        self._dict_length_index: Dict[int, BaseLengthIndex] = {}
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """ Number of words """
+
+    @abstractmethod
+    def get_random_word(self, length: Optional[int] = None, rng: Optional[random.Random] = None) -> str:
+        """ Pick a random word (optionally with the given length) in O(1), drawing from rng if given """
+
+    @abstractmethod
+    def get_words_by_length(self, length: int) -> List[str]:
+        """ Get all words with the given length """
+
+    def get_length_index(self, length: int) -> BaseLengthIndex:
+        """ Get the bitset index of all words with the given length (built on first use) """
+        index = self._dict_length_index.get(length)
+        if index is None:
+            index = self._dict_length_index[length] = self._create_length_index(length)
+        return index
+
+    def _create_length_index(self, length: int) -> BaseLengthIndex:
+        return LengthIndex(length, self.get_words_by_length(length))
+
+    def get_letter_frequency(self, length: int) -> Dict[str, int]:
+        """ Get the number of words with the given length containing each letter """
+        index = self.get_length_index(length)
+        dict_frequency = {letter: index.get_letter_bitset(letter).bit_count() for letter in index.get_letters()}
+        return {letter: cnt for letter, cnt in dict_frequency.items() if cnt > 0}
+
+
+class WordCorpus(BaseWordCorpus):
+    """ Immutable word list, indexed by word length and by the letters a word contains """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        super().__init__()
+        self.words: List[str] = [word for word in words if word]
+        self.dict_idx_by_length: Dict[int, List[int]] = {}
+        for idx, word in enumerate(self.words):
+            self.dict_idx_by_length.setdefault(len(word), []).append(idx)
+
+    @classmethod
+    def from_json_file(cls, path: str) -> 'WordCorpus':
+        """ Load a corpus from a JSON array of words """
+        with open(path, encoding='utf-8') as fin:
+            return cls(json.load(fin))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def get_random_word(self, length: Optional[int] = None, rng: Optional[random.Random] = None) -> str:
+        """ Pick a random word (optionally with the given length) in O(1) """
+        randrange = random.randrange if rng is None else rng.randrange
+        if length is None:
+            if len(self.words) == 0:
+                raise ValueError('The word corpus is empty')
+            return self.words[randrange(len(self.words))]
+        list_idx = self.dict_idx_by_length.get(length)
+        if not list_idx:
+            raise ValueError(f'There are no words with length {length}')
+        return self.words[list_idx[randrange(len(list_idx))]]
+
+    def get_words_by_length(self, length: int) -> List[str]:
+        """ Get all words with the given length """
+        return [self.words[idx] for idx in self.dict_idx_by_length.get(length, [])]
+
+    def get_words_with_letters(self, letters: Iterable[str], length: Optional[int] = None) -> List[str]:
+        """ Get all words containing every given letter (optionally with the given length)
+
+        Intersects the letter bitsets of the length indexes, so only the words of the asked length are touched.
+        """
+        list_letter = [letter.upper() for letter in letters]
+        list_word = []
+        for length_word in sorted(self.dict_idx_by_length) if length is None else [length]:
+            index = self.get_length_index(length_word)
+            bitset = index.bitset_all
+            for letter in list_letter:
+                bitset &= index.get_letter_bitset(letter)
+            list_idx = self.dict_idx_by_length.get(length_word, [])
+            list_word += [self.words[list_idx[idx]] for idx in iter_set_bits(bitset)]
+        return list_word
+
+
+class MappedWordCorpus(BaseWordCorpus):
+    """ Word dictionary in the binary format, memory-mapped read-only so all worker processes share its pages """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        with open(path, 'rb') as fin:
+            self.mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, cnt_words, cnt_lengths, cnt_letters = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+            self._cnt_words = int(cnt_words)
+            if magic != DICTIONARY_MAGIC:
+                raise ValueError(f'{path} is not a word dictionary')
+            offset = struct.calcsize(HEADER_FORMAT)
+            self.alphabet = ''.join(chr(code) for code in struct.unpack_from(f'<{cnt_letters}I', self.mm, offset))
+            offset += 4 * cnt_letters
+            # only the small tables are read at startup, the words stay on disk until they are accessed
+            self.dict_length: Dict[int, Tuple[int, int]] = {}
+            self._dict_offset_frequency: Dict[int, int] = {}
+            offset_frequency = offset + struct.calcsize(LENGTH_FORMAT) * cnt_lengths
+            for idx in range(cnt_lengths):
+                length, idx_first, cnt = struct.unpack_from(LENGTH_FORMAT, self.mm, offset)
+                self.dict_length[length] = (idx_first, cnt)
+                self._dict_offset_frequency[length] = offset_frequency + 4 * cnt_letters * idx
+                offset += struct.calcsize(LENGTH_FORMAT)
+            self._offset_word_offsets = offset_frequency + 4 * cnt_letters * cnt_lengths
+            self._offset_data = self._offset_word_offsets + 4 * (self._cnt_words + 1)
+            (size_data,) = struct.unpack_from('<I', self.mm, self._offset_word_offsets + 4 * self._cnt_words)
+            self._dict_offset_bitset: Dict[int, int] = {}
+            offset = self._offset_data + size_data
+            for length, (_, cnt) in sorted(self.dict_length.items()):
+                self._dict_offset_bitset[length] = offset
+                offset += get_bitset_size(cnt) * cnt_letters * (length + 1)
+        except struct.error as e:  # a table reaches beyond the end of the file
+            raise ValueError(f'{path} is truncated') from e
+        if offset != len(self.mm):
+            raise ValueError(f'{path} has {len(self.mm)} bytes instead of {offset}')
+
+    def __len__(self) -> int:
+        return self._cnt_words
+
+    def get_word(self, idx: int) -> str:
+        """ Read the word with the given index (words are sorted by length) """
+        start, end = struct.unpack_from('<II', self.mm, self._offset_word_offsets + 4 * idx)
+        return self.mm[self._offset_data + start:self._offset_data + end].decode('utf-8')
+
+    def get_random_word(self, length: Optional[int] = None, rng: Optional[random.Random] = None) -> str:
+        """ Pick a random word (optionally with the given length) in O(1) """
+        randrange = random.randrange if rng is None else rng.randrange
+        if length is None:
+            if self._cnt_words == 0:
+                raise ValueError('The word corpus is empty')
+            return self.get_word(randrange(self._cnt_words))
+        idx_first, cnt = self.dict_length.get(length, (0, 0))
+        if cnt == 0:
+            raise ValueError(f'There are no words with length {length}')
+        return self.get_word(idx_first + randrange(cnt))
+
+    def get_words_by_length(self, length: int) -> List[str]:
+        """ Get all words with the given length """
+        idx_first, cnt = self.dict_length.get(length, (0, 0))
+        return [self.get_word(idx) for idx in range(idx_first, idx_first + cnt)]
+
+    def get_bitset_offset(self, length: int) -> int:
+        """ Position of the bitsets of the words with the given length in the mapping """
+        return self._dict_offset_bitset.get(length, 0)
+
+    def _create_length_index(self, length: int) -> BaseLengthIndex:
+        return MappedLengthIndex(self, length)
+
+    def get_letter_frequency(self, length: int) -> Dict[str, int]:
+        """ Get the number of words with the given length containing each letter (precomputed) """
+        offset = self._dict_offset_frequency.get(length)
+        if offset is None:
+            return {}
+        list_cnt = struct.unpack_from(f'<{len(self.alphabet)}I', self.mm, offset)
+        return {letter: cnt for letter, cnt in zip(self.alphabet, list_cnt) if cnt > 0}
+
+
+def build_dictionary_tables(list_word: List[str]) -> Tuple[List[str], List[Tuple[int, int, int]], List[int]]:
+    """ Build the alphabet, the length table and the letter frequencies of words sorted by length """
+    alphabet = sorted({char for word in list_word for char in word})
+    dict_letter_idx = {letter: idx for idx, letter in enumerate(alphabet)}
+    list_length: List[Tuple[int, int, int]] = []
+    list_frequency: List[int] = []
+    for idx, word in enumerate(list_word):
+        if not list_length or list_length[-1][0] != len(word):
+            list_length.append((len(word), idx, 0))
+            list_frequency.extend([0] * len(alphabet))
+        length, idx_first, cnt = list_length[-1]
+        list_length[-1] = (length, idx_first, cnt + 1)
+        offset = len(alphabet) * (len(list_length) - 1)
+        for letter in set(word):
+            list_frequency[offset + dict_letter_idx[letter]] += 1
+    return alphabet, list_length, list_frequency
+
+
+def build_bitset_section(list_word: List[str], length: int, alphabet: List[str]) -> bytes:
+    """ The bitsets of the words of one length, in the order MappedLengthIndex reads them """
+    cnt_bytes = get_bitset_size(len(list_word))
+    index = LengthIndex(length, list_word)
+    list_bitset = [index.get_letter_bitset(letter) for letter in alphabet]
+    list_bitset += [index.get_position_bitset(pos, letter) for pos in range(length) for letter in alphabet]
+    return b''.join(bitset.to_bytes(cnt_bytes, 'little') for bitset in list_bitset)
+
+
+def write_word_dictionary(path: str, words: Iterable[str]) -> None:
+    """ Write words (upper case, without duplicates) in the binary dictionary format, replacing the file atomically """
+    list_word = sorted({word.upper() for word in words if word}, key=lambda word: (len(word), word))
+    alphabet, list_length, list_frequency = build_dictionary_tables(list_word)
+    list_data = [word.encode('utf-8') for word in list_word]
+    list_offset = [0]
+    for data in list_data:
+        list_offset.append(list_offset[-1] + len(data))
+
+    path_tmp = f'{path}.tmp'
+    with open(path_tmp, 'wb') as fout:
+        fout.write(struct.pack(HEADER_FORMAT, DICTIONARY_MAGIC, len(list_word), len(list_length), len(alphabet)))
+        fout.write(struct.pack(f'<{len(alphabet)}I', *(ord(letter) for letter in alphabet)))
+        for entry in list_length:
+            fout.write(struct.pack(LENGTH_FORMAT, *entry))
+        fout.write(struct.pack(f'<{len(list_frequency)}I', *list_frequency))
+        fout.write(struct.pack(f'<{len(list_offset)}I', *list_offset))
+        fout.write(b''.join(list_data))
+        for length, idx_first, cnt in list_length:
+            fout.write(build_bitset_section(list_word[idx_first:idx_first + cnt], length, alphabet))
+    # readers keep their mapping of the old file, new readers get the new one
+    os.replace(path_tmp, path)
+
+
+def load_word_corpus(path: str) -> BaseWordCorpus:
+    """ Load a JSON word list into memory or memory-map a binary dictionary (by file extension)
+
+    A broken dictionary is rebuilt from the JSON word list with the same name, if there is one.
+    """
+    if not path.endswith(DICTIONARY_EXTENSION):
+        return WordCorpus.from_json_file(path)
+    try:
+        return MappedWordCorpus(path)
+    except ValueError as e:
+        # a dictionary next to its JSON word list is a cache of it (e.g. cut off by a full disk), build it again
+        path_json = path[:-len(DICTIONARY_EXTENSION)] + '.json'
+        if not os.path.exists(path_json):
+            raise
+        logger.warning('rebuilding word dictionary', extra={'path': path, 'error': str(e)})
+        with open(path_json, encoding='utf-8') as fin:
+            write_word_dictionary(path, json.load(fin))
+        return MappedWordCorpus(path)
+
+
+class WordCorpusService:
+    """ Process-wide holder of a corpus file, reloading it when the file on disk changes """
+
+    def __init__(self, path: str, reload_interval: float = 5.0) -> None:
+        self.path = path
+        self.reload_interval = reload_interval  # seconds between checks of the file's modification time
+        self._corpus: Optional[BaseWordCorpus] = None
+        self._file_signature: Optional[Tuple[int, int]] = None
+        self._time_checked = 0.0
+        self._lock = threading.Lock()
+
+    def _get_file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> BaseWordCorpus:
+        """ (Re)load the corpus from disk, the new corpus replaces the old one atomically """
+        with self._lock:
+            signature = self._get_file_signature()
+            corpus = load_word_corpus(self.path)
+            self._corpus, self._file_signature = corpus, signature
+            self._time_checked = time.monotonic()
+            return corpus
+
+    def get(self) -> BaseWordCorpus:
+        """ Get the current corpus, reloading it if the file has changed since the last check """
+        corpus = self._corpus
+        if corpus is None:
+            return self.load()
+        now = time.monotonic()
+        if now - self._time_checked >= self.reload_interval:
+            self._time_checked = now
+            try:
+                if self._get_file_signature() != self._file_signature:
+                    return self.load()
+            except (OSError, ValueError) as e:
+                # keep serving the last good corpus if the file is missing or being rewritten
+                logger.warning('reload failed', extra={'path': self.path, 'error': str(e)})
+        return corpus
+
+    def get_random_word(self, length: Optional[int] = None, rng: Optional[random.Random] = None) -> str:
+        """ Pick a random word from the current corpus """
+        return self.get().get_random_word(length, rng)
+
+
+if __name__ == '__main__':
+
+    # convert a JSON word list, e.g. "python server/py/word_corpus.py words.json words.wdb"
+    import sys
+    with open(sys.argv[1], encoding='utf-8') as file_words:
+        write_word_dictionary(sys.argv[2], json.load(file_words))
+    print(f'{sys.argv[2]}: {len(MappedWordCorpus(sys.argv[2]))} words')
@@ -0,0 +1,156 @@
+import copy
+import random
+import pytest
+from server.py.battleship import (FLEET, ActionType, Battleship, BattleshipAction, GamePhase, RandomPlayer,
+                                  ShootActionView, TargetPool, get_col_name, get_list_location)
+
+
+def shoot(location: str) -> BattleshipAction:
+    return BattleshipAction(action_type=ActionType.SHOOT, ship_name=None, location=[location])
+
+
+def set_ship(name: str, location: list[str]) -> BattleshipAction:
+    return BattleshipAction(action_type=ActionType.SET_SHIP, ship_name=name, location=location)
+
+
+def create_running_game() -> Battleship:
+    """ Both fleets placed in the columns A to E of their board, from row 1 down """
+    game = Battleship()
+    for _ in range(2):
+        for col, (name, length) in zip('ABCDE', FLEET.items()):
+            game.apply_action(set_ship(name, [f'{col}{row}' for row in range(1, length + 1)]))
+    return game
+
+
+def test_target_pool_removes_in_constant_time_and_keeps_lookup_consistent() -> None:
+    pool = TargetPool(['A1', 'A2', 'A3', 'A4'])
+    pool.remove('A2')
+    pool.remove('A2')  # removing twice does nothing
+    pool.remove('A4')  # the last location
+    assert len(pool) == 2
+    assert sorted(pool) == ['A1', 'A3']
+    assert 'A2' not in pool and 'A3' in pool
+
+
+def test_setup_places_the_fleet_in_turns() -> None:
+    game = Battleship()
+    actions = game.get_list_action()
+    assert all(action.action_type == ActionType.SET_SHIP and action.ship_name == 'carrier' for action in actions)
+    assert len(actions) == 2 * 10 * 6  # vertical and horizontal positions of a ship of length 5
+    game.apply_action(actions[0])
+    assert game.get_state().idx_player_active == 1
+    game = create_running_game()
+    assert game.get_state().phase == GamePhase.RUNNING
+    assert game.get_state().idx_player_active == 0
+
+
+def test_shoot_view_is_a_lazy_sequence_of_the_pool() -> None:
+    game = create_running_game()
+    actions = game.get_list_action()
+    assert isinstance(actions, ShootActionView)
+    assert len(actions) == 100
+    assert [action.location for action in actions[:2]] == [['A1'], ['A2']]
+    assert all(action.action_type == ActionType.SHOOT for action in actions)
+
+
+def test_shots_alternate_until_every_ship_cell_is_hit() -> None:
+    game = create_running_game()
+    game.apply_action(shoot('A1'))  # player 0 hits the carrier of player 1
+    assert game.get_state().players[0].successful_shots == ['A1']
+    game.apply_action(shoot('J10'))  # player 1 misses
+    list_location = [action.location[0] for action in game.get_list_action()]
+    assert 'A1' not in list_location and 'J10' in list_location  # each player has its own targets
+    assert len(list_location) == 99
+    set_cell = {location for ship in game.get_state().players[1].ships for location in ship.location or []}
+    for location in sorted(set_cell - {'A1'}):
+        game.apply_action(shoot(location))
+        if game.get_state().phase == GamePhase.FINISHED:
+            break
+        game.apply_action(game.get_list_action()[-1])
+    assert game.get_state().winner == 0
+    assert not game.get_list_action()
+    state = copy.deepcopy(game.get_state())
+    game.apply_action(None)  # what a turn loop applies without actions
+    assert game.get_state() == state
+
+
+def test_no_action_passes_the_turn() -> None:
+    game = create_running_game()
+    game.apply_action(None)
+    assert game.get_state().idx_player_active == 1 and not game.get_state().players[0].shots
+
+
+def test_pool_is_rebuilt_after_set_state() -> None:
+    game = create_running_game()
+    for location in ['B2', 'C3', 'D4', 'E5']:
+        game.apply_action(shoot(location))
+    copy_game = Battleship()
+    copy_game.set_state(copy.deepcopy(game.get_state()))
+    assert sorted(action.location[0] for action in copy_game.get_list_action()) == \
+        sorted(action.location[0] for action in game.get_list_action())
+    state = game.get_state()
+    state.players[0].shots.append('J1')  # changed outside apply_action
+    assert 'J1' not in [action.location[0] for action in game.get_list_action()]
+
+
+def test_player_view_hides_the_opponents_ships() -> None:
+    game = create_running_game()
+    view = game.get_player_view(0)
+    assert view.players[0].ships[0].location is not None
+    assert all(ship.location is None for ship in view.players[1].ships)
+    assert game.get_state().players[1].ships[0].location is not None
+
+
+def test_random_players_finish_a_game(capsys: pytest.CaptureFixture[str]) -> None:
+    game = Battleship()
+    player = RandomPlayer()
+    player.rng = random.Random(7)
+    while game.get_state().phase != GamePhase.FINISHED:
+        game.apply_action(player.select_action(game.get_player_view(0), game.get_list_action()))
+    assert game.get_state().winner in (0, 1)
+    game.print_state()
+    assert 'phase: finished' in capsys.readouterr().out.lower()
+    with pytest.raises(ValueError):
+        player.select_action(game.get_state(), [])
+
+
+def test_col_names_continue_like_spreadsheet_columns() -> None:
+    assert [get_col_name(idx) for idx in (0, 25, 26, 27, 701, 702)] == ['A', 'Z', 'AA', 'AB', 'ZZ', 'AAA']
+    assert get_list_location(2, 3) == ['A1', 'A2', 'A3', 'B1', 'B2', 'B3']
+
+
+def test_invalid_board_or_fleet_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        Battleship(0, 10)
+    with pytest.raises(ValueError):
+        Battleship(3, 3, {'carrier': 5})
+
+
+def test_placements_fit_the_board_and_avoid_other_ships() -> None:
+    game = Battleship(3, 3, {'cruiser': 3, 'destroyer': 2})
+    actions = game.get_list_action()
+    assert len(actions) == 6  # three columns and three rows of length 3
+    assert all(action.ship_name == 'cruiser' and len(action.location) == 3 for action in actions)
+    assert [action.location for action in actions[0:2]] == [actions[0].location, actions[1].location]
+    game.apply_action(set_ship('cruiser', ['A1', 'A2', 'A3']))
+    game.apply_action(set_ship('cruiser', ['A1', 'B1', 'C1']))
+    actions = game.get_list_action()
+    assert actions[0].ship_name == 'destroyer'
+    assert all(not {'A1', 'A2', 'A3'} & set(action.location) for action in actions)
+    assert len(actions) == 7  # two in each of columns B and C, one from B in each row
+
+
+def test_small_board_is_played_to_the_end() -> None:
+    game = Battleship(3, 3, {'destroyer': 2})
+    game.apply_action(set_ship('destroyer', ['A1', 'A2']))
+    game.apply_action(set_ship('destroyer', ['C2', 'C3']))
+    assert len(game.get_list_action()) == 9
+    for location in ['C2', 'B1', 'C3']:
+        game.apply_action(shoot(location))
+    assert game.get_state().phase == GamePhase.FINISHED and game.get_state().winner == 0
+
+
+def test_unknown_ship_is_added_to_the_fleet_of_the_state() -> None:
+    game = Battleship(3, 3, {'destroyer': 2})
+    game.apply_action(set_ship('tug', ['B1']))
+    assert [ship.name for ship in game.get_state().players[0].ships] == ['destroyer', 'tug']
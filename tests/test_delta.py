@@ -0,0 +1,104 @@
+import copy
+import random
+from typing import Any, Dict, List
+from server.py.delta import DeltaEncoder, escape_key, is_equal, make_patch
+
+
+def unescape_key(key: str) -> str:
+    return key.replace('~1', '/').replace('~0', '~')
+
+
+def apply_patch(doc: Any, list_op: List[Dict[str, Any]]) -> Any:
+    """ A minimal RFC 6902 client for add, remove and replace, like the one of the browser """
+    doc = copy.deepcopy(doc)
+    for op in list_op:
+        if op['path'] == '':
+            doc = copy.deepcopy(op['value'])
+            continue
+        *list_key, key_last = [unescape_key(key) for key in op['path'].split('/')[1:]]
+        parent = doc
+        for key in list_key:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        if isinstance(parent, list):
+            idx = int(key_last)
+            if op['op'] == 'add':
+                parent.insert(idx, copy.deepcopy(op['value']))
+            elif op['op'] == 'remove':
+                del parent[idx]
+            else:
+                parent[idx] = copy.deepcopy(op['value'])
+        elif op['op'] == 'remove':
+            del parent[key_last]
+        else:
+            parent[key_last] = copy.deepcopy(op['value'])
+    return doc
+
+
+def test_keys_are_escaped_as_json_pointers() -> None:
+    assert escape_key('a/b~c') == 'a~1b~0c'
+    assert make_patch({'a/b': 1}, {'a/b': 2}) == [{'op': 'replace', 'path': '/a~1b', 'value': 2}]
+
+
+def test_json_equality_tells_booleans_and_numbers_apart() -> None:
+    assert not is_equal(1, True)
+    assert not is_equal(1, 1.0)
+    assert is_equal({'a': [1, {'b': None}]}, {'a': [1, {'b': None}]})
+    assert not is_equal({'a': 1}, {'b': 1})
+    assert not is_equal([1, 2], [1])
+    assert make_patch({'cnt': 1}, {'cnt': True}) == [{'op': 'replace', 'path': '/cnt', 'value': True}]
+
+
+def test_patch_of_a_card_drawn_from_the_pile_is_small() -> None:
+    old = {'draw_pile': list(range(50)), 'hand': [100, 101], 'phase': 'running'}
+    new = {'draw_pile': list(range(49)), 'hand': [100, 101, 49], 'phase': 'running'}
+    list_op = make_patch(old, new)
+    assert list_op == [{'op': 'remove', 'path': '/draw_pile/49'}, {'op': 'add', 'path': '/hand/2', 'value': 49}]
+    assert apply_patch(old, list_op) == new
+    assert not make_patch(new, new)
+
+
+def test_applying_the_patch_gives_the_new_state() -> None:
+    old = {'players': [{'name': 'A', 'cards': [1, 2, 3]}, {'name': 'B', 'cards': []}], 'gone': 1, 'x/y': 0}
+    new = {'players': [{'name': 'A', 'cards': [2, 3]}, {'name': 'B', 'cards': [7, 1]}, {'name': 'C'}],
+           'new': {'nested': [None]}, 'x/y': [0]}
+    assert apply_patch(old, make_patch(old, new)) == new
+    assert apply_patch([1, 2], make_patch([1, 2], 'text')) == 'text'
+
+
+def test_random_documents_round_trip() -> None:
+    rng = random.Random(4)
+
+    def create_doc(depth: int) -> Any:
+        kind = rng.randrange(4 if depth < 3 else 2)
+        if kind == 0:
+            return rng.choice([0, 1, True, None, 'a', 1.5])
+        if kind == 1:
+            return rng.randrange(5)
+        if kind == 2:
+            return [create_doc(depth + 1) for _ in range(rng.randrange(5))]
+        return {rng.choice('abc/~'): create_doc(depth + 1) for _ in range(rng.randrange(4))}
+
+    for _ in range(300):
+        old, new = create_doc(0), create_doc(0)
+        assert is_equal(apply_patch(old, make_patch(old, new)), new)
+
+
+def test_encoder_sends_keyframes_and_patches_against_the_previous_update() -> None:
+    encoder = DeltaEncoder(keyframe_interval=3)
+    list_state = [{'cnt': idx, 'list': list(range(idx))} for idx in range(5)]
+    list_message = [encoder.encode({'type': 'update', 'state': state}) for state in list_state]
+    assert [message['type'] for message in list_message] == ['update', 'patch', 'patch', 'update', 'patch']
+    assert [message['version'] for message in list_message] == [1, 2, 3, 4, 5]
+    state_client: Any = None
+    for message, state in zip(list_message, list_state):
+        state_client = message['state'] if message['type'] == 'update' else apply_patch(state_client, message['patch'])
+        assert state_client == state
+    error = {'type': 'error', 'message': 'no'}
+    assert encoder.encode(error) is error
+
+
+def test_disabled_encoder_sends_every_update_unchanged() -> None:
+    encoder = DeltaEncoder(enabled=False)
+    message = {'type': 'update', 'state': {'a': 1}}
+    assert encoder.encode(message) is message
+    assert encoder.encode(message) is message
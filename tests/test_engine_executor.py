@@ -0,0 +1,97 @@
+import asyncio
+import os
+import threading
+import time
+from typing import List
+import pytest
+from server.py.engine_executor import EngineExecutor, create_executor_from_env
+
+
+class StatefulBot:
+    is_stateful = True
+
+
+def get_pid(*_: object) -> int:
+    return os.getpid()
+
+
+def test_unknown_kind_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        EngineExecutor('fiber')
+
+
+def test_inline_and_thread_calls_are_counted() -> None:
+    for kind in ('inline', 'thread'):
+        executor = EngineExecutor(kind, max_workers=2)
+        assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
+        dict_metrics = executor.metrics.to_dict()
+        assert dict_metrics['submitted'] == dict_metrics['completed'] == 1
+        assert dict_metrics['queue_depth'] == dict_metrics['in_flight'] == 0
+        assert executor.metrics.get_queue_depth() == 0
+        executor.shutdown()
+
+
+def test_thread_calls_leave_the_event_loop_free() -> None:
+    executor = EngineExecutor('thread')
+
+    async def run() -> int:
+        cnt_tick = 0
+        future = asyncio.ensure_future(executor.run(time.sleep, 0.2))
+        while not future.done():
+            await asyncio.sleep(0.01)
+            cnt_tick += 1
+        return cnt_tick
+
+    assert asyncio.run(run()) >= 5
+    executor.shutdown()
+
+
+def test_session_runs_its_calls_in_order_one_at_a_time() -> None:
+    executor = EngineExecutor('thread', max_workers=4)
+    session = executor.session()
+    list_event: List[str] = []
+    lock = threading.Lock()
+
+    def call(name: str) -> None:
+        with lock:
+            list_event.append(f'start {name}')
+        time.sleep(0.02)
+        with lock:
+            list_event.append(f'end {name}')
+
+    async def run() -> None:
+        await asyncio.gather(*[session.run(call, str(idx)) for idx in range(4)])
+
+    asyncio.run(run())
+    assert list_event == [f'{event} {idx}' for idx in range(4) for event in ('start', 'end')]
+    assert executor.metrics.max_queue_depth >= 1
+    executor.shutdown()
+
+
+def test_bot_calls_go_to_the_bot_executor_unless_the_bot_is_stateful() -> None:
+    executor = EngineExecutor('inline')
+    executor_bot = EngineExecutor('process', max_workers=1)
+    session = executor.session(executor_bot)
+
+    async def run() -> tuple[int, int]:
+        return await session.run_bot(get_pid, 'stateless'), await session.run_bot(get_pid, StatefulBot())
+
+    try:
+        pid_stateless, pid_stateful = asyncio.run(run())
+    finally:
+        executor_bot.shutdown()
+    assert pid_stateless != os.getpid()
+    assert pid_stateful == os.getpid()
+    assert executor_bot.metrics.to_dict()['completed'] == 1
+    assert executor.metrics.to_dict()['completed'] == 1
+    with pytest.raises(ValueError):
+        executor_bot.session()
+
+
+def test_executor_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('BOT_EXECUTOR', 'inline')
+    monkeypatch.setenv('BOT_WORKERS', '3')
+    assert create_executor_from_env('BOT', 'thread').kind == 'inline'
+    executor = create_executor_from_env('ENGINE', 'thread')
+    assert executor.kind == 'thread'
+    executor.shutdown()
@@ -0,0 +1,124 @@
+import asyncio
+import io
+import json
+import logging
+import queue
+import sys
+from typing import Any, Iterator, Optional, TextIO
+import pytest
+from server.py.engine_executor import EngineExecutor
+from server.py.game_logging import (LOGGER_ROOT, DroppingQueueHandler, configure_logging, configure_logging_from_env,
+                                    configure_worker_logging_from_env, get_game_logger, get_logger, render_state,
+                                    stop_listener)
+from server.py.hangman import GamePhase, Hangman, HangmanGameState
+from server.py.simulation import run_games
+
+
+@pytest.fixture(autouse=True)
+def restore_logging() -> Iterator[None]:
+    """ configure_logging changes the server logger for the whole process, other tests rely on its defaults """
+    logger = logging.getLogger(LOGGER_ROOT)
+    handlers, level, propagate = logger.handlers, logger.level, logger.propagate
+    yield
+    logger.handlers, logger.propagate = handlers, propagate
+    logger.setLevel(level)
+    get_game_logger('hangman').setLevel(logging.NOTSET)
+
+
+def read_lines(stream: io.StringIO) -> list[str]:
+    return stream.getvalue().splitlines()
+
+
+def test_loggers_are_below_the_server_logger() -> None:
+    assert get_logger('rooms').name == 'server.rooms'
+    assert get_game_logger('hangman').name == 'server.game.hangman'
+
+
+def test_json_lines_carry_the_extra_fields_and_models() -> None:
+    stream = io.StringIO()
+    listener = configure_logging('debug', {'hangman': 'warning'}, 'json', stream=stream)
+    state = HangmanGameState(word_to_guess='DEVOPS', phase=GamePhase.RUNNING, guesses=[], incorrect_guesses=[])
+    get_logger('rooms').info('opened', extra={'room_id': 'r1', 'state': state, 'other': {1, 2}})
+    get_game_logger('hangman').info('not written')
+    get_game_logger('battleship').debug('action', extra={'game_id': 'g1'})
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        get_logger('rooms').exception('failed')
+    stop_listener(listener)
+    stop_listener(listener)  # stopping twice does nothing
+    list_log = [json.loads(line) for line in read_lines(stream) if line.startswith('{')]
+    assert [log['message'] for log in list_log] == ['opened', 'action', 'failed']
+    assert list_log[0]['logger'] == 'server.rooms' and list_log[0]['level'] == 'INFO'
+    assert list_log[0]['room_id'] == 'r1'
+    assert list_log[0]['state']['word_to_guess'] == 'DEVOPS'
+    assert list_log[0]['other'] == '{1, 2}'
+    assert list_log[1]['game_id'] == 'g1'
+    assert 'ValueError: broken' in list_log[2]['exception']
+
+
+def test_text_lines_append_the_fields() -> None:
+    stream = io.StringIO()
+    listener = configure_logging('info', log_format='text', stream=stream)
+    get_logger('sessions').info('saved', extra={'game_id': 'g2'})
+    get_logger('sessions').debug('not written')
+    stop_listener(listener)
+    list_line = read_lines(stream)
+    assert len(list_line) == 1
+    assert list_line[0].endswith('INFO server.sessions: saved game_id=g2')
+
+
+def test_full_queue_drops_records_without_waiting() -> None:
+    log_queue: 'queue.Queue[Any]' = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    for idx in range(5):
+        handler.handle(logging.LogRecord('server', logging.INFO, '', 0, 'msg %s', (idx,), None))
+    assert handler.cnt_dropped == 3
+    record = log_queue.get_nowait()
+    assert record.args == (0,)  # the message is formatted later, in the logging thread
+
+
+class StdoutCheckingHangman(Hangman):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.stdout = sys.stdout
+
+    def print_state(self, file: Optional[TextIO] = None) -> None:
+        assert sys.stdout is self.stdout  # the output of other threads still goes to the process's stdout
+        super().print_state(file)
+
+
+def test_render_state_captures_print_state() -> None:
+    game = StdoutCheckingHangman()
+    game.set_state(HangmanGameState(word_to_guess='devops', phase=GamePhase.RUNNING, guesses=['D'],
+                                    incorrect_guesses=[]))
+    text = render_state(game)
+    assert 'd_____' in text and not text.endswith('\n')
+
+
+def test_configuration_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    monkeypatch.setenv('LOG_LEVEL_HANGMAN', 'DEBUG')
+    monkeypatch.setenv('LOG_FORMAT', 'text')
+    monkeypatch.setenv('LOG_QUEUE', '5')
+    listener = configure_logging_from_env()
+    stop_listener(listener)
+    assert logging.getLogger(LOGGER_ROOT).level == logging.WARNING
+    assert get_game_logger('hangman').level == logging.DEBUG
+    handler = logging.getLogger(LOGGER_ROOT).handlers[0]
+    assert isinstance(handler, DroppingQueueHandler) and isinstance(handler.queue, queue.Queue)
+    assert handler.queue.maxsize == 5
+
+
+def test_worker_processes_write_their_records_themselves(capfd: pytest.CaptureFixture[str]) -> None:
+    # a forked worker inherits the queue handler, but not the thread of the listener
+    stop_listener(configure_logging('info', stream=io.StringIO()))
+    executor = EngineExecutor('process', 1, configure_worker_logging_from_env)
+    try:
+        list_result = asyncio.run(executor.run(run_games, 'uno', ['random'] * 4, [1]))
+    finally:
+        executor.shutdown()
+    assert 'error' in list_result[0]
+    record = json.loads(capfd.readouterr().err.splitlines()[0])
+    assert record['message'] == 'game failed' and record['seed'] == 1
@@ -0,0 +1,67 @@
+from server.py.battleship import Battleship
+from server.py.game_updates import ViewCache, build_simulation_update, is_action_current
+from server.py.hangman import GamePhase, GuessLetterAction, Hangman, HangmanGameState
+from server.py.metrics import StageTimer
+
+
+def create_hangman() -> Hangman:
+    game = Hangman()
+    game.set_state(HangmanGameState(word_to_guess='devops', phase=GamePhase.RUNNING, guesses=[],
+                                    incorrect_guesses=[]))
+    return game
+
+
+class SortingHangman(Hangman):
+    """ Sorts the guesses and calls the (also counted) set_state() of Hangman """
+
+    def set_state(self, state: HangmanGameState) -> None:
+        state.guesses = sorted(state.guesses)
+        super().set_state(state)
+
+
+def test_set_state_and_apply_action_bump_the_state_version() -> None:
+    game = create_hangman()
+    version = game.state_version
+    game.apply_action(GuessLetterAction(letter='D'))
+    assert game.state_version == version + 1
+    game.set_state(game.get_state())
+    assert game.state_version == version + 2
+    assert Battleship().state_version == 0  # every game counts on its own
+    game = SortingHangman()
+    game.set_state(create_hangman().get_state())
+    assert game.state_version == 1  # not once more for the super() call
+
+
+def test_views_and_updates_are_built_once_per_version() -> None:
+    game = create_hangman()
+    timer = StageTimer()
+    views = ViewCache(game, timer)
+    state, list_action, data = views.get_player_update(0, True)
+    assert views.get_player_update(0, True)[2] is data
+    assert views.get_view_and_actions(0) == (state, list_action)
+    assert views.get_player_update(0, False)[2]['state']['list_action'] == []
+    assert timer.get_histogram('get_player_view').cnt == 1
+    assert timer.get_histogram('get_list_action').cnt == 1
+    game.apply_action(GuessLetterAction(letter='D'))
+    _, _, data_new = views.get_player_update(0, True)
+    assert data_new is not data
+    assert data_new['state']['word_to_guess'] == 'd_____'
+    assert data_new['state']['idx_player_you'] == 0 and len(data_new['state']['list_action']) == 25
+    assert data_new['state']['state_version'] == game.state_version
+
+
+def test_actions_chosen_on_an_older_state_are_not_current() -> None:
+    game = create_hangman()
+    version = game.state_version
+    assert is_action_current({'type': 'action', 'state_version': version}, game)
+    assert is_action_current({'type': 'action'}, game)  # clients without versions
+    game.apply_action(GuessLetterAction(letter='D'))
+    assert not is_action_current({'type': 'action', 'state_version': version}, game)
+
+
+def test_simulation_updates_carry_the_selected_action() -> None:
+    game = create_hangman()
+    action = GuessLetterAction(letter='X')
+    data = build_simulation_update(game.get_state(), 0, action)
+    assert data['state']['selected_action'] == {'letter': 'X'}
+    assert data['state']['word_to_guess'] == 'devops'
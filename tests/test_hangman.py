@@ -0,0 +1,60 @@
+import random
+import string
+import pytest
+from server.py.hangman import GamePhase, GuessLetterAction, Hangman, HangmanGameState, RandomPlayer
+
+
+def create_game(word: str, guesses: list[str] | None = None) -> Hangman:
+    game = Hangman()
+    game.set_state(HangmanGameState(word_to_guess=word, phase=GamePhase.RUNNING, guesses=guesses or [],
+                                    incorrect_guesses=[]))
+    return game
+
+
+def test_actions_are_the_letters_not_guessed_yet() -> None:
+    game = create_game('devops', ['A', 'B'])
+    assert {action.letter for action in game.get_list_action()} == set(string.ascii_uppercase[2:])
+    game.apply_action(GuessLetterAction(letter='d'))
+    assert game.get_state().guesses == ['A', 'B', 'D']
+    game.apply_action(GuessLetterAction(letter='D'))  # a repeated guess changes nothing
+    assert game.get_state().guesses == ['A', 'B', 'D']
+    assert game.get_state().incorrect_guesses == []
+
+
+def test_view_masks_the_letters_not_guessed_until_the_end() -> None:
+    game = create_game('DevOps')
+    game.apply_action(GuessLetterAction(letter='O'))
+    game.apply_action(GuessLetterAction(letter='X'))
+    view = game.get_player_view(0)
+    assert view.word_to_guess == '___O__'
+    assert view.incorrect_guesses == ['X']
+    for letter in 'DEVPS':
+        game.apply_action(GuessLetterAction(letter=letter))
+    assert game.get_state().phase == GamePhase.FINISHED
+    assert game.get_player_view(0).word_to_guess == 'DevOps'
+    assert game.get_list_action() == []
+
+
+def test_eight_incorrect_guesses_lose_the_game() -> None:
+    game = create_game('XY', list('ABCDEFG'))
+    game.apply_action(GuessLetterAction(letter='X'))
+    assert game.get_state().phase == GamePhase.RUNNING
+    game.apply_action(GuessLetterAction(letter='H'))
+    assert game.get_state().phase == GamePhase.FINISHED
+
+
+def test_print_state_shows_the_masked_word(capsys: pytest.CaptureFixture[str]) -> None:
+    game = create_game('devops', ['D', 'Z'])
+    game.print_state()
+    output = capsys.readouterr().out
+    assert 'd_____' in output and '(0/8)' in output
+
+
+def test_random_player_picks_a_possible_action() -> None:
+    game = create_game('devops')
+    player = RandomPlayer()
+    player.rng = random.Random(3)
+    action = player.select_action(game.get_player_view(0), game.get_list_action())
+    assert action in game.get_list_action()
+    with pytest.raises(ValueError):
+        player.select_action(game.get_player_view(0), [])
@@ -0,0 +1,73 @@
+import pytest
+from server.py.game_registry import get_game_spec, get_hangman_words, set_hangman_words
+from server.py.hangman import GamePhase, Hangman, HangmanGameState
+from server.py.hangman_solver import SolverPlayer
+from server.py.word_corpus import WordCorpus, WordCorpusService
+
+WORDS = ['apple', 'angle', 'ample', 'maple', 'table', 'cable', 'fable', 'sable', 'devops', 'python']
+
+
+def create_game(word: str) -> Hangman:
+    game = Hangman()
+    game.set_state(HangmanGameState(word_to_guess=word, phase=GamePhase.RUNNING, guesses=[], incorrect_guesses=[]))
+    return game
+
+
+def play(game: Hangman, player: SolverPlayer) -> int:
+    """ Play until the game is finished, returns the number of guesses """
+    cnt_guess = 0
+    while game.get_state().phase != GamePhase.FINISHED:
+        game.apply_action(player.select_action(game.get_player_view(0), game.get_list_action()))
+        cnt_guess += 1
+    return cnt_guess
+
+
+def test_solver_finds_every_word_of_its_corpus() -> None:
+    corpus = WordCorpus(WORDS)
+    for word in WORDS:
+        game = create_game(word)
+        play(game, SolverPlayer(corpus))
+        state = game.get_state()
+        assert set(state.word_to_guess.upper()).issubset(state.guesses), word
+        assert len(state.incorrect_guesses) < 8, word
+
+
+def test_solver_splits_the_candidates_in_half() -> None:
+    solver = SolverPlayer(WordCorpus(['ab', 'cd', 'ae', 'cf']))
+    game = create_game('ab')
+    action = solver.select_action(game.get_player_view(0), game.get_list_action())
+    assert action.letter in ('A', 'C')  # each is in half of the words
+
+
+def test_solver_restarts_for_a_new_word_and_handles_unknown_words() -> None:
+    solver = SolverPlayer(WordCorpus(WORDS))
+    assert play(create_game('table'), solver) <= 8
+    game = create_game('zzzzz')  # not in the corpus: the letter frequency of all five letter words is used
+    play(game, solver)
+    assert game.get_state().phase == GamePhase.FINISHED
+    with pytest.raises(ValueError):
+        solver.select_action(game.get_player_view(0), [])
+
+
+def test_solver_without_corpus_uses_the_shared_word_list() -> None:
+    word = get_hangman_words().get_random_word()
+    game = create_game(word)
+    play(game, SolverPlayer())
+    assert set(word.upper()).issubset(game.get_state().guesses)
+
+
+def test_registry_games_and_solver_use_the_word_list_of_the_server(tmp_path: pytest.TempPathFactory) -> None:
+    path = f'{tmp_path}/words.json'
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('["kiwi"]')
+    hangman_words = get_hangman_words()
+    set_hangman_words(WordCorpusService(path))
+    try:
+        spec = get_game_spec('hangman')
+        game = spec.create_game()
+        assert isinstance(game, Hangman) and game.get_state().word_to_guess == 'kiwi'
+        solver = spec.create_player('solver')
+        assert isinstance(solver, SolverPlayer)
+        assert play(game, solver) == 3  # K, I and W, the only word of the list
+    finally:
+        set_hangman_words(hangman_words)
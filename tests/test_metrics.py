@@ -0,0 +1,57 @@
+import pytest
+from server.py.engine_executor import ExecutorMetrics
+from server.py.metrics import (LIST_BUCKET, NULL_TIMER, Histogram, StageTimer, TurnMetrics, create_metrics_from_env,
+                               escape_label)
+
+
+def test_histogram_counts_cumulatively_per_bucket() -> None:
+    histogram = Histogram((0.1, 1.0))
+    for sec in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(sec)
+    assert histogram.get_cumulative() == ([2, 3, 4], pytest.approx(3.65), 4)
+
+
+def test_spans_time_their_stage() -> None:
+    timer = StageTimer()
+    with timer.span('apply_action'):
+        pass
+    with timer.span('apply_action'):
+        pass
+    assert list(timer.dict_histogram) == ['apply_action']
+    assert timer.get_histogram('apply_action').cnt == 2
+    with NULL_TIMER.span('apply_action'):
+        pass
+    assert not NULL_TIMER.dict_histogram
+
+
+def test_render_uses_the_prometheus_text_format() -> None:
+    metrics = TurnMetrics()
+    timer = metrics.get_timer('uno')
+    assert metrics.get_timer('uno') is timer
+    timer.get_histogram('send').observe(0.0003)
+    executor_metrics = ExecutorMetrics()
+    executor_metrics.on_submit()
+    metrics.add_executor('bot', executor_metrics)
+    metrics.startup.add('import "uno"', 0.5)
+    list_line = metrics.render().splitlines()
+    labels = 'game="uno",stage="send"'
+    assert f'game_stage_seconds_bucket{{{labels},le="0.00025"}} 0' in list_line
+    assert f'game_stage_seconds_bucket{{{labels},le="0.0005"}} 1' in list_line
+    assert f'game_stage_seconds_bucket{{{labels},le="+Inf"}} 1' in list_line
+    assert f'game_stage_seconds_count{{{labels}}} 1' in list_line
+    assert len([line for line in list_line if line.startswith('game_stage_seconds_bucket')]) == len(LIST_BUCKET) + 1
+    assert '# TYPE game_executor_queue_depth gauge' in list_line
+    assert 'game_executor_queue_depth{executor="bot"} 1' in list_line
+    assert 'server_startup_seconds{step="import \\"uno\\""} 0.5' in list_line
+
+
+def test_no_executor_metrics_without_executors() -> None:
+    assert 'game_executor' not in TurnMetrics().render()
+    assert escape_label('a\\b\n') == 'a\\\\b\\n'
+
+
+def test_disabled_metrics_hand_out_the_null_timer(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    metrics = create_metrics_from_env({'engine': ExecutorMetrics()})
+    assert metrics.get_timer('uno') is NULL_TIMER
+    assert list(metrics.dict_executor) == ['engine']
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from server.py.pacing import BotPacer, PacingScheduler, create_scheduler_from_env
+
+
+async def measure_wait(pacer: BotPacer) -> float:
+    loop = asyncio.get_running_loop()
+    time_start = loop.time()
+    await pacer.wait()
+    return loop.time() - time_start
+
+
+def test_delay_runs_from_the_last_update_shown() -> None:
+    async def run() -> tuple[float, float, float]:
+        pacer = BotPacer(0.2)
+        sec_first = await measure_wait(pacer)  # nothing shown yet: a full delay
+        pacer.mark_shown()
+        await asyncio.sleep(0.15)  # the bot was thinking
+        sec_thinking = await measure_wait(pacer)
+        pacer.mark_shown()
+        await asyncio.sleep(0.25)  # the bot needed longer than the delay
+        return sec_first, sec_thinking, await measure_wait(pacer)
+
+    sec_first, sec_thinking, sec_slow = asyncio.run(run())
+    assert 0.19 <= sec_first < 0.3
+    assert 0.03 <= sec_thinking < 0.1
+    assert sec_slow < 0.01
+
+
+def test_turbo_never_waits() -> None:
+    async def run() -> float:
+        pacer = PacingScheduler().create_pacer(10.0, turbo=True)
+        assert pacer.turbo
+        return await measure_wait(pacer)
+
+    assert asyncio.run(run()) < 0.01
+    assert PacingScheduler(turbo=True).create_pacer(1.0).turbo
+    assert not PacingScheduler().create_pacer(1.0).turbo
+
+
+def test_scheduler_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert not create_scheduler_from_env().turbo
+    monkeypatch.setenv('PACING_TURBO', '1')
+    assert create_scheduler_from_env().turbo
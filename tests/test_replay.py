@@ -0,0 +1,152 @@
+import os
+import random
+from typing import Any, List, Optional, TextIO
+import pytest
+from pydantic import BaseModel
+from server.py import game_registry
+from server.py.battleship import RandomPlayer
+from server.py.game import Game
+from server.py.game_registry import GameSpec, get_game_spec
+from server.py.hangman import GuessLetterAction
+from server.py.replay import (ReplayLog, Replayer, ReplayRecorder, ReplayStore, create_store_from_env, encode_action,
+                              read_varint, write_varint)
+
+
+class DiceState(BaseModel):
+    list_roll: List[int]
+    phase: str = 'running'
+
+
+class DiceGame(Game):
+    """ Rolls a die with the generator of the game on every turn """
+
+    def __init__(self) -> None:
+        self.state = DiceState(list_roll=[])
+
+    def set_state(self, state: DiceState) -> None:
+        self.state = state
+
+    def get_state(self) -> DiceState:
+        return self.state
+
+    def print_state(self, file: Optional[TextIO] = None) -> None:
+        print(self.state.list_roll, file=file)
+
+    def get_list_action(self) -> List[Any]:
+        return []
+
+    def apply_action(self, action: Any) -> None:
+        self.state.list_roll.append(self.rng.randint(1, 6))
+
+    def get_player_view(self, idx_player: int) -> DiceState:
+        return self.state
+
+
+def play_battleship(store: ReplayStore) -> tuple[ReplayRecorder, List[Any]]:
+    """ Play a recorded game of random bots, returns the recorder and the state after each turn """
+    game = get_game_spec('battleship').create_game()
+    recorder = store.create_recorder('battleship', game)
+    player = RandomPlayer()
+    player.rng = random.Random(11)
+    list_state = [game.get_state().model_copy(deep=True)]
+    while game.get_state().phase != 'finished':
+        list_action = game.get_list_action()
+        recorder.apply_action(player.select_action(game.get_state(), list_action), list_action)
+        list_state.append(game.get_state().model_copy(deep=True))
+    recorder.flush()
+    return recorder, list_state
+
+
+def test_varints_round_trip() -> None:
+    for value in (0, 1, 127, 128, 300, 2 ** 32 - 1, 2 ** 40):
+        data = b'x' + write_varint(value) + b'y'
+        assert read_varint(data, 1) == (value, len(data) - 1)
+    assert write_varint(300) == b'\xac\x02'
+
+
+def test_actions_are_encoded_as_their_index() -> None:
+    list_action = [GuessLetterAction(letter=letter) for letter in 'ABC']
+    assert encode_action(list_action, None) == b'\x00'
+    assert encode_action(list_action, GuessLetterAction(letter='C')) == b'\x04'
+    assert encode_action(list_action, GuessLetterAction(letter='Z')) == b'\x01\x0e{"letter":"Z"}'
+
+
+def test_replay_reproduces_every_state_of_the_game(tmp_path: pytest.TempPathFactory) -> None:
+    store = ReplayStore(str(tmp_path))
+    recorder, list_state = play_battleship(store)
+    replayer = store.load(recorder.game_id)
+    assert replayer.cnt_turn == len(list_state) - 1 > 64
+    assert replayer.log.game_name == 'battleship' and replayer.log.seed == recorder.seed
+    for turn in [0, 1, 5, 40, len(list_state) - 1, 3, 70, 33, 32]:
+        assert replayer.seek(turn) == list_state[turn], turn
+    assert replayer.seek(10 ** 6) == list_state[-1]
+    assert replayer.get_next_action() is None
+    replayer.seek(-5)
+    assert replayer.turn == 0
+    assert replayer.get_next_action() is not None
+
+
+def test_replay_draws_the_same_random_numbers(tmp_path: pytest.TempPathFactory,
+                                               monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(game_registry.GAMES, 'dice', GameSpec('dice', __name__, 'DiceGame', 1, {}, 'DiceState'))
+    store = ReplayStore(str(tmp_path))
+    game = get_game_spec('dice').create_game()
+    recorder = store.create_recorder('dice', game)
+    list_state = [game.get_state().model_copy(deep=True)]
+    for _ in range(40):
+        recorder.apply_action(None)
+        list_state.append(game.get_state().model_copy(deep=True))
+    recorder.flush()
+    assert len(set(list_state[-1].list_roll)) > 1
+    replayer = store.load(recorder.game_id)
+    for turn in [40, 3, 35, 0, 17]:
+        assert replayer.seek(turn) == list_state[turn], turn
+
+
+def test_seeded_games_start_the_same_way() -> None:
+    spec = get_game_spec('hangman')
+    list_state = [spec.create_game(rng=random.Random(seed)).get_state() for seed in (5, 6, 5)]
+    assert list_state[0] == list_state[2]
+
+
+def test_actions_not_in_the_list_are_replayed(tmp_path: pytest.TempPathFactory) -> None:
+    store = ReplayStore(str(tmp_path))
+    game = get_game_spec('hangman').create_game()
+    recorder = store.create_recorder('hangman', game)
+    recorder.apply_action(GuessLetterAction(letter='E'))
+    recorder.apply_action(GuessLetterAction(letter='e'))  # not in the list of actions: logged as JSON
+    recorder.flush()
+    log = ReplayLog.from_file(os.path.join(str(tmp_path), recorder.game_id + '.grl'))
+    assert [code for code, _ in log.list_code] == [2 + 4, 1]
+    replayer = Replayer(log)
+    replayer.seek(1)
+    assert replayer.get_next_action() == GuessLetterAction(letter='e')
+    assert replayer.seek(2) == game.get_state()
+
+
+def test_recorder_without_directory_only_applies_the_actions(tmp_path: pytest.TempPathFactory) -> None:
+    store = ReplayStore(str(tmp_path), enabled=False)
+    game = get_game_spec('hangman').create_game()
+    recorder = store.create_recorder('hangman', game)
+    recorder.apply_action(GuessLetterAction(letter='A'))
+    recorder.flush()
+    assert recorder.path is None and recorder.cnt_turn == 1
+    assert game.get_state().guesses == ['A']
+    assert not os.listdir(str(tmp_path))
+
+
+def test_store_rejects_unknown_ids_and_files(tmp_path: pytest.TempPathFactory) -> None:
+    store = ReplayStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.get_path('../etc')
+    with pytest.raises(ValueError):
+        store.load('abc123')
+    with pytest.raises(ValueError):
+        ReplayLog(b'JUNK')
+
+
+def test_store_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('REPLAY_DIR', '/tmp/other')
+    monkeypatch.setenv('REPLAY_ENABLED', '0')
+    store = create_store_from_env()
+    assert store.directory == '/tmp/other' and not store.enabled
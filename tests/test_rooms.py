@@ -0,0 +1,143 @@
+import asyncio
+import os
+from typing import Any, Dict, List
+import pytest
+from server.py.engine_executor import EngineExecutor
+from server.py.game_registry import get_game_spec
+from server.py.pacing import PacingScheduler
+from server.py.replay import ReplayStore
+from server.py.rooms import RoomError, RoomManager, create_room_manager_from_env, get_idx_player_active
+
+
+class FakeConnection:
+    """ Collects the messages sent to a client, or fails like a closed websocket """
+
+    def __init__(self, is_closed: bool = False) -> None:
+        self.is_closed = is_closed
+        self.list_message: List[Dict[str, Any]] = []
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        if self.is_closed:
+            raise ConnectionError('closed')
+        self.list_message.append(message)
+
+
+def create_manager(turbo: bool = True, max_rooms: int = 10, ttl: float = 600.0) -> RoomManager:
+    executor = EngineExecutor('inline')
+    return RoomManager(executor.session, PacingScheduler(turbo=turbo), max_rooms=max_rooms, ttl=ttl)
+
+
+def get_last_state(connection: FakeConnection) -> Dict[str, Any]:
+    state: Dict[str, Any] = connection.list_message[-1]['state']
+    return state
+
+
+def test_seat_zero_without_an_active_player() -> None:
+    assert get_idx_player_active(object()) == 0
+    state = get_game_spec('battleship').create_game().get_state()
+    state.idx_player_active = 1
+    assert get_idx_player_active(state) == 1
+
+
+def test_humans_are_seated_once_per_seat() -> None:
+    async def run() -> None:
+        manager = create_manager()
+        room = manager.create_room(get_game_spec('battleship'))
+        assert manager.get_room(room.game_id) is room
+        assert manager.join(room, FakeConnection()) == 0  # type: ignore[arg-type]
+        with pytest.raises(RoomError):
+            manager.join(room, FakeConnection(), 0)  # type: ignore[arg-type]
+        with pytest.raises(RoomError):
+            manager.join(room, FakeConnection(), 2)  # type: ignore[arg-type]
+        assert manager.join(room, FakeConnection()) == 1  # type: ignore[arg-type]
+        with pytest.raises(RoomError):
+            manager.join(room, FakeConnection())  # type: ignore[arg-type]
+        manager.leave(room, 0)
+        assert room.get_free_seat() == 0
+        with pytest.raises(RoomError):
+            manager.get_room('unknown')
+
+    asyncio.run(run())
+
+
+def test_bots_play_until_the_human_is_active_again() -> None:
+    async def run() -> None:
+        manager = create_manager()
+        room = manager.create_room(get_game_spec('battleship'))
+        connection = FakeConnection()
+        manager.join(room, connection)  # type: ignore[arg-type]
+        await room.start()
+        state = get_last_state(connection)
+        assert state['idx_player_you'] == 0 and state['list_action']
+        await room.apply_action(0, state['list_action'][0], state['state_version'])
+        state = get_last_state(connection)
+        assert room.game.get_state().idx_player_active == 0  # the bot at seat 1 has set its ship
+        assert state['list_action'] and state['state_version'] == room.game.state_version
+        assert len(room.game.get_state().players[1].ships[0].location) == 5
+        with pytest.raises(RoomError):
+            await room.apply_action(1, state['list_action'][0])
+        with pytest.raises(RoomError):
+            await room.apply_action(0, state['list_action'][0], state['state_version'] - 1)
+        cnt_message = len(connection.list_message)
+        await room.resend(0)
+        assert connection.list_message[-1] is connection.list_message[cnt_message - 1]  # the cached update
+
+    asyncio.run(run())
+
+
+def test_bot_move_is_dropped_when_a_human_takes_the_seat_during_its_pace() -> None:
+    async def run() -> None:
+        manager = create_manager(turbo=False)
+        room = manager.create_room(get_game_spec('battleship'))
+        room.pacer.delay = 0.2
+        connection = FakeConnection()
+        manager.join(room, connection, 1)  # type: ignore[arg-type]
+        task = asyncio.create_task(room.start())  # the bot at seat 0 moves first
+        await asyncio.sleep(0.05)
+        assert not room.lock.locked()  # not held while the bot's move waits
+        version = room.game.state_version
+        manager.join(room, FakeConnection(), 0)  # type: ignore[arg-type]
+        await task
+        assert room.game.state_version == version
+        assert room.game.get_state().players[0].ships[0].location is None
+
+    asyncio.run(run())
+
+
+def test_closed_connections_are_dropped_and_bots_stop_without_humans() -> None:
+    async def run() -> None:
+        manager = create_manager()
+        room = manager.create_room(get_game_spec('battleship'))
+        manager.join(room, FakeConnection(is_closed=True), 1)  # type: ignore[arg-type]
+        await room.start()
+        assert not room.dict_connection
+        assert room.game.get_state().players[0].ships[0].location is None  # no bot plays for nobody
+
+    asyncio.run(run())
+
+
+def test_idle_rooms_are_evicted_to_make_room(tmp_path: pytest.TempPathFactory) -> None:
+    async def run() -> None:
+        manager = create_manager(max_rooms=2, ttl=0.0)
+        manager.replays = ReplayStore(str(tmp_path))
+        room_idle = manager.create_room(get_game_spec('battleship'))
+        room_busy = manager.create_room(get_game_spec('battleship'))
+        manager.join(room_busy, FakeConnection())  # type: ignore[arg-type]
+        room_new = manager.create_room(get_game_spec('battleship'))
+        assert set(manager.dict_room) == {room_busy.game_id, room_new.game_id}
+        assert room_idle.game_id not in manager.dict_room
+        manager.join(room_new, FakeConnection())  # type: ignore[arg-type]
+        with pytest.raises(RoomError):
+            manager.create_room(get_game_spec('battleship'))
+        assert len(os.listdir(str(tmp_path))) == 3  # every room logs a replay
+
+    asyncio.run(run())
+
+
+def test_room_manager_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('ROOMS_MAX', '3')
+    monkeypatch.setenv('ROOMS_TTL', '5')
+    executor = EngineExecutor('inline')
+    manager = create_room_manager_from_env(executor, executor, PacingScheduler())
+    assert manager.max_rooms == 3 and manager.ttl == 5.0 and manager.replays is None
+    assert manager.create_session().executor is executor
@@ -0,0 +1,197 @@
+import asyncio
+import socket
+from typing import Any, Dict, List, Optional
+import pytest
+from server.py.engine_executor import EngineExecutor
+from server.py.hangman import GamePhase, GuessLetterAction, Hangman, HangmanGameState
+from server.py.sessions import (GameManager, ManagedGame, MemorySessionStore, SessionConflict, SessionStore,
+                                SocketSessionStore, create_manager_from_env, create_session_store_from_env,
+                                handle_request, serve)
+from server.py.snapshots import MemorySnapshotStore, SnapshotWriter
+
+
+class FakeWebSocket:
+    """ The parts of a websocket the game manager uses: the query parameters and close() """
+
+    def __init__(self, game_id: Optional[str] = None) -> None:
+        self.query_params: Dict[str, str] = {} if game_id is None else {'game_id': game_id}
+        self.list_code_close: List[int] = []
+
+    async def close(self, code: int) -> None:
+        self.list_code_close.append(code)
+
+
+def create_game(word: str = 'devops') -> Hangman:
+    game = Hangman()
+    game.set_state(HangmanGameState(word_to_guess=word, phase=GamePhase.RUNNING, guesses=[], incorrect_guesses=[]))
+    return game
+
+
+def create_manager(store: Optional[SessionStore]) -> GameManager:
+    return GameManager(store, SnapshotWriter(MemorySnapshotStore()), EngineExecutor('thread'))
+
+
+async def open_game(manager: GameManager, game_id: Optional[str] = None) -> ManagedGame:
+    websocket: Any = FakeWebSocket(game_id)
+    return await manager.open(EngineExecutor('inline').session(), create_game('other'), 'hangman', websocket)
+
+
+async def play(manager: GameManager, managed: ManagedGame, letters: str) -> None:
+    for letter in letters:
+        managed.game.apply_action(GuessLetterAction(letter=letter))
+        await manager.commit(managed)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def test_put_rejects_a_stale_version() -> None:
+    store = MemorySessionStore()
+    assert store.put('g1', 'hangman', '{}', 0) == 1
+    assert store.put('g1', 'hangman', '{"a":1}', 1) == 2
+    with pytest.raises(SessionConflict):
+        store.put('g1', 'hangman', '{"b":1}', 1)
+    with pytest.raises(SessionConflict):
+        store.put('g1', 'hangman', '{"b":1}', 0)  # a new game must not exist yet
+    assert store.get('g1') == ('hangman', 2, '{"a":1}')
+    store.delete('g1')
+    assert store.get('g1') is None
+
+
+def test_expired_sessions_are_swept(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('server.py.sessions.SWEEP_INTERVAL', 2)
+    store = MemorySessionStore(ttl=0.0)
+    store.put('g1', 'hangman', '{}', 0)
+    store.put('g2', 'hangman', '{}', 0)
+    assert list(store.dict_session) == ['g2']  # put before the sweep's time limit
+
+
+def test_requests_of_the_socket_protocol() -> None:
+    store = MemorySessionStore()
+    assert handle_request(store, {'op': 'put', 'game_id': 'g', 'game_name': 'uno', 'state': '{}', 'version': 0}) \
+        == {'version': 1}
+    assert handle_request(store, {'op': 'get', 'game_id': 'g'}) == {'record': ('uno', 1, '{}')}
+    response = handle_request(store, {'op': 'put', 'game_id': 'g', 'game_name': 'uno', 'state': '{}', 'version': 0})
+    assert response['error'] == 'conflict'
+    assert not handle_request(store, {'op': 'delete', 'game_id': 'g'})
+    assert handle_request(store, {'op': 'drop'})['error'] == 'request'
+
+
+def test_local_store_is_written_when_the_connection_closes() -> None:
+    store = MemorySessionStore()
+    manager = create_manager(store)
+
+    async def run() -> None:
+        managed = await open_game(manager)
+        assert store.get(managed.game_id) is not None and managed.version == 1
+        await play(manager, managed, 'DE')
+        assert managed.task_write is None and managed.is_dirty
+        await manager.close(managed)
+        record = store.get(managed.game_id)
+        assert record is not None and record[1] == 2 and '"guesses":["D","E"]' in record[2]
+        resumed = await open_game(manager, managed.game_id)
+        assert resumed.game_id == managed.game_id and resumed.version == 2
+        assert resumed.game.get_state().guesses == ['D', 'E']
+        await play(manager, resumed, 'OTHR')
+        await manager.close(resumed)
+        assert store.get(managed.game_id) is None  # finished games are removed
+
+    asyncio.run(run())
+
+
+def test_game_taken_over_on_the_same_worker_stops_the_older_connection() -> None:
+    store = MemorySessionStore()
+    manager = create_manager(store)
+
+    async def run() -> None:
+        managed = await open_game(manager)
+        await play(manager, managed, 'D')
+        managed_new = await open_game(manager, managed.game_id)
+        assert managed.is_stale
+        assert managed_new.game.get_state().guesses == ['D']
+        with pytest.raises(SessionConflict):
+            await play(manager, managed, 'E')
+        await manager.close(managed)
+        assert manager.dict_game[managed.game_id] is managed_new
+        assert await manager.release(5) == 1
+        assert managed_new.websocket.list_code_close == [1012]  # type: ignore[attr-defined]
+
+    asyncio.run(run())
+
+
+def test_shared_store_is_written_behind_the_actions_and_detects_other_workers() -> None:
+    port = get_free_port()
+    store_server = MemorySessionStore()
+
+    async def run() -> None:
+        task_server = asyncio.create_task(serve(store_server, '127.0.0.1', port))
+        await asyncio.sleep(0.1)
+        manager = create_manager(SocketSessionStore('127.0.0.1', port))
+        manager_other = create_manager(SocketSessionStore('127.0.0.1', port))  # another worker
+        managed = await open_game(manager)
+        await play(manager, managed, 'DEV')
+        await manager.flush(managed)
+        record = store_server.get(managed.game_id)
+        assert record is not None and '"guesses":["D","E","V"]' in record[2]
+        assert managed.version == record[1] <= 4  # the actions applied during a write are coalesced
+        managed_other = await open_game(manager_other, managed.game_id)
+        assert managed_other.game.get_state().guesses == ['D', 'E', 'V']
+        await play(manager_other, managed_other, 'O')
+        await manager_other.flush(managed_other)
+        await play(manager, managed, 'X')  # written behind: the conflict shows at the next write
+        await manager.flush(managed)
+        assert managed.is_stale
+        with pytest.raises(SessionConflict):
+            await manager.commit(managed)
+        await manager.close(managed)
+        record = store_server.get(managed.game_id)
+        assert record is not None and '"guesses":["D","E","V","O"]' in record[2]
+        task_server.cancel()
+
+    asyncio.run(run())
+
+
+def test_failed_writes_keep_the_game_dirty() -> None:
+    manager = create_manager(SocketSessionStore('127.0.0.1', get_free_port(), timeout=0.5))
+    managed = ManagedGame('g1', 'hangman', create_game(), EngineExecutor('inline').session(),
+                          FakeWebSocket(), 1)  # type: ignore[arg-type]
+
+    async def run() -> None:
+        await play(manager, managed, 'D')
+        await manager.flush(managed)
+
+    asyncio.run(run())
+    assert managed.is_dirty and not managed.is_stale
+
+
+def test_manager_without_store_resumes_from_the_snapshots() -> None:
+    manager = create_manager(None)
+
+    async def run() -> None:
+        managed = await open_game(manager)
+        await play(manager, managed, 'D')
+        await manager.close(managed)
+        assert manager.snapshots.flush_pending() == 1
+        resumed = await open_game(manager, managed.game_id)
+        assert resumed.game.get_state().guesses == ['D']
+
+    asyncio.run(run())
+
+
+def test_store_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    writer = SnapshotWriter(None)
+    assert isinstance(create_manager_from_env(writer).store, MemorySessionStore)
+    monkeypatch.setenv('SESSION_STORE', 'socket')
+    monkeypatch.setenv('SESSION_ADDRESS', 'localhost:9000')
+    manager = create_manager_from_env(writer)
+    assert isinstance(manager.store, SocketSessionStore) and manager.store.port == 9000
+    assert manager.executor.kind == 'thread'
+    monkeypatch.setenv('SESSION_STORE', 'off')
+    assert create_session_store_from_env() is None
+    monkeypatch.setenv('SESSION_STORE', 'redis')
+    with pytest.raises(ValueError):
+        create_session_store_from_env()
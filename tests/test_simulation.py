@@ -0,0 +1,107 @@
+from typing import Any, Callable
+import asyncio
+import json
+import random
+import pytest
+from fastapi.testclient import TestClient
+from server.py.main import create_app
+from server.py.game_registry import get_game_spec, get_list_game_name
+from server.py.simulation import MAX_CHUNKS_IN_FLIGHT, MAX_GAMES, SimulationStats, get_percentile, run_games
+
+
+def test_registry_knows_the_games_and_their_bots() -> None:
+    assert get_list_game_name() == ['hangman', 'battleship', 'uno', 'dog']
+    spec = get_game_spec('battleship')
+    assert spec.cnt_player == 2
+    with pytest.raises(ValueError):
+        spec.create_player('genius')
+    with pytest.raises(ValueError):
+        get_game_spec('chess')
+
+
+def test_games_of_the_same_seed_are_played_the_same_way() -> None:
+    list_result = run_games('battleship', ['random', 'random'], [1, 2, 1])
+    for result in list_result:
+        assert result['finished'] and result['winner'] in (0, 1)
+    assert [result['seed'] for result in list_result] == [1, 2, 1]
+    assert list_result[0]['cnt_actions'] == list_result[2]['cnt_actions']
+
+
+def test_games_draw_from_their_own_generator() -> None:
+    random.seed(1)
+    state = random.getstate()
+    list_result = run_games('hangman', ['random'], [5, 6, 5])
+    assert random.getstate() == state
+    assert list_result[0]['cnt_actions'] == list_result[2]['cnt_actions']
+
+
+def test_solver_wins_hangman_and_the_action_limit_stops_a_game() -> None:
+    assert [result['winner'] for result in run_games('hangman', ['solver'], [3, 4])] == [0, 0]
+    result = run_games('hangman', ['random'], [5], max_actions=2)[0]
+    assert result['cnt_actions'] == 2 and not result['finished'] and result['winner'] is None
+
+
+def test_crashing_games_are_reported_as_errors() -> None:
+    result = run_games('uno', ['random'] * 4, [1])[0]
+    assert 'Error' in result['error'] and '.py:' in result['error']  # where the engine failed
+    assert result['seed'] == 1
+
+
+def test_stats_aggregate_wins_lengths_and_errors() -> None:
+    stats = SimulationStats('battleship', ['random', 'random'], 4)
+    for cnt_actions, winner in ((10, 0), (20, 1), (30, 1)):
+        stats.add({'finished': True, 'winner': winner, 'cnt_actions': cnt_actions, 'duration': 0.5})
+    stats.add({'error': 'ValueError: boom', 'duration': 0.5})
+    dict_stats = stats.to_dict(is_final=True)
+    assert dict_stats['type'] == 'result'
+    assert dict_stats['cnt_done'] == 4 and dict_stats['cnt_finished'] == 3 and dict_stats['cnt_errors'] == 1
+    assert dict_stats['win_rate'] == [0.25, 0.5]
+    assert dict_stats['game_length']['mean'] == 20 and dict_stats['game_length']['p50'] == 20
+    assert dict_stats['actions_per_sec'] == 30.0
+    assert dict_stats['errors'] == ['ValueError: boom']
+    assert get_percentile([], 50) is None
+
+
+def test_endpoint_streams_progress_and_a_result(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SIMULATION_EXECUTOR', 'inline')
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    with TestClient(create_app(['battleship'])) as client:
+        response = client.get('/simulation/battleship/run', params={'cnt_games': 3, 'seed': 7})
+        assert response.status_code == 200
+        list_line = [json.loads(line) for line in response.text.splitlines()]
+        assert [line['type'] for line in list_line] == ['progress'] * 3 + ['result']
+        assert list_line[-1]['cnt_finished'] == 3
+        assert client.get('/simulation/chess/run').status_code == 404
+        assert client.get('/simulation/battleship/run', params={'bots': 'genius'}).status_code == 404
+        assert client.get('/simulation/battleship/run', params={'cnt_games': 0}).status_code == 422
+        assert client.get('/simulation/battleship/run', params={'cnt_games': MAX_GAMES + 1}).status_code == 422
+
+
+class CountingExecutor:
+    """ Runs the calls after a pause and counts how many were submitted but not yet done """
+
+    def __init__(self) -> None:
+        self.cnt_in_flight = 0
+        self.max_in_flight = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        self.cnt_in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.cnt_in_flight)
+        try:
+            await asyncio.sleep(0)
+            return func(*args)
+        finally:
+            self.cnt_in_flight -= 1
+
+
+def test_endpoint_keeps_a_bounded_number_of_chunks_in_flight(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SIMULATION_EXECUTOR', 'inline')
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    with TestClient(create_app(['hangman'])) as client:
+        executor = CountingExecutor()
+        monkeypatch.setattr(client.app.state.context.simulation_executor, 'run', executor.run)  # type: ignore
+        cnt_games = 50 * MAX_CHUNKS_IN_FLIGHT * 2
+        response = client.get('/simulation/hangman/run', params={'cnt_games': cnt_games, 'max_actions': 1})
+        list_line = [json.loads(line) for line in response.text.splitlines()]
+        assert len(list_line) == MAX_CHUNKS_IN_FLIGHT * 2 + 1 and list_line[-1]['cnt_done'] == cnt_games
+        assert executor.max_in_flight == MAX_CHUNKS_IN_FLIGHT
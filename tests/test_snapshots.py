@@ -0,0 +1,170 @@
+from typing import Callable, List, Optional, Tuple
+import asyncio
+import atexit
+import logging
+import os
+import sqlite3
+import time
+import zlib
+import pytest
+from server.py.engine_executor import EngineExecutor
+from server.py.game_registry import get_game_spec
+from server.py.hangman import GamePhase, GuessLetterAction, Hangman, HangmanGameState
+from server.py.snapshots import (MemorySnapshotStore, Snapshot, SnapshotStore, SnapshotWriter, SqliteSnapshotStore,
+                                 create_writer_from_env, set_state_json)
+
+
+def create_game(word: str = 'devops') -> Hangman:
+    game = Hangman()
+    game.set_state(HangmanGameState(word_to_guess=word, phase=GamePhase.RUNNING, guesses=[], incorrect_guesses=[]))
+    return game
+
+
+def create_store(kind: str, directory: str) -> SnapshotStore:
+    if kind == 'sqlite':
+        return SqliteSnapshotStore(os.path.join(directory, 'sub', 'games.sqlite3'))
+    return MemorySnapshotStore()
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_store_keeps_the_newest_snapshot_per_game(kind: str, tmp_path: pytest.TempPathFactory) -> None:
+    store = create_store(kind, str(tmp_path))
+    assert store.load('g1') is None
+    assert store.delete_older_than(time.time() + 1) == 0
+    store.save_many([('g1', ('hangman', 1, b'a')), ('g2', ('hangman', 5, b'b'))])
+    store.save_many([('g1', ('hangman', 2, b'c')), ('g2', None)])
+    assert store.load('g1') == ('hangman', 2, b'c')
+    assert store.load('g2') is None
+    assert store.delete_older_than(time.time() - 60) == 0
+    assert store.delete_older_than(time.time() + 1) == 1
+    assert store.load('g1') is None
+
+
+def test_sqlite_file_is_created_on_first_save_and_shared(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), 'games.sqlite3')
+    store = SqliteSnapshotStore(path)
+    assert store.load('g1') is None
+    assert not os.path.exists(path)
+    store.save_many([('g1', ('uno', 3, b'x'))])
+    assert SqliteSnapshotStore(path).load('g1') == ('uno', 3, b'x')  # e.g. another worker of the host
+
+
+def test_failed_batch_is_rolled_back(tmp_path: pytest.TempPathFactory) -> None:
+    store = SqliteSnapshotStore(os.path.join(str(tmp_path), 'games.sqlite3'))
+    store.save_many([('g1', ('uno', 1, b'x'))])
+    with pytest.raises(sqlite3.Error):
+        store.save_many([('g1', ('uno', 2, b'y')), ('g2', ('uno', 1))])  # type: ignore[list-item]
+    assert store.load('g1') == ('uno', 1, b'x')
+
+
+def test_writer_saves_every_few_actions_and_resumes_the_game() -> None:
+    store = MemorySnapshotStore()
+    writer = SnapshotWriter(store, every=2, flush_interval=0.01)
+    session = EngineExecutor('inline').session()
+
+    async def run() -> Hangman:
+        game = create_game()
+        game_id = await writer.resume(session, game, 'hangman', None)
+        for letter in 'DEX':
+            game.apply_action(GuessLetterAction(letter=letter))
+            await writer.save(session, game_id, 'hangman', game)
+        assert writer.flush_pending() == 1
+        game_name, version, state_json = store.load(game_id) or ('', 0, b'')
+        assert game_name == 'hangman' and version == 4  # saved after D and after X, not after E
+        assert HangmanGameState.model_validate_json(zlib.decompress(state_json)).guesses == ['D', 'E', 'X']
+        game.apply_action(GuessLetterAction(letter='V'))
+        await writer.save(session, game_id, 'hangman', game)
+        assert writer.flush_pending() == 0  # not due yet
+        await writer.save_final(session, game_id, 'hangman', game)
+        await asyncio.sleep(0.05)  # the background batch
+        writer.close_game(game_id)
+        game_resumed = create_game('other')
+        assert await writer.resume(session, game_resumed, 'hangman', game_id) == game_id
+        assert await writer.resume(session, create_game(), 'battleship', game_id) != game_id
+        return game_resumed
+
+    game = asyncio.run(run())
+    assert game.get_state().guesses == ['D', 'E', 'X', 'V']
+    assert game.get_state().word_to_guess == 'devops'
+
+
+def test_finished_games_are_removed_from_the_store() -> None:
+    store = MemorySnapshotStore()
+    writer = SnapshotWriter(store, every=1)
+    game = create_game('a')
+    store.save_many([('g1', ('hangman', 1, b'old'))])
+    game.apply_action(GuessLetterAction(letter='A'))
+    writer.capture('g1', 'hangman', game)
+    assert writer.flush_pending() == 1
+    assert store.load('g1') is None
+
+
+def test_writer_without_store_saves_nothing() -> None:
+    writer = SnapshotWriter(None)
+    session = EngineExecutor('inline').session()
+    game = create_game()
+
+    async def run() -> str:
+        game.apply_action(GuessLetterAction(letter='A'))
+        await writer.save_final(session, 'g1', 'hangman', game)
+        return await writer.resume(session, game, 'hangman', 'g1')
+
+    assert asyncio.run(run()) != 'g1'
+    assert writer.flush_pending() == 0
+
+
+def test_state_is_restored_from_json() -> None:
+    game = get_game_spec('hangman').create_game()
+    set_state_json(game, create_game('json').get_state().model_dump_json())
+    assert game.get_state().word_to_guess == 'json'
+
+
+def test_closed_writer_flushes_and_is_not_called_at_exit(monkeypatch: pytest.MonkeyPatch) -> None:
+    list_at_exit: List[Callable[[], int]] = []
+    monkeypatch.setattr(atexit, 'register', list_at_exit.append)
+    monkeypatch.setattr(atexit, 'unregister', list_at_exit.remove)
+    store = MemorySnapshotStore()
+    writer = SnapshotWriter(store, every=1)
+    assert list_at_exit == [writer.flush_pending]
+    game = create_game()
+    game.apply_action(GuessLetterAction(letter='A'))
+    writer.capture('g1', 'hangman', game)
+    writer.close()
+    assert store.load('g1') is not None
+    assert not list_at_exit
+
+
+def test_unexpected_flush_errors_are_logged(caplog: pytest.LogCaptureFixture) -> None:
+    class BrokenStore(MemorySnapshotStore):
+
+        def save_many(self, list_item: List[Tuple[str, Optional[Snapshot]]]) -> None:
+            raise KeyError('broken')
+
+    writer = SnapshotWriter(BrokenStore(), every=1, flush_interval=0.01)
+    session = EngineExecutor('inline').session()
+
+    async def run() -> None:
+        game = create_game()
+        game.apply_action(GuessLetterAction(letter='A'))
+        await writer.save(session, 'g1', 'hangman', game)
+        await asyncio.sleep(0.1)
+
+    with caplog.at_level(logging.ERROR, logger='server.snapshots'):
+        asyncio.run(run())
+    assert [record.message for record in caplog.records] == ['snapshot flusher failed']
+    writer.close()
+
+
+def test_writer_from_env(monkeypatch: pytest.MonkeyPatch, tmp_path: pytest.TempPathFactory) -> None:
+    monkeypatch.setenv('SNAPSHOT_PATH', os.path.join(str(tmp_path), 'games.sqlite3'))
+    monkeypatch.setenv('SNAPSHOT_EVERY', '3')
+    writer = create_writer_from_env()
+    assert isinstance(writer.store, SqliteSnapshotStore) and writer.every == 3  # the default
+    assert not os.listdir(str(tmp_path))  # configuring the store does not create the file
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    assert isinstance(create_writer_from_env().store, MemorySnapshotStore)
+    monkeypatch.setenv('SNAPSHOT_STORE', 'off')
+    assert create_writer_from_env().store is None
+    monkeypatch.setenv('SNAPSHOT_STORE', 'redis')
+    with pytest.raises(ValueError):
+        create_writer_from_env()
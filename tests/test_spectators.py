@@ -0,0 +1,132 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from server.py.delta import DeltaEncoder
+from server.py.main import create_app
+from server.py.spectators import SpectatorHub, Subscriber, create_hub_from_env
+from server.py.wire import Connection, JsonCodec, MessagePackCodec
+
+
+class FakeWebSocket:
+    """ Collects the frames sent to a spectator, the spectator leaves when disconnected is set """
+
+    def __init__(self, error_send: Optional[Exception] = None) -> None:
+        self.list_frame: List[Union[str, bytes]] = []
+        self.error_send = error_send
+        self.disconnected = asyncio.Event()
+
+    async def send_text(self, frame: str) -> None:
+        if self.error_send is not None:
+            raise self.error_send
+        self.list_frame.append(frame)
+
+    async def send_bytes(self, frame: bytes) -> None:
+        self.list_frame.append(frame)
+
+    async def receive(self) -> Dict[str, Any]:
+        await self.disconnected.wait()
+        return {'type': 'websocket.disconnect', 'code': 1001}
+
+
+def create_connection(codec: JsonCodec, error_send: Optional[Exception] = None) -> Connection:
+    return Connection(FakeWebSocket(error_send), codec, DeltaEncoder(enabled=False))  # type: ignore[arg-type]
+
+
+def get_frames(subscriber: Subscriber) -> List[Union[str, bytes]]:
+    websocket: FakeWebSocket = subscriber.connection.websocket  # type: ignore[assignment]
+    return websocket.list_frame
+
+
+def test_full_buffer_skips_the_oldest_frame_and_drops_slow_spectators() -> None:
+    async def run() -> None:
+        subscriber = Subscriber(create_connection(JsonCodec()), max_buffer=2, max_skipped=2)
+        assert subscriber.offer('1') and subscriber.offer('2') and subscriber.offer('3')
+        assert subscriber.cnt_skipped == 1
+        subscriber.close()
+        await subscriber.run()
+        assert get_frames(subscriber) == ['3']  # the end marker takes the place of the oldest frame
+        subscriber = Subscriber(create_connection(JsonCodec()), max_buffer=1, max_skipped=2)
+        assert subscriber.offer('1') and subscriber.offer('2') and subscriber.offer('3')
+        assert not subscriber.offer('4')
+        assert subscriber.is_dropped
+        await subscriber.run()
+        assert not get_frames(subscriber)
+
+    asyncio.run(run())
+
+
+def test_each_update_is_encoded_once_per_wire_format() -> None:
+    async def run() -> None:
+        hub = SpectatorHub(max_buffer=4, max_skipped=4)
+        channel = hub.create_channel('uno')
+        assert hub.get_channel(channel.game_id) is channel
+        list_subscriber = [channel.subscribe(create_connection(codec))
+                           for codec in (JsonCodec(), JsonCodec(), MessagePackCodec([]))]
+        message = {'type': 'update', 'state': {'cnt': 1}}
+        channel.publish(message)
+        late = channel.subscribe(create_connection(JsonCodec()))  # starts with the last update
+        assert hub.get_list_channel() == [{'game_id': channel.game_id, 'game': 'uno', 'cnt_spectators': 4}]
+        hub.close_channel(channel)
+        assert hub.get_channel(channel.game_id) is None
+        for subscriber in list_subscriber + [late]:
+            await subscriber.run()
+        frame_json = get_frames(list_subscriber[0])[0]
+        assert frame_json == '{"type":"update","state":{"cnt":1}}'
+        assert get_frames(list_subscriber[1])[0] is frame_json
+        assert msgpack.unpackb(get_frames(list_subscriber[2])[0]) == message
+        assert get_frames(late) == [frame_json]
+
+    asyncio.run(run())
+
+
+def test_spectators_who_leave_are_noticed_without_an_update() -> None:
+    async def run() -> None:
+        subscriber = Subscriber(create_connection(JsonCodec()), max_buffer=2, max_skipped=2)
+        task = asyncio.create_task(subscriber.run())
+        await asyncio.sleep(0)
+        websocket: FakeWebSocket = subscriber.connection.websocket  # type: ignore[assignment]
+        websocket.disconnected.set()
+        await asyncio.wait_for(task, 1.0)
+        assert subscriber.is_disconnected and not subscriber.is_dropped
+        subscriber = Subscriber(create_connection(JsonCodec(), RuntimeError('closed')), max_buffer=2, max_skipped=2)
+        subscriber.offer('1')
+        await subscriber.run()  # the failed send ends the writer instead of escaping
+        assert subscriber.is_disconnected
+
+    asyncio.run(run())
+
+
+def test_dropped_spectators_leave_the_channel() -> None:
+    channel = SpectatorHub(max_buffer=1, max_skipped=0).create_channel('dog')
+    channel.subscribe(create_connection(JsonCodec()))
+    channel.publish({'type': 'update', 'state': {}})
+    channel.publish({'type': 'update', 'state': {}})
+    assert not channel.set_subscriber and channel.cnt_dropped == 1
+
+
+def test_unknown_games_cannot_be_watched(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    with TestClient(create_app(['dog'])) as client:
+        assert client.get('/spectate/').json() == []
+        with client.websocket_connect('/spectate/unknown/ws') as websocket:
+            assert websocket.receive_json()['type'] == 'error'
+
+
+def test_spectators_leave_the_channel_when_they_disconnect(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    with TestClient(create_app(['dog'])) as client:
+        channel = client.app.state.context.spectators.create_channel('dog')  # type: ignore[attr-defined]
+        channel.publish({'type': 'update', 'state': {'cnt': 1}})
+        with client.websocket_connect(f'/spectate/{channel.game_id}/ws') as websocket:
+            assert websocket.receive_json()['state'] == {'cnt': 1}
+            assert len(channel.set_subscriber) == 1
+        assert not channel.set_subscriber
+
+
+def test_hub_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SPECTATOR_BUFFER', '3')
+    monkeypatch.setenv('SPECTATOR_MAX_SKIPPED', '5')
+    hub = create_hub_from_env()
+    assert hub.max_buffer == 3 and hub.max_skipped == 5
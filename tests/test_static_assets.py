@@ -0,0 +1,120 @@
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.templating import Jinja2Templates
+from fastapi.testclient import TestClient
+from server.py.static_assets import (CACHE_IMMUTABLE, CACHE_REVALIDATE, Asset, AssetCache, AssetManifest,
+                                     mount_static_from_env, select_encoding)
+
+SCRIPT = b'function play() { return "card"; }\n' * 50
+
+
+def write_file(directory: str, path: str, content: bytes) -> None:
+    path_file = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(path_file), exist_ok=True)
+    with open(path_file, 'wb') as fout:
+        fout.write(content)
+
+
+@pytest.fixture(name='directory')
+def fixture_directory(tmp_path: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setenv('STATIC_CACHE_DIR', os.path.join(str(tmp_path), 'cache'))
+    directory = os.path.join(str(tmp_path), 'static')
+    write_file(directory, 'js/game.js', SCRIPT)
+    write_file(directory, 'game/uno/img/red_1.png', b'\x89PNG one')
+    write_file(directory, 'game/uno/img/red_2.png', b'\x89PNG two')
+    write_file(directory, 'tiny.css', b'a{}')
+    return directory
+
+
+def create_client(directory: str) -> tuple[TestClient, Jinja2Templates]:
+    app = FastAPI()
+    templates = Jinja2Templates(directory=directory)
+    mount_static_from_env(app, templates, directory)
+    return TestClient(app), templates
+
+
+def test_urls_change_with_the_content(directory: str) -> None:
+    manifest = AssetManifest(directory)
+    url = manifest.get_url('js/game.js')
+    url_dir = manifest.get_url_dir('/game/uno/img/')
+    assert url.startswith('/inc/static/js/game.') and url.endswith('.js')
+    assert url_dir.startswith('/inc/static/_v/') and url_dir.endswith('/game/uno/img/')
+    assert manifest.get_url('missing.js') == '/inc/static/missing.js'
+    assert manifest.get_url_dir('missing') == '/inc/static/missing/'
+    write_file(directory, 'game/uno/img/red_2.png', b'\x89PNG changed')
+    manifest_new = AssetManifest(directory)
+    assert manifest_new.get_url('js/game.js') == url
+    assert manifest_new.get_url_dir('game/uno/img') != url_dir
+    assert manifest_new.get_url_dir('game') != manifest.get_url_dir('game')
+
+
+def test_only_text_files_which_shrink_are_precompressed(directory: str) -> None:
+    manifest = AssetManifest(directory)
+    assert 'gzip' in manifest.dict_asset['js/game.js'].dict_encoded
+    assert not manifest.dict_asset['tiny.css'].dict_encoded
+    assert not manifest.dict_asset['game/uno/img/red_1.png'].dict_encoded
+    asset = manifest.dict_asset['js/game.js']
+    assert select_encoding(asset, 'deflate, gzip;q=0.8') == 'gzip'
+    assert select_encoding(asset, 'identity') is None
+
+
+def test_cache_skips_unchanged_files_at_the_next_start(directory: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache_dir = os.environ['STATIC_CACHE_DIR']
+    manifest = AssetManifest(directory, cache=AssetCache(cache_dir))
+    list_name = sorted(os.listdir(cache_dir))
+    assert 'index.json' in list_name and len(list_name) == 2  # the index and the gzip variant of game.js
+
+    def precompress(asset: Asset, _content: bytes) -> None:
+        list_path.append(asset.path)
+    list_path: list[str] = []
+    monkeypatch.setattr(Asset, 'precompress', precompress)
+    manifest_cached = AssetManifest(directory, cache=AssetCache(cache_dir))
+    assert not list_path
+    assert manifest_cached.get_url('js/game.js') == manifest.get_url('js/game.js')
+    assert manifest_cached.dict_asset['js/game.js'].dict_encoded == manifest.dict_asset['js/game.js'].dict_encoded
+
+    write_file(directory, 'js/game.js', b'changed')
+    os.utime(os.path.join(directory, 'js', 'game.js'), ns=(1, 1))
+    os.remove(os.path.join(directory, 'tiny.css'))
+    manifest_changed = AssetManifest(directory, cache=AssetCache(cache_dir))
+    assert list_path == ['js/game.js']
+    assert manifest_changed.get_url('js/game.js') != manifest.get_url('js/game.js')
+    assert os.listdir(cache_dir) == ['index.json']  # the variant of the old content is gone
+    assert 'tiny.css' not in AssetCache(cache_dir).dict_entry
+
+
+def test_versioned_urls_are_cached_forever(directory: str) -> None:
+    client, templates = create_client(directory)
+    url = templates.env.globals['static']('js/game.js')  # type: ignore[operator]
+    response = client.get(url, headers={'accept-encoding': 'gzip'})
+    assert response.status_code == 200 and response.content == SCRIPT
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['cache-control'] == CACHE_IMMUTABLE
+    assert response.headers['vary'] == 'Accept-Encoding'
+    response_cached = client.get(url, headers={'accept-encoding': 'gzip', 'if-none-match': response.headers['etag']})
+    assert response_cached.status_code == 304
+    url_dir = templates.env.globals['static_dir']('game/uno/img')  # type: ignore[operator]
+    response = client.get(url_dir + 'red_1.png')
+    assert response.content == b'\x89PNG one' and response.headers['cache-control'] == CACHE_IMMUTABLE
+
+
+def test_plain_and_wrong_urls(directory: str) -> None:
+    client, _ = create_client(directory)
+    response = client.get('/inc/static/js/game.js', headers={'accept-encoding': 'identity'})
+    assert response.content == SCRIPT and response.headers['cache-control'] == CACHE_REVALIDATE
+    assert 'content-encoding' not in response.headers
+    response = client.get('/inc/static/_v/000000000000/game/uno/img/red_1.png')
+    assert response.status_code == 200 and response.headers['cache-control'] == CACHE_REVALIDATE
+    assert client.get('/inc/static/_v/000000000000/game/uno/img/missing.png').status_code == 404
+    assert client.get('/inc/static/_v/x').status_code == 404
+    assert client.get('/inc/static/missing.js').status_code == 404
+    assert client.post('/inc/static/js/game.js').status_code == 405
+
+
+def test_pipeline_can_be_turned_off(directory: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('STATIC_PIPELINE', '0')
+    client, templates = create_client(directory)
+    assert templates.env.globals['static']('js/game.js') == '/inc/static/js/game.js'  # type: ignore[operator]
+    assert templates.env.globals['static_dir']('/game/') == '/inc/static/game/'  # type: ignore[operator]
+    assert client.get('/inc/static/js/game.js').content == SCRIPT
@@ -0,0 +1,233 @@
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterator, List
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from starlette.testclient import WebSocketTestSession
+from server.py.battleship import RandomPlayer
+from server.py.engine_executor import EngineExecutor
+from server.py.game_registry import GameSpec, get_game_spec
+from server.py.hangman import GuessLetterAction
+from server.py.main import MAX_SPEED, create_app, parse_replay_control
+from server.py.replay import write_varint
+from server.py.server_context import ServerContext, create_context_from_env
+from server.py.turn_loop import IDX_PLAYER_YOU
+
+
+@pytest.fixture(name='context')
+def fixture_context(tmp_path: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> Iterator[ServerContext]:
+    monkeypatch.setenv('REPLAY_DIR', str(tmp_path))
+    monkeypatch.setenv('SIMULATION_EXECUTOR', 'inline')
+    monkeypatch.setenv('SNAPSHOT_STORE', 'memory')
+    context = create_context_from_env()
+    yield context
+    context.close()
+
+
+@pytest.fixture(name='client')
+def fixture_client(context: ServerContext) -> Iterator[TestClient]:
+    with TestClient(create_app(['hangman', 'battleship'], context=context)) as client:
+        yield client
+
+
+def receive_update(websocket: WebSocketTestSession) -> Dict[str, Any]:
+    """ Skip the messages before the next update and return its state """
+    while True:
+        data = websocket.receive_json()
+        if data['type'] == 'update':
+            state: Dict[str, Any] = data['state']
+            return state
+
+
+def play_singleplayer(websocket: WebSocketTestSession) -> List[Dict[str, Any]]:
+    """ Always choose the first action until the game is finished, returns the states received """
+    list_state = []
+    while True:
+        state = receive_update(websocket)
+        list_state.append(state)
+        if state['phase'] == 'finished':
+            return list_state
+        if state['list_action']:
+            websocket.send_json({'type': 'action', 'action': state['list_action'][0],
+                                 'state_version': state['state_version']})
+
+
+def test_hangman_is_played_and_logged_for_replay(client: TestClient, context: ServerContext,
+                                                 caplog: pytest.LogCaptureFixture) -> None:
+    with caplog.at_level(logging.DEBUG, logger='server.game.hangman'):
+        with client.websocket_connect('/hangman/singleplayer/ws') as websocket:
+            assert websocket.receive_json()['type'] == 'resume'
+            game_id_replay = websocket.receive_json()['game_id']
+            list_state = play_singleplayer(websocket)
+    assert all(state['idx_player_you'] == IDX_PLAYER_YOU for state in list_state)
+    assert [state['list_action'] for state in list_state[-1:]] == [[]]
+    assert len(list_state[-1]['guesses']) == len(list_state) - 1
+    assert {record.message for record in caplog.records} >= {'state', 'action'}
+    assert os.path.exists(context.replays.get_path(game_id_replay))
+    with client.websocket_connect(f'/replay/{game_id_replay}/ws?speed=0') as websocket:
+        list_state_replay = [receive_update(websocket)]
+        while list_state_replay[-1]['turn'] < list_state_replay[-1]['cnt_turn']:
+            list_state_replay.append(receive_update(websocket))
+    assert [state['guesses'] for state in list_state_replay] == [state['guesses'] for state in list_state]
+
+
+def test_bot_turns_are_batched_in_turbo_mode(client: TestClient) -> None:
+    with client.websocket_connect('/battleship/singleplayer/ws?turbo=1') as websocket:
+        list_state = play_singleplayer(websocket)
+    assert list_state[-1]['winner'] in (0, 1)
+    assert all(state['list_action'] for state in list_state[:-1])  # no update of a bot's turn on its own
+
+
+def test_game_is_resumed_after_a_reconnect(client: TestClient) -> None:
+    with client.websocket_connect('/hangman/singleplayer/ws') as websocket:
+        game_id = websocket.receive_json()['game_id']
+        state = receive_update(websocket)
+        action = state['list_action'][0]
+        websocket.send_json({'type': 'action', 'action': action, 'state_version': state['state_version']})
+        state_before = receive_update(websocket)
+        websocket.close()
+        time.sleep(0.3)  # the test client cancels the server's task when the block is left, let it store the game
+    with client.websocket_connect(f'/hangman/singleplayer/ws?game_id={game_id}') as websocket:
+        assert websocket.receive_json() == {'type': 'resume', 'game_id': game_id}
+        state = receive_update(websocket)
+    assert state['guesses'] == state_before['guesses'] == [action['letter']]
+    assert state['word_to_guess'] == state_before['word_to_guess']
+
+
+def test_action_on_an_old_state_is_dropped(client: TestClient) -> None:
+    with client.websocket_connect('/hangman/singleplayer/ws') as websocket:
+        state = receive_update(websocket)
+        websocket.send_json({'type': 'action', 'action': state['list_action'][0],
+                             'state_version': state['state_version'] - 1})
+        state_again = receive_update(websocket)
+    assert state_again == state
+
+
+def test_connection_gives_up_when_its_game_is_continued_elsewhere(client: TestClient) -> None:
+    with client.websocket_connect('/hangman/singleplayer/ws') as websocket:
+        game_id = websocket.receive_json()['game_id']
+        state = receive_update(websocket)
+        with client.websocket_connect(f'/hangman/singleplayer/ws?game_id={game_id}') as websocket_new:
+            state_new = receive_update(websocket_new)
+            websocket.send_json({'type': 'action', 'action': state['list_action'][0],
+                                 'state_version': state['state_version']})
+            assert websocket.receive_json()['type'] == 'error'
+            assert state_new['guesses'] == []
+
+
+def test_simulation_shows_each_bot_choice_and_applies_it(client: TestClient, context: ServerContext) -> None:
+    with client.websocket_connect('/battleship/simulation/ws') as websocket:
+        data = websocket.receive_json()
+        assert data['type'] == 'spectate' and context.spectators.get_channel(data['game_id']) is not None
+        assert websocket.receive_json()['type'] == 'replay'
+        cnt_update = 0
+        while True:
+            state = receive_update(websocket)
+            cnt_update += 1
+            if state['phase'] == 'finished':
+                break
+            assert state['selected_action'] is not None and state['list_action'] == []
+            websocket.send_json({'type': 'action', 'action': state['selected_action']})
+    assert cnt_update > 2 * 17
+    assert context.spectators.get_channel(data['game_id']) is None
+    assert 'game="battleship",stage="select_action"' in client.get('/metrics').text
+
+
+def test_context_loads_the_game_module_on_the_engine_executor(context: ServerContext) -> None:
+    assert isinstance(context.engine_executor, EngineExecutor)
+    cnt_before = context.engine_executor.metrics.to_dict()['completed']
+    with TestClient(create_app(['hangman'], context=context)) as client:
+        with client.websocket_connect('/hangman/singleplayer/ws') as websocket:
+            receive_update(websocket)
+    assert context.engine_executor.metrics.to_dict()['completed'] > cnt_before
+
+
+def test_app_serves_the_turn_loops_of_its_games_only(client: TestClient) -> None:
+    list_path = [getattr(route, 'path', '') for route in client.app.routes]  # type: ignore[attr-defined]
+    assert '/hangman/singleplayer/ws' in list_path and '/battleship/simulation/ws' in list_path
+    assert '/uno/singleplayer/ws' not in list_path
+    assert 'server_startup_seconds{step="create_app"}' in client.get('/metrics').text
+
+
+def record_battleship(context: ServerContext) -> str:
+    """ Log a game of random bots, returns its id """
+    game = get_game_spec('battleship').create_game()
+    recorder = context.replays.create_recorder('battleship', game)
+    player = RandomPlayer()
+    player.rng = random.Random(3)
+    while game.get_state().phase != 'finished':
+        recorder.apply_action(player.select_action(game.get_state(), game.get_list_action()))
+    recorder.flush()
+    return recorder.game_id
+
+
+def test_replay_reads_control_messages_at_full_speed(client: TestClient, context: ServerContext) -> None:
+    game_id = record_battleship(context)
+    with client.websocket_connect(f'/replay/{game_id}/ws?speed=0') as websocket:
+        websocket.send_json({'type': 'seek', 'turn': 0})
+        list_state = [receive_update(websocket) for _ in range(2)]
+        while list_state[-1]['turn'] > list_state[-2]['turn']:
+            list_state.append(receive_update(websocket))
+        assert list_state[-1]['turn'] == 0
+        assert list_state[-2]['turn'] < list_state[-2]['cnt_turn']  # the seek was read before the last turn
+        websocket.send_json({'type': 'jump'})
+        while (data := websocket.receive_json())['type'] == 'update':
+            pass
+        assert data['type'] == 'error' and 'jump' in data['message']
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f'/replay/{game_id}/ws?turn=-1') as websocket:
+            websocket.receive_json()
+
+
+def test_replay_control_messages_are_validated() -> None:
+    assert parse_replay_control({'type': 'seek', 'turn': '7'}, 3, 1.0) == (7, 1.0)
+    assert parse_replay_control({'type': 'speed', 'speed': 0}, 3, 1.0) == (3, 0.0)
+    for data in ({'type': 'seek'}, {'type': 'seek', 'turn': -1}, {'type': 'speed', 'speed': MAX_SPEED * 2},
+                 {'type': 'seek', 'turn': None}, {'turn': 1}, ['seek']):
+        with pytest.raises(ValueError):
+            parse_replay_control(data, 3, 1.0)
+
+
+def test_broken_replay_logs_close_the_socket_with_an_error(client: TestClient, context: ServerContext) -> None:
+    path = context.replays.get_path('cutoff')
+    with open(path, 'wb') as file_replay:
+        file_replay.write(b'GRL1\x09battle')
+    with client.websocket_connect('/replay/cutoff/ws') as websocket:
+        assert websocket.receive_json()['type'] == 'error'
+        with pytest.raises(WebSocketDisconnect) as info:
+            websocket.receive_json()
+        assert info.value.code == 1008
+    game = get_game_spec('hangman').create_game()
+    recorder = context.replays.create_recorder('hangman', game)
+    recorder.apply_action(GuessLetterAction(letter='A'))
+    recorder.flush()
+    with open(context.replays.get_path(recorder.game_id), 'ab') as file_replay:
+        file_replay.write(write_varint(200))  # an action the game does not have
+    with client.websocket_connect(f'/replay/{recorder.game_id}/ws?speed=0') as websocket:
+        assert receive_update(websocket)['turn'] == 0  # the update of turn 1 names the broken action
+        assert websocket.receive_json()['type'] == 'error'
+        with pytest.raises(WebSocketDisconnect) as info:
+            websocket.receive_json()
+        assert info.value.code == 1011
+
+
+def test_room_messages_without_a_type_or_action_are_ignored(client: TestClient) -> None:
+    with client.websocket_connect('/room/hangman/ws') as websocket:
+        assert websocket.receive_json()['type'] == 'joined'
+        state = receive_update(websocket)
+        websocket.send_json({'action': state['list_action'][0]})
+        websocket.send_json(['action'])
+        websocket.send_json({'type': 'action'})
+        data = websocket.receive_json()
+        assert data['type'] == 'error' and 'no action' in data['message']
+
+
+def test_apps_stop_reporting_imports_when_they_shut_down(context: ServerContext) -> None:
+    with TestClient(create_app(['hangman'], context=context)):
+        GameSpec('json', 'json', 'JSONDecoder', 1, {}, 'JSONDecoder').get_module()
+    assert 'import json' in context.metrics.startup.dict_sec
+    GameSpec('csv', 'csv', 'reader', 1, {}, 'reader').get_module()
+    assert 'import csv' not in context.metrics.startup.dict_sec
@@ -0,0 +1,85 @@
+import json
+from typing import Optional
+import msgpack
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from server.py.metrics import StageTimer
+from server.py.wire import EXT_TYPE_CARD, JsonCodec, MessagePackCodec, accept_connection, encode_card_id
+
+
+class Card(BaseModel):
+    color: Optional[str]
+    number: int
+
+
+LIST_CARD = [Card(color=color, number=number) for color in ('red', 'blue', None) for number in range(200)]
+
+
+def create_app(timer: StageTimer) -> FastAPI:
+    """ Echo each message back as an update, sent twice """
+    app = FastAPI()
+
+    @app.websocket('/ws')
+    async def endpoint(websocket: WebSocket) -> None:
+        connection = await accept_connection(websocket, LIST_CARD, timer)
+        data = await connection.receive()
+        message = {'type': 'update', 'state': data}
+        await connection.send(message)
+        await connection.send(message)
+        await websocket.close()
+    return app
+
+
+def test_card_ids_use_the_shortest_payload() -> None:
+    assert encode_card_id(5) == b'\x05'
+    assert encode_card_id(0x1234) == b'\x12\x34'
+    assert encode_card_id(0x12345) == b'\x00\x01\x23\x45'
+
+
+def test_cards_are_packed_as_ids_and_unpacked_again() -> None:
+    codec = MessagePackCodec(LIST_CARD + [LIST_CARD[0]])
+    assert len(codec.list_card_table) == 600  # duplicates share an id
+    message = {'type': 'update', 'state': {'hand': [card.model_dump() for card in LIST_CARD[::97]],
+                                           'other': {'color': 'red', 'number': 999}, 'cnt': 3}}
+    data = codec.encode(message)
+    assert isinstance(data, bytes)
+    raw = msgpack.unpackb(data)
+    assert raw['state']['hand'][0] == msgpack.ExtType(EXT_TYPE_CARD, b'\x00')
+    assert raw['state']['hand'][-1] == msgpack.ExtType(EXT_TYPE_CARD, encode_card_id(582))
+    assert raw['state']['other'] == {'color': 'red', 'number': 999}  # not in the table
+    assert codec.decode(data) == message
+    assert codec.decode(msgpack.packb(msgpack.ExtType(9, b'x'))) == msgpack.ExtType(9, b'x')
+
+
+def test_codec_without_cards_sends_plain_messagepack() -> None:
+    codec = MessagePackCodec([])
+    message = {'type': 'update', 'state': {'color': 'red', 'number': 1}}
+    assert codec.encode(message) == msgpack.packb(message)
+    assert json.loads(JsonCodec().encode(message)) == message
+
+
+def test_json_clients_get_text_frames() -> None:
+    timer = StageTimer()
+    with TestClient(create_app(timer)).websocket_connect('/ws') as websocket:
+        websocket.send_json({'a': 'ä'})
+        assert websocket.receive_text() == '{"type":"update","state":{"a":"ä"}}'
+        assert websocket.receive_json() == {'type': 'update', 'state': {'a': 'ä'}}
+    assert timer.get_histogram('encode').cnt == 1  # the second send reuses the frame
+
+
+def test_msgpack_clients_get_the_card_table_first() -> None:
+    with TestClient(create_app(StageTimer())).websocket_connect('/ws', subprotocols=['msgpack']) as websocket:
+        codec_client = msgpack.unpackb(websocket.receive_bytes())
+        assert codec_client['type'] == 'codec' and len(codec_client['cards']) == 600
+        hand = [LIST_CARD[1].model_dump(), LIST_CARD[450].model_dump()]
+        websocket.send_bytes(msgpack.packb({'hand': hand}))
+        codec = MessagePackCodec(LIST_CARD)
+        assert codec.decode(websocket.receive_bytes()) == {'type': 'update', 'state': {'hand': hand}}
+
+
+def test_delta_clients_get_patches() -> None:
+    with TestClient(create_app(StageTimer())).websocket_connect('/ws?delta=1') as websocket:
+        websocket.send_json({'a': 1})
+        assert websocket.receive_json() == {'type': 'update', 'state': {'a': 1}, 'version': 1}
+        assert websocket.receive_json() == {'type': 'patch', 'version': 2, 'patch': []}
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import random
+import pytest
+from server.py.word_corpus import (LengthIndex, MappedWordCorpus, WordCorpus, WordCorpusService, build_bitsets,
+                                   get_bitset_size, load_word_corpus, write_word_dictionary)
+
+WORDS = ['apple', 'Angle', 'maple', 'kiwi', 'fig', 'pear', 'plum', 'lime', 'date', 'banana', 'cherry', 'melon']
+
+
+def write_json(path: str, words: list[str]) -> None:
+    with open(path, 'w', encoding='utf-8') as fout:
+        json.dump(words, fout)
+
+
+def test_bitsets_have_one_bit_per_word() -> None:
+    assert build_bitsets([['A', 'B'], ['B'], []]) == {'A': 0b001, 'B': 0b011}
+    assert [get_bitset_size(cnt) for cnt in (0, 1, 8, 9)] == [0, 1, 1, 2]
+
+
+def test_length_index_marks_letters_and_positions() -> None:
+    index = LengthIndex(3, ['FIG', 'FOG', 'BAG'])
+    assert index.bitset_all == 0b111
+    assert index.get_letter_bitset('F') == 0b011
+    assert index.get_position_bitset(1, 'O') == 0b010
+    assert index.get_position_bitset(2, 'G') == 0b111
+    assert index.get_letter_bitset('Z') == 0
+    assert set(index.get_letters()) == set('FIGOBA')
+
+
+def test_corpus_indexes_words_by_length_and_letters() -> None:
+    corpus = WordCorpus(WORDS + [''])
+    assert len(corpus) == len(WORDS)
+    assert corpus.get_words_by_length(5) == ['apple', 'Angle', 'maple', 'melon']
+    assert corpus.get_words_by_length(9) == []
+    assert sorted(corpus.get_words_with_letters('ap')) == ['apple', 'maple', 'pear']  # every letter in the word
+    assert corpus.get_words_with_letters('AP', length=4) == ['pear']
+    assert corpus.get_letter_frequency(3) == {'F': 1, 'I': 1, 'G': 1}
+    random.seed(5)
+    assert len(corpus.get_random_word(6)) == 6
+    assert corpus.get_random_word() in WORDS
+    assert corpus.get_length_index(5) is corpus.get_length_index(5)
+    with pytest.raises(ValueError):
+        corpus.get_random_word(20)
+    with pytest.raises(ValueError):
+        WordCorpus([]).get_random_word()
+
+
+def test_mapped_dictionary_round_trips_the_words(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), 'words.wdb')
+    write_word_dictionary(path, WORDS + ['APPLE', ''])
+    corpus = load_word_corpus(path)
+    assert isinstance(corpus, MappedWordCorpus)
+    list_expected = sorted({word.upper() for word in WORDS}, key=lambda word: (len(word), word))
+    assert len(corpus) == len(list_expected)
+    assert [corpus.get_word(idx) for idx in range(len(corpus))] == list_expected
+    assert corpus.get_words_by_length(4) == ['DATE', 'KIWI', 'LIME', 'PEAR', 'PLUM']
+    assert corpus.get_words_by_length(9) == []
+    random.seed(2)
+    assert corpus.get_random_word(6) in ('BANANA', 'CHERRY')
+    assert corpus.get_random_word() in list_expected
+    with pytest.raises(ValueError):
+        corpus.get_random_word(20)
+
+
+def test_mapped_bitsets_and_frequencies_equal_the_in_memory_ones(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), 'words.wdb')
+    write_word_dictionary(path, WORDS)
+    mapped = MappedWordCorpus(path)
+    for length in (3, 4, 5, 6, 7):
+        in_memory = WordCorpus(mapped.get_words_by_length(length))
+        index_mapped = mapped.get_length_index(length)
+        index_memory = in_memory.get_length_index(length)
+        assert index_mapped.bitset_all == index_memory.bitset_all
+        assert mapped.get_letter_frequency(length) == in_memory.get_letter_frequency(length)
+        for letter in mapped.alphabet + 'Q':
+            assert index_mapped.get_letter_bitset(letter) == index_memory.get_letter_bitset(letter)
+            for pos in range(length):
+                assert index_mapped.get_position_bitset(pos, letter) == index_memory.get_position_bitset(pos, letter)
+        assert sorted(index_mapped.get_letters()) == sorted(mapped.alphabet)
+
+
+def test_empty_dictionary_and_wrong_files(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), 'empty.wdb')
+    write_word_dictionary(path, [])
+    corpus = MappedWordCorpus(path)
+    assert len(corpus) == 0
+    with pytest.raises(ValueError):
+        corpus.get_random_word()
+    path_wrong = os.path.join(str(tmp_path), 'wrong.wdb')
+    with open(path_wrong, 'wb') as fout:
+        fout.write(b'JUNK' + bytes(64))
+    with pytest.raises(ValueError):
+        MappedWordCorpus(path_wrong)
+
+
+def test_truncated_dictionary_is_rebuilt_from_its_word_list(tmp_path: pytest.TempPathFactory) -> None:
+    path = os.path.join(str(tmp_path), 'words.wdb')
+    write_word_dictionary(path, WORDS)
+    size = os.path.getsize(path)
+    for size_truncated in (10, 100, size - 1):
+        with open(path, 'r+b') as file_words:
+            file_words.truncate(size_truncated)
+        with pytest.raises(ValueError):
+            load_word_corpus(path)
+        write_word_dictionary(path, WORDS)
+    os.truncate(path, 100)
+    write_json(os.path.join(str(tmp_path), 'words.json'), WORDS)
+    assert len(load_word_corpus(path)) == len(WORDS)
+    assert os.path.getsize(path) == size
+
+
+def test_service_reloads_a_changed_file_and_keeps_the_last_good_corpus(
+        tmp_path: pytest.TempPathFactory, caplog: pytest.LogCaptureFixture) -> None:
+    path = os.path.join(str(tmp_path), 'words.json')
+    write_json(path, ['one'])
+    service = WordCorpusService(path, reload_interval=0.0)
+    assert service.get_random_word() == 'one'
+    corpus = service.get()
+    assert service.get() is corpus  # unchanged file
+    write_json(path, ['three', 'words', 'later'])
+    os.utime(path, ns=(1, 1))  # a different modification time even within the clock resolution
+    assert len(service.get()) == 3
+    os.remove(path)
+    with caplog.at_level(logging.WARNING, logger='server.word_corpus'):
+        assert len(service.get()) == 3
+    assert [record.message for record in caplog.records] == ['reload failed']